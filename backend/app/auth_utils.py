@@ -1,5 +1,13 @@
 """Authentication utilities for password hashing and verification."""
-import bcrypt # type: ignore
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .database import THREADPOOL_SIZE
+from .server import available_cpus
+
+# bcrypt work factor for new hashes; existing hashes keep the cost they were made with
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 
 def hash_password(password: str) -> str:
@@ -11,8 +19,9 @@ def hash_password(password: str) -> str:
     Returns:
         Hashed password as a string
     """
+    import bcrypt # type: ignore
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -27,6 +36,89 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if password matches, False otherwise
     """
+    import bcrypt # type: ignore
     password_bytes = plain_password.encode('utf-8')
     hashed_bytes = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+
+class PasswordExecutorOverloaded(Exception):
+    """Raised when too many password operations are already waiting."""
+
+
+class PasswordExecutor:
+    """Bounded pool for bcrypt work with queue-depth load shedding.
+
+    bcrypt costs a few hundred milliseconds of CPU per call, so a burst of
+    login attempts can starve every other request. Running it on a dedicated
+    pool caps the cores it can occupy, and once ``queue_limit`` calls are in
+    flight new ones are rejected immediately instead of queueing.
+    """
+
+    def __init__(self, max_workers: int, queue_limit: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Create the pool and load bcrypt on it ahead of the first request."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="bcrypt"
+                )
+            executor = self._executor
+        executor.submit(__import__, "bcrypt").result()
+
+    @property
+    def pending(self) -> int:
+        """Number of password operations running or waiting."""
+        return self._pending
+
+    def run(self, fn, *args):
+        """Run ``fn(*args)`` on the pool and wait for the result."""
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise PasswordExecutorOverloaded()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="bcrypt"
+                )
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool, letting queued work finish when ``wait`` is set.
+
+        The pool is recreated by the next ``start`` or ``run``.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def create_password_executor(threadpool_size: int = THREADPOOL_SIZE) -> PasswordExecutor:
+    """Build the executor from ``PASSWORD_HASH_WORKERS`` and ``PASSWORD_QUEUE_LIMIT``.
+
+    By default the worker processes share the available CPUs between them
+    (``WEB_CONCURRENCY`` is set by ``app.server``), so bcrypt cannot occupy
+    every core. The queue limit stays below the request threadpool size: a
+    request thread blocked on a queued hash cannot serve anything else, so
+    shedding has to start while some threads are still free.
+    """
+    web_workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, available_cpus() // web_workers))))
+    queue_limit = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(workers * 8)))
+    return PasswordExecutor(max_workers=workers, queue_limit=min(queue_limit, max(1, threadpool_size - 1)))
+
+
+# Process-wide executor instance
+password_executor = create_password_executor()
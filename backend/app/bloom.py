@@ -0,0 +1,103 @@
+"""Bloom filter of taken usernames and emails.
+
+Answers "is this username/email free?" for the signup form without a database
+query; a positive is confirmed against the database. The filter is loaded from
+``users`` at startup and updated as users sign up or rename themselves in this
+worker; until it is loaded every lookup counts as a possible hit so callers
+fall back to the database.
+
+A negative is only definitive while this worker is the sole writer of
+``users`` (``exclusive``). With other workers it misses names they took since
+the last load, so it only spares the signup pre-check (the unique constraints
+catch what it misses), the maintenance task reloads it, and availability
+answers confirm negatives against the database.
+"""
+import hashlib
+import math
+import os
+import threading
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session # type: ignore
+from . import db_models
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over BLAKE2b."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        """Add an item to the filter."""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TakenNamesFilter:
+    """Bloom filter over usernames and (lowercased) emails already in use."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        # Whether no other process adds users behind this filter's back
+        self.exclusive = True
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    def load(self, db: Session) -> int:
+        """Build the filter from the ``users`` table; returns the user count."""
+        count = db.query(db_models.User).count()
+        bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+        for username, email in db.query(db_models.User.username, db_models.User.email).yield_per(1000):
+            bloom.add(f"u:{username}")
+            bloom.add(f"e:{email.lower()}")
+        with self._lock:
+            self._bloom = bloom
+        return count
+
+    def add(self, username: Optional[str] = None, email: Optional[str] = None) -> None:
+        """Mark a username and/or email as taken."""
+        with self._lock:
+            if self._bloom is None:
+                return
+            if username is not None:
+                self._bloom.add(f"u:{username}")
+            if email is not None:
+                self._bloom.add(f"e:{email.lower()}")
+
+    def username_maybe_taken(self, username: str) -> bool:
+        """False only if the username is certainly free."""
+        bloom = self._bloom
+        return bloom is None or f"u:{username}" in bloom
+
+    def email_maybe_taken(self, email: str) -> bool:
+        """False only if the email is certainly free."""
+        bloom = self._bloom
+        return bloom is None or f"e:{email.lower()}" in bloom
+
+    def reset(self) -> None:
+        """Unload the filter so every lookup goes to the database."""
+        with self._lock:
+            self._bloom = None
+
+
+# Process-wide filter; loaded at startup unless SIGNUP_BLOOM_FILTER=0
+SIGNUP_BLOOM_FILTER = os.getenv("SIGNUP_BLOOM_FILTER", "1") != "0"
+taken_names = TakenNamesFilter(capacity=int(os.getenv("SIGNUP_BLOOM_CAPACITY", "1000000")))
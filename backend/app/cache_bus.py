@@ -0,0 +1,240 @@
+"""Cross-process cache invalidation bus.
+
+Each worker keeps per-topic version counters. Writes publish the topics they
+touch inside their transaction; once the transaction commits every worker bumps
+its local version, so anything cached under an older version is ignored.
+
+On PostgreSQL the publish is a ``pg_notify`` issued in the same transaction as
+the write (delivered only on commit) and a background thread LISTENs for
+notifications from other workers. Any other database gets a process-local bus,
+which is all SQLite deployments and the test suite need.
+
+If the LISTEN connection drops, the thread reconnects with backoff and then
+bumps every topic, since notifications sent while it was away are lost.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from . import database
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "lumberjack_invalidate"
+PENDING_KEY = "pending_invalidations"
+
+
+class LocalBus:
+    """In-process bus: versions are bumped after the publishing session commits."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.origin = uuid.uuid4().hex
+
+    def version(self, topic: str) -> int:
+        """Current version of a topic in this process."""
+        return self._versions.get(topic, 0)
+
+    def watch(self, topic: str) -> None:
+        """Track ``topic`` so ``bump_all`` covers it before its first bump."""
+        with self._lock:
+            self._versions.setdefault(topic, 0)
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        """Register a callback invoked with the topic name on every bump."""
+        self._subscribers.append(callback)
+
+    def bump(self, *topics: str) -> None:
+        """Bump the local version of the given topics."""
+        with self._lock:
+            for topic in topics:
+                self._versions[topic] = self._versions.get(topic, 0) + 1
+        for topic in topics:
+            for callback in self._subscribers:
+                callback(topic)
+
+    def bump_all(self) -> None:
+        """Bump every topic this process has seen or watches."""
+        self.bump(*list(self._versions))
+
+    def publish(self, db: Session, *topics: str) -> None:
+        """Queue topic bumps to be applied when ``db`` commits."""
+        db.info.setdefault(PENDING_KEY, set()).update(topics)
+
+    def start(self) -> None:
+        """Start receiving remote invalidations (no-op for the local bus)."""
+
+    def stop(self) -> None:
+        """Stop receiving remote invalidations (no-op for the local bus)."""
+
+
+class PostgresBus(LocalBus):
+    """Bus that fans invalidations out to other workers via LISTEN/NOTIFY."""
+
+    def __init__(self, poll_interval: float = 1.0, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def publish(self, db: Session, *topics: str) -> None:
+        super().publish(db, *topics)
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        payload = json.dumps({"origin": self.origin, "topics": sorted(topics)})
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": payload},
+        )
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._listen, name="invalidation-bus", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+            self._thread = None
+
+    def handle(self, payload: str) -> None:
+        """Apply a NOTIFY payload received from another worker."""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.bump(*message.get("topics", []))
+
+    def _listen(self) -> None:
+        delay = self.reconnect_delay
+        reconnecting = False
+
+        def listening() -> None:
+            nonlocal delay, reconnecting
+            delay = self.reconnect_delay
+            if reconnecting:
+                logger.warning("Invalidation bus reconnected; invalidating every topic")
+                self.bump_all()
+            reconnecting = False
+
+        while not self._stopping.is_set():
+            try:
+                self._listen_once(listening)
+            except Exception:
+                logger.exception("Invalidation bus lost its LISTEN connection; retrying in %.1fs", delay)
+                reconnecting = True
+                if self._stopping.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _listen_once(self, listening: Callable[[], None]) -> None:
+        """LISTEN on one connection until stopped; raises if the connection fails."""
+        # A dedicated connection outside the pool: LISTEN is session state and
+        # must survive for the lifetime of the worker. Behind an external
+        # pooler it goes straight to PostgreSQL (DATABASE_DIRECT_URL).
+        engine = database.init_direct_engine()
+        conn = engine.raw_connection()
+        try:
+            conn.detach()
+            raw = conn.driver_connection
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            listening()
+            if engine.dialect.driver == "psycopg":
+                # psycopg (v3) delivers notifications from a generator instead
+                while not self._stopping.is_set():
+                    for notify in raw.notifies(timeout=self.poll_interval):
+                        self.handle(notify.payload)
+                return
+            while not self._stopping.is_set():
+                if select.select([raw], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    self.handle(raw.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+
+class VersionedCache:
+    """Cache whose entries are only valid for the topic version they were built at."""
+
+    def __init__(self, bus: LocalBus, topic: str, clock=time.monotonic):
+        self.bus = bus
+        self.topic = topic
+        self.clock = clock
+        self._entries: Dict[Hashable, Tuple[int, Optional[float], object]] = {}
+        bus.watch(topic)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object], max_age: Optional[float] = None):
+        """Return the cached value for ``key`` or compute and store it.
+
+        ``max_age`` bounds how long a newly computed value is kept even if the
+        version does not change, for values read from a lagging replica.
+        """
+        version = self.bus.version(self.topic)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == version and (cached[1] is None or cached[1] > self.clock()):
+            return cached[2]
+        value = compute()
+        expires_at = self.clock() + max_age if max_age is not None else None
+        self._entries[key] = (version, expires_at, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+
+
+def create_bus() -> LocalBus:
+    """Pick the bus implementation for the configured database."""
+    if os.getenv("INVALIDATION_BUS", "auto") == "local":
+        return LocalBus()
+    if database.DATABASE_BACKEND == "postgresql":
+        if database.external_pooling() and database.DATABASE_DIRECT_URL is None:
+            # LISTEN needs a session of its own, which a transaction pooler
+            # cannot provide
+            logger.warning("DB_POOL_MODE=external without DATABASE_DIRECT_URL: "
+                           "cache invalidations stay within each worker")
+            return LocalBus()
+        return PostgresBus()
+    return LocalBus()
+
+
+def _pending(session: Session) -> Iterable[str]:
+    return session.info.pop(PENDING_KEY, ())
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    topics = _pending(session)
+    if topics:
+        invalidation_bus.bump(*topics)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    _pending(session)
+
+
+# Process-wide bus instance
+invalidation_bus = create_bus()
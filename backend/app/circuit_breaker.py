@@ -0,0 +1,177 @@
+"""Circuit breaker around database access.
+
+Every statement the app's engines run is recorded with its latency, and every
+connection-level failure (lost connection, refused connect, pool timeout) as a
+failure. When, over the last ``window_seconds``, enough calls fail or run
+slowly, the breaker opens: requests that need the database are refused at once
+instead of piling up on pool checkout. After ``open_seconds`` it lets a single
+probe through (half-open); the probe succeeding closes it again, failing keeps
+it open for another period.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Fraction of calls in the window that must fail to open the breaker
+DB_BREAKER_FAILURE_RATE = float(os.getenv("DB_BREAKER_FAILURE_RATE", "0.5"))
+# A statement slower than this many milliseconds counts as slow
+DB_BREAKER_SLOW_CALL_MS = float(os.getenv("DB_BREAKER_SLOW_CALL_MS", "2000"))
+# Fraction of calls in the window that must be slow to open the breaker
+DB_BREAKER_SLOW_RATE = float(os.getenv("DB_BREAKER_SLOW_RATE", "0.8"))
+# Seconds of calls the rates are taken over, and the fewest calls that can trip it
+DB_BREAKER_WINDOW_SECONDS = float(os.getenv("DB_BREAKER_WINDOW_SECONDS", "10"))
+DB_BREAKER_MIN_CALLS = int(os.getenv("DB_BREAKER_MIN_CALLS", "10"))
+# Seconds the breaker stays open before a probe request is let through
+DB_BREAKER_OPEN_SECONDS = float(os.getenv("DB_BREAKER_OPEN_SECONDS", "5"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+TRANSITIONS = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("breaker", "state")
+)
+REJECTED = registry.counter(
+    "circuit_breaker_rejected_total", "Calls refused while a circuit breaker was open", ("breaker",)
+)
+
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker over a sliding time window."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = DB_BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = DB_BREAKER_SLOW_CALL_MS / 1000,
+        slow_rate: float = DB_BREAKER_SLOW_RATE,
+        window_seconds: float = DB_BREAKER_WINDOW_SECONDS,
+        min_calls: int = DB_BREAKER_MIN_CALLS,
+        open_seconds: float = DB_BREAKER_OPEN_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        # (time, failed, slow) per call, oldest first, with running counts of
+        # the failed and slow ones so a call costs O(1) under the lock
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failed = 0
+        self._slow = 0
+        self._lock = threading.Lock()
+        self._on_close: List[Callable[[], None]] = []
+
+    def allow(self) -> bool:
+        """Whether a call may go to the database now.
+
+        Once the open period is over the first caller is let through as the
+        probe; if it never reports back, another is let through after a
+        further ``open_seconds``.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            since = self._opened_at if self.state == OPEN else self._probe_at
+            if now - since >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+                self._probe_at = now
+                return True
+        REJECTED.inc(breaker=self.name)
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until a probe may be let through."""
+        since = self._opened_at if self.state == OPEN else self._probe_at
+        return max(0.0, since + self.open_seconds - self.clock())
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        """Record one call's latency and whether it failed."""
+        slow = seconds >= self.slow_call_seconds
+        closed = False
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._forget_calls()
+                    self._set_state(CLOSED)
+                    closed = True
+            elif self.state == CLOSED:
+                self._calls.append((now, failed, slow))
+                self._failed += failed
+                self._slow += slow
+                horizon = now - self.window_seconds
+                while self._calls and self._calls[0][0] <= horizon:
+                    _, old_failed, old_slow = self._calls.popleft()
+                    self._failed -= old_failed
+                    self._slow -= old_slow
+                if self._tripped():
+                    self._open(now)
+        if closed:
+            for callback in self._on_close:
+                callback()
+
+    def record_failure(self) -> None:
+        self.record(0.0, failed=True)
+
+    def record_slow(self) -> None:
+        """Record a call stopped before it finished, however briefly it ran."""
+        self.record(self.slow_call_seconds)
+
+    def on_close(self, callback: Callable[[], None]) -> None:
+        """Register a callback run (on the recording thread) when the breaker closes."""
+        self._on_close.append(callback)
+
+    def trip(self) -> None:
+        """Open the breaker now."""
+        with self._lock:
+            self._open(self.clock())
+
+    def reset(self) -> None:
+        """Close the breaker and forget recorded calls, without callbacks."""
+        with self._lock:
+            self._forget_calls()
+            self.state = CLOSED
+
+    def _tripped(self) -> bool:
+        calls = len(self._calls)
+        if calls < self.min_calls:
+            return False
+        return self._failed >= calls * self.failure_rate or self._slow >= calls * self.slow_rate
+
+    def _forget_calls(self) -> None:
+        self._calls.clear()
+        self._failed = self._slow = 0
+
+    def _open(self, now: float) -> None:
+        self._forget_calls()
+        self._opened_at = now
+        if self.state != OPEN:
+            logger.warning("Circuit breaker %s opened", self.name)
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            if state == CLOSED:
+                logger.warning("Circuit breaker %s closed", self.name)
+            self.state = state
+            TRANSITIONS.inc(breaker=self.name, state=state)
+
+
+# Breaker for the primary database and its read pool
+db_breaker = CircuitBreaker("database")
@@ -1,60 +1,172 @@
 """Database operations using SQLAlchemy."""
 from datetime import datetime, timezone
-from typing import List, Optional
-import uuid
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import String, and_, bindparam, func, insert, literal, or_, select, tuple_, update # type: ignore
+from sqlalchemy.exc import IntegrityError # type: ignore
 from sqlalchemy.orm import Session
-from . import db_models
+import anyio # type: ignore
+from . import db_models, ids
+from .bloom import taken_names
+from .score_histogram import score_histogram
+from .cache_bus import invalidation_bus, PENDING_KEY
+from .database import pipeline
+from . import deadline, ranking, stats
+from .leaderboard_store import LeaderboardStore, create_leaderboard_store
+from .singleflight import SingleFlight
+
+
+class DuplicateUserError(Exception):
+    """Raised when a new user collides with an existing email or username."""
+
+    def __init__(self, field: str):
+        super().__init__(f"{field} already in use")
+        self.field = field
+
+
+def _upsert_insert(dialect_name: str):
+    """INSERT construct supporting ON CONFLICT DO NOTHING for a dialect, if any."""
+    # Imported here: the dialect package is already loaded once an engine exists
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+# Hot read statements, built once. Executing a prebuilt statement with bound
+# parameters skips statement construction and hits the compiled cache every
+# time; the user lookups also run on the session's connection and return plain
+# rows, so no ORM entities are loaded for them.
+_USER_COLUMNS = (
+    db_models.User.id, db_models.User.username, db_models.User.email,
+    db_models.User.password, db_models.User.created_at, db_models.User.high_score,
+    db_models.User.high_score_at, db_models.User.total_chops, db_models.User.games_played,
+)
+USER_BY_ID = select(*_USER_COLUMNS).where(db_models.User.id == bindparam("user_id"))
+USER_BY_EMAIL = select(*_USER_COLUMNS).where(
+    # Served by ix_users_email_lower
+    func.lower(db_models.User.email) == func.lower(bindparam("email", type_=String))
+)
+USER_BY_USERNAME = select(*_USER_COLUMNS).where(db_models.User.username == bindparam("username"))
+# Everything end_session reads, in one round trip: the session, the player's
+# counters and their stats row, all three rows locked. Stats are rewritten
+# whole from what is read here, so their row must be locked too; without one
+# (a player's first game) nothing is returned.
+SESSION_FOR_END = select(
+    db_models.GameSession.id, db_models.GameSession.user_id, db_models.GameSession.started_at,
+    db_models.GameSession.ended_at, db_models.GameSession.score, db_models.GameSession.chops,
+    db_models.GameSession.duration, db_models.User.username, db_models.User.high_score,
+    db_models.User.high_score_at, db_models.User.total_chops,
+    *(getattr(db_models.UserStats, column) for column in stats.STATS_COLUMNS),
+).join(
+    db_models.User, db_models.User.id == db_models.GameSession.user_id
+).join(
+    db_models.UserStats, db_models.UserStats.user_id == db_models.GameSession.user_id
+).where(
+    db_models.GameSession.id == bindparam("session_id")
+).with_for_update(of=[db_models.GameSession.__table__, db_models.User.__table__, db_models.UserStats.__table__])
+SESSION_OWNER = select(db_models.GameSession.user_id).where(db_models.GameSession.id == bindparam("session_id"))
+
+
+def _user_dict(row) -> dict:
+    """API user dict from a ``_USER_COLUMNS`` row (same shape as ``User.to_dict``)."""
+    return {
+        "id": row.id,
+        "username": row.username,
+        "email": row.email,
+        "password": row.password,
+        "createdAt": row.created_at,
+        "highScore": row.high_score,
+        "highScoreAt": row.high_score_at,
+        "totalChops": row.total_chops,
+        "gamesPlayed": row.games_played,
+    }
 
 
 class Database:
     """Database operations wrapper for SQLAlchemy."""
 
+    def __init__(self, leaderboard_store: Optional[LeaderboardStore] = None):
+        self.leaderboard_store = leaderboard_store or create_leaderboard_store()
+
+    def _find_user(self, db: Session, statement, **params) -> Optional[dict]:
+        row = db.connection().execute(statement, params).first()
+        return _user_dict(row) if row else None
+
     def get_user_by_email(self, db: Session, email: str) -> Optional[dict]:
-        """Get user by email address."""
-        user = db.query(db_models.User).filter(
-            db_models.User.email == email.lower()
-        ).first()
-        return user.to_dict() if user else None
+        """Get user by email address, ignoring case."""
+        return self._find_user(db, USER_BY_EMAIL, email=email)
 
     def get_user_by_id(self, db: Session, user_id: str) -> Optional[dict]:
         """Get user by ID."""
-        user = db.query(db_models.User).filter(
-            db_models.User.id == user_id
-        ).first()
-        return user.to_dict() if user else None
+        if not ids.is_valid(user_id):
+            return None
+        return self._find_user(db, USER_BY_ID, user_id=user_id)
 
     def get_user_by_username(self, db: Session, username: str) -> Optional[dict]:
         """Get user by username."""
-        user = db.query(db_models.User).filter(
-            db_models.User.username == username
-        ).first()
-        return user.to_dict() if user else None
+        return self._find_user(db, USER_BY_USERNAME, username=username)
 
     def create_user(self, db: Session, user_data: dict) -> dict:
-        """Create a new user."""
-        new_user = db_models.User(
-            id=str(uuid.uuid4()),
+        """Create a new user.
+
+        Relies on the unique constraints instead of looking the email and
+        username up first: a single ``INSERT ... ON CONFLICT DO NOTHING
+        RETURNING`` either creates the row or tells us it collided, and only
+        then do we query which field was taken. Raises ``DuplicateUserError``.
+        """
+        now = datetime.now(timezone.utc)
+        values = dict(
+            id=ids.new_id(),
             username=user_data["username"],
-            email=user_data["email"].lower(),
+            email=user_data["email"],
             password=user_data["password"],
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             high_score=0,
+            high_score_at=now,
             total_chops=0,
             games_played=0
         )
-        db.add(new_user)
+        upsert_insert = _upsert_insert(db.get_bind().dialect.name)
+        try:
+            if upsert_insert is not None:
+                stmt = upsert_insert(db_models.User).values(**values).on_conflict_do_nothing()
+            else:
+                stmt = insert(db_models.User).values(**values)
+            new_user = db.execute(stmt.returning(db_models.User)).scalar_one_or_none()
+        except IntegrityError:
+            db.rollback()
+            new_user = None
+
+        if new_user is None:
+            db.rollback()
+            if self.get_user_by_email(db, values["email"]):
+                raise DuplicateUserError("email")
+            raise DuplicateUserError("username")
+
+        user = new_user.to_dict()
+        invalidation_bus.publish(db, "users", "leaderboard")
         db.commit()
-        db.refresh(new_user)
-        return new_user.to_dict()
+        taken_names.add(username=user["username"], email=user["email"])
+        score_histogram.add(user["highScore"])
+        self.leaderboard_store.submit_score(user)
+        return user
 
     def update_user(self, db: Session, user_id: str, updates: dict) -> Optional[dict]:
-        """Update user information."""
+        """Update user information.
+
+        Raises ``DuplicateUserError`` if the new email (in any case) or
+        username belongs to someone else.
+        """
         user = db.query(db_models.User).filter(
             db_models.User.id == user_id
         ).first()
         
         if not user:
             return None
+        old_high_score = user.high_score
         
         # Map camelCase to snake_case for database fields
         field_mapping = {
@@ -69,15 +181,27 @@ class Database:
             db_field = field_mapping.get(key)
             if db_field and hasattr(user, db_field):
                 setattr(user, db_field, value)
+        if user.high_score != old_high_score:
+            user.high_score_at = datetime.now(timezone.utc)
         
-        db.commit()
+        invalidation_bus.publish(db, "users", "leaderboard")
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            other = self.get_user_by_email(db, updates["email"]) if "email" in updates else None
+            raise DuplicateUserError("email" if other and other["id"] != user_id else "username")
         db.refresh(user)
-        return user.to_dict()
+        user_dict = user.to_dict()
+        taken_names.add(username=user_dict["username"], email=user_dict["email"])
+        score_histogram.replace(old_high_score, user_dict["highScore"])
+        self.leaderboard_store.submit_score(user_dict)
+        return user_dict
 
     def create_session(self, db: Session, user_id: str) -> dict:
         """Create a new game session."""
         session = db_models.GameSession(
-            id=str(uuid.uuid4()),
+            id=ids.new_id(),
             user_id=user_id,
             score=0,
             chops=0,
@@ -93,53 +217,246 @@ class Database:
     def end_session(
         self, db: Session, session_id: str, score: int, chops: int, duration: float
     ) -> Optional[dict]:
-        """End a game session and update user statistics."""
-        session = db.query(db_models.GameSession).filter(
-            db_models.GameSession.id == session_id
-        ).first()
-        
-        if not session:
+        """End a game session and update user statistics.
+
+        One locked read, then the writes inside ``pipeline``, which commits
+        them: on psycopg (v3) the writes and the COMMIT share a single round
+        trip. Nothing written depends on a result read back within the block.
+        """
+        if not ids.is_valid(session_id):
             return None
-        
-        session.score = score
-        session.chops = chops
-        session.duration = duration
-        session.ended_at = datetime.now(timezone.utc)
-        
-        # Update user statistics
-        user = db.query(db_models.User).filter(
-            db_models.User.id == session.user_id
-        ).first()
-        
-        if user:
-            user.games_played += 1
-            user.total_chops += chops
-            if score > user.high_score:
-                user.high_score = score
-        
-        db.commit()
-        db.refresh(session)
-        return session.to_dict()
+        params = {"session_id": session_id}
+        row = db.connection().execute(SESSION_FOR_END, params).first()
+        if row is None:
+            # No such session, or the player's first game: give them an empty
+            # stats row, then lock it like any other
+            user_id = db.connection().execute(SESSION_OWNER, params).scalar()
+            if user_id is None:
+                return None
+            stats.create_missing(db, user_id)
+            row = db.connection().execute(SESSION_FOR_END, params).first()
 
-    def get_leaderboard(self, db: Session, limit: int = 10) -> List[dict]:
-        """Get top users by high score."""
-        users = db.query(db_models.User).order_by(
-            db_models.User.high_score.desc()
-        ).limit(limit).all()
-        
-        return [user.to_dict() for user in users]
+        session = {
+            "id": row.id, "userId": row.user_id, "score": row.score, "chops": row.chops,
+            "duration": row.duration, "startedAt": row.started_at, "endedAt": row.ended_at,
+        }
+        # Retried requests must not count the same game twice
+        if row.ended_at is not None:
+            return session
+
+        ended_at = datetime.now(timezone.utc)
+        new_high_score = max(row.high_score, score)
+        high_score_at = ended_at if score > row.high_score else row.high_score_at
+        user_stats = stats.from_row(row.user_id, row)
+        stats.add_game(user_stats, score, chops, duration, ended_at)
+
+        with pipeline(db):
+            db.execute(
+                update(db_models.GameSession.__table__)
+                .where(db_models.GameSession.id == session_id)
+                .values(score=score, chops=chops, duration=duration, ended_at=ended_at)
+            )
+            db.execute(
+                update(db_models.User.__table__)
+                .where(db_models.User.id == row.user_id)
+                .values(
+                    games_played=db_models.User.games_played + 1,
+                    total_chops=db_models.User.total_chops + chops,
+                    high_score=new_high_score,
+                    high_score_at=high_score_at,
+                )
+            )
+            stats.save(db, user_stats)
+            invalidation_bus.publish(db, "users", "leaderboard")
+
+        score_histogram.replace(row.high_score, new_high_score)
+        if self.leaderboard_store.mirrored:
+            self.leaderboard_store.submit_score({
+                "id": row.user_id, "username": row.username,
+                "highScore": new_high_score, "highScoreAt": high_score_at,
+                "totalChops": row.total_chops + chops,
+            })
+        session.update(score=score, chops=chops, duration=duration, endedAt=ended_at)
+        return session
+
+    def _history_query(
+        self, db: Session, user_id: str,
+        start: Optional[datetime] = None, end: Optional[datetime] = None,
+    ):
+        """A user's ended sessions, newest first, reading only indexed columns."""
+        GameSession = db_models.GameSession
+        query = db.query(
+            GameSession.id, GameSession.user_id, GameSession.score, GameSession.chops,
+            GameSession.duration, GameSession.started_at, GameSession.ended_at,
+        ).filter(
+            GameSession.user_id == user_id,
+            GameSession.ended_at.isnot(None),
+        )
+        if start is not None:
+            query = query.filter(GameSession.started_at >= start)
+        if end is not None:
+            query = query.filter(GameSession.started_at < end)
+        return query.order_by(GameSession.started_at.desc(), GameSession.id.desc())
+
+    @staticmethod
+    def _history_row(row) -> dict:
+        return {
+            "id": row.id,
+            "userId": row.user_id,
+            "score": row.score,
+            "chops": row.chops,
+            "duration": row.duration,
+            "startedAt": row.started_at,
+            "endedAt": row.ended_at,
+        }
+
+    def get_user_sessions(
+        self, db: Session, user_id: str, limit: int = 20,
+        after: Optional[Tuple[datetime, str]] = None,
+        start: Optional[datetime] = None, end: Optional[datetime] = None,
+    ) -> List[dict]:
+        """Get a page of a user's ended sessions, newest first.
+
+        ``after`` is the ``(started_at, id)`` of the last session on the
+        previous page (keyset pagination).
+        """
+        query = self._history_query(db, user_id, start, end)
+        if after is not None:
+            GameSession = db_models.GameSession
+            started_at, session_id = after
+            # Typed like the columns: an untyped id would bind as text, which
+            # SQLite never orders below the BLOB ids
+            query = query.filter(tuple_(GameSession.started_at, GameSession.id) < tuple_(
+                literal(started_at, GameSession.started_at.type), literal(session_id, GameSession.id.type),
+            ))
+        return [self._history_row(row) for row in query.limit(limit)]
+
+    def iter_user_sessions(
+        self, db: Session, user_id: str,
+        start: Optional[datetime] = None, end: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict]:
+        """Stream all of a user's ended sessions, newest first."""
+        for row in self._history_query(db, user_id, start, end).yield_per(batch_size):
+            yield self._history_row(row)
+
+    def iter_leaderboard(
+        self, db: Session, after: Optional[Tuple[int, int, str]] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict]:
+        """Stream every user in leaderboard order with their rank.
+
+        Ranks are positions (the ``row`` tie mode), so each user has a
+        distinct rank. ``after`` is the ``(rank, high_score, id)`` of the last
+        user already received; the stream resumes with the next one.
+        """
+        User = db_models.User
+        query = db.query(User.id, User.username, User.high_score, User.total_chops)
+        rank = 0
+        if after is not None:
+            rank, high_score, user_id = after
+            reached = select(User.high_score_at).where(User.id == user_id).scalar_subquery()
+            query = query.filter(or_(
+                User.high_score < high_score,
+                and_(User.high_score == high_score, or_(
+                    User.high_score_at > reached,
+                    and_(User.high_score_at == reached, User.id > user_id),
+                )),
+            ))
+        query = query.order_by(*ranking.LEADERBOARD_ORDER)
+        for rank, row in enumerate(query.yield_per(batch_size), rank + 1):
+            yield {
+                "rank": rank,
+                "id": row.id,
+                "username": row.username,
+                "highScore": row.high_score,
+                "totalChops": row.total_chops,
+            }
+
+    def _flight_key(self, db: Session, *read) -> Optional[tuple]:
+        """Key under which identical leaderboard reads coalesce, or None to run alone.
+
+        The key carries the leaderboard version and the bind, so reads only
+        join a computation against the same database that started after every
+        write this worker has seen. A session with its own uncommitted or
+        just-committed scores (read-your-writes) always queries for itself.
+        """
+        if db.info.get("read_your_writes") or "leaderboard" in db.info.get(PENDING_KEY, ()):
+            return None
+        return (invalidation_bus.version("leaderboard"), db.get_bind()) + read
+
+    @staticmethod
+    def _retry_shared_read(error: Exception, led: bool) -> bool:
+        """Whether to run a coalesced read again after it raised ``error``.
+
+        The shared query runs under the deadline of the request that led it.
+        If that deadline stopped it, a follower with time left of its own runs
+        the query again rather than fail with it.
+        """
+        return not led and deadline.is_deadline_error(error) and not deadline.expired()
+
+    def _coalesced(self, db: Session, read: tuple, compute):
+        key = self._flight_key(db, *read)
+        if key is None:
+            return compute()
+        while True:
+            led = []
+            try:
+                return leaderboard_flights.do(key, lambda: led.append(True) or compute())
+            except Exception as exc:
+                if not self._retry_shared_read(exc, bool(led)):
+                    raise
+
+    async def _coalesced_async(self, db: Session, read: tuple, compute):
+        key = self._flight_key(db, *read)
+        if key is None:
+            return await anyio.to_thread.run_sync(compute)
+        while True:
+            led = []
+            try:
+                return await leaderboard_flights.do_async(
+                    key, lambda: led.append(True) or anyio.to_thread.run_sync(compute)
+                )
+            except Exception as exc:
+                if not self._retry_shared_read(exc, bool(led)):
+                    raise
+
+    def get_leaderboard(self, db: Session, limit: int = 10, mode: str = ranking.DEFAULT_RANK_MODE) -> List[dict]:
+        """Get top users by high score, ranked with tie mode ``mode``.
+
+        Concurrent identical calls share one query.
+        """
+        return self._coalesced(db, ("top", limit, mode),
+                               lambda: self.leaderboard_store.get_leaderboard(db, limit, mode))
+
+    async def get_leaderboard_async(self, db: Session, limit: int = 10,
+                                    mode: str = ranking.DEFAULT_RANK_MODE) -> List[dict]:
+        """``get_leaderboard`` for async handlers; the query runs on the thread pool."""
+        return await self._coalesced_async(db, ("top", limit, mode),
+                                           lambda: self.leaderboard_store.get_leaderboard(db, limit, mode))
+
+    def get_user_rank(self, db: Session, user_id: str, mode: str = ranking.DEFAULT_RANK_MODE) -> int:
+        """Get a user's rank with tie mode ``mode``, or 0 if unranked."""
+        if not ids.is_valid(user_id):
+            return 0
+        return self._coalesced(db, ("rank", str(user_id), mode),
+                               lambda: self.leaderboard_store.get_user_rank(db, user_id, mode))
+
+    async def get_user_rank_async(self, db: Session, user_id: str,
+                                  mode: str = ranking.DEFAULT_RANK_MODE) -> int:
+        """``get_user_rank`` for async handlers; the query runs on the thread pool."""
+        if not ids.is_valid(user_id):
+            return 0
+        return await self._coalesced_async(db, ("rank", str(user_id), mode),
+                                           lambda: self.leaderboard_store.get_user_rank(db, user_id, mode))
+
+    def get_user_stats(self, db: Session, user: dict) -> dict:
+        """Get a user's aggregated game statistics."""
+        return stats.get_user_stats(db, user)
 
-    def get_user_rank(self, db: Session, user_id: str) -> int:
-        """Get user's rank based on high score."""
-        users = db.query(db_models.User).order_by(
-            db_models.User.high_score.desc()
-        ).all()
-        
-        for i, user in enumerate(users):
-            if user.id == user_id:
-                return i + 1
-        return 0
 
+# Concurrent identical leaderboard and rank reads share one computation
+leaderboard_flights = SingleFlight("leaderboard")
 
 # Create database instance
 database = Database()
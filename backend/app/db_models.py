@@ -1,25 +1,37 @@
 """SQLAlchemy database models."""
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey # type: ignore
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, DateTime, ForeignKey, Index, Text, func # type: ignore
 from sqlalchemy.orm import relationship # type: ignore
 from .database import Base
+from .ids import UUIDString
 
 
 class User(Base):
     """User model for storing user information."""
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(UUIDString, primary_key=True)
     username = Column(String, unique=True, index=True, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, nullable=False)
     password = Column(String, nullable=False)  # In production, this should be hashed
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     high_score = Column(Integer, default=0, nullable=False)
+    # When high_score was first reached; breaks ties on the leaderboard
+    high_score_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     total_chops = Column(Integer, default=0, nullable=False)
     games_played = Column(Integer, default=0, nullable=False)
 
+    __table_args__ = (
+        # Emails are unique and looked up regardless of case; the address is
+        # stored as the user typed it.
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+        # Leaderboard order (see app.ranking): top-N pages and rank counts
+        Index("ix_users_leaderboard", high_score.desc(), high_score_at, id),
+    )
+
     # Relationship to game sessions
     sessions = relationship("GameSession", back_populates="user", cascade="all, delete-orphan")
+    stats = relationship("UserStats", uselist=False, cascade="all, delete-orphan")
 
     def to_dict(self):
         """Convert model to dictionary for API responses."""
@@ -30,6 +42,7 @@ class User(Base):
             "password": self.password,
             "createdAt": self.created_at,
             "highScore": self.high_score,
+            "highScoreAt": self.high_score_at,
             "totalChops": self.total_chops,
             "gamesPlayed": self.games_played,
         }
@@ -39,14 +52,24 @@ class GameSession(Base):
     """GameSession model for storing game session information."""
     __tablename__ = "game_sessions"
 
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(UUIDString, primary_key=True)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
     score = Column(Integer, default=0, nullable=False)
     chops = Column(Integer, default=0, nullable=False)
     duration = Column(Float, default=0.0, nullable=False)
     started_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     ended_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # Serves per-user history pages newest first; on PostgreSQL the
+        # INCLUDE columns make them index-only scans. Also covers user_id lookups.
+        Index(
+            "ix_game_sessions_user_history",
+            user_id, started_at.desc(), id.desc(),
+            postgresql_include=["score", "chops", "duration", "ended_at"],
+        ),
+    )
+
     # Relationship to user
     user = relationship("User", back_populates="sessions")
 
@@ -61,3 +84,28 @@ class GameSession(Base):
             "startedAt": self.started_at,
             "endedAt": self.ended_at,
         }
+
+
+class UserStats(Base):
+    """Running aggregates over a user's ended game sessions."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(UUIDString, ForeignKey("users.id"), primary_key=True)
+    games = Column(Integer, default=0, nullable=False)
+    score_sum = Column(BigInteger, default=0, nullable=False)
+    best_score = Column(Integer, default=0, nullable=False)
+    chops_sum = Column(BigInteger, default=0, nullable=False)
+    duration_sum = Column(Float, default=0.0, nullable=False)
+    # Consecutive days with at least one game, ending on last_played_on
+    current_streak = Column(Integer, default=0, nullable=False)
+    best_streak = Column(Integer, default=0, nullable=False)
+    last_played_on = Column(Date, nullable=True)
+
+
+class IdempotencyKey(Base):
+    """Stored response for a request carrying an Idempotency-Key header."""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    response = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,151 @@
+"""Per-request deadlines.
+
+Each API request gets a latency budget for its route. The budget is enforced
+at two levels:
+
+- The ``enforce_deadline`` middleware answers ``504`` once the budget is
+  spent, whatever the handler is still doing.
+- Database work is bounded by what remains of the budget. On PostgreSQL every
+  transaction begins by setting ``statement_timeout`` and ``lock_timeout``
+  for that transaction only (``SET LOCAL``) from the time left. On SQLite a
+  progress handler interrupts a statement that runs past the deadline. A
+  transaction that would begin after the deadline raises
+  ``DeadlineExceeded`` instead.
+
+So a worker thread and its pooled connection are only held for about as long
+as the client is willing to wait. The deadline lives in a context variable,
+which Starlette copies into the thread pool running sync routes.
+"""
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional, Tuple
+
+from .metrics import registry
+
+# Milliseconds an API request may take before it is answered with 504
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "5000"))
+# Per-route budgets overriding the default, as comma-separated
+# "METHOD /path=ms" pairs with the route's path template; "none" removes the
+# deadline for that route
+ROUTE_DEADLINES_MS = os.getenv("ROUTE_DEADLINES_MS", "")
+# Share of the remaining budget a statement may spend waiting for a lock
+DB_LOCK_TIMEOUT_SHARE = float(os.getenv("DB_LOCK_TIMEOUT_SHARE", "0.5"))
+
+# Built-in budgets (milliseconds); None means no deadline
+DEFAULT_ROUTE_DEADLINES_MS: Dict[str, Optional[float]] = {
+    "GET /api/leaderboard": 1000,
+    "GET /api/leaderboard/distribution": 1000,
+    "POST /api/game/session": 1000,
+    "POST /api/game/session/{session_id}/end": 2000,
+    # Streams run for as long as the client keeps reading
+    "GET /api/leaderboard/export": None,
+    "GET /api/game/sessions/export": None,
+}
+
+# SQLSTATEs of PostgreSQL stopping a statement at statement_timeout
+# (query_canceled) or lock_timeout (lock_not_available)
+CANCELLED_SQLSTATES = {"57014", "55P03"}
+
+DEADLINE_EXCEEDED = registry.counter(
+    "request_deadline_exceeded_total", "Requests answered 504 after running out of their budget", ("route",)
+)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work would start after the request's deadline."""
+
+
+def parse_route_deadlines(spec: str) -> Dict[str, Optional[float]]:
+    """``ROUTE_DEADLINES_MS`` as a mapping of "METHOD /path" to milliseconds."""
+    budgets: Dict[str, Optional[float]] = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, value = pair.rpartition("=")
+        if not route:
+            raise ValueError(f"ROUTE_DEADLINES_MS entry {pair!r} is not METHOD /path=ms")
+        budgets[" ".join(route.split())] = None if value.strip().lower() == "none" else float(value)
+    return budgets
+
+
+route_deadlines_ms = {**DEFAULT_ROUTE_DEADLINES_MS, **parse_route_deadlines(ROUTE_DEADLINES_MS)}
+
+
+def budget_for(route: str) -> Optional[float]:
+    """Seconds allowed for ``route`` ("METHOD /path/template"), or None for no deadline."""
+    budget_ms = route_deadlines_ms.get(route, REQUEST_DEADLINE_MS)
+    return budget_ms / 1000 if budget_ms else None
+
+
+def start(seconds: float) -> Token:
+    """Set the deadline ``seconds`` from now for the current context."""
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def reset(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline; None when there is no deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def _sqlstate(error: BaseException) -> Optional[str]:
+    # psycopg (v3) names it sqlstate, psycopg2 pgcode
+    return getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+
+
+def is_deadline_error(error: BaseException) -> bool:
+    """Whether ``error`` is some request's deadline stopping database work.
+
+    Takes the driver error or SQLAlchemy's wrapper of it. Used where work ran
+    under another request's deadline, as a coalesced query does.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return True
+    original = getattr(error, "orig", None) or error
+    return _sqlstate(original) in CANCELLED_SQLSTATES or str(original) == "interrupted"
+
+
+def cancelled_by_deadline(error: BaseException) -> bool:
+    """Whether a driver error is the request's own deadline stopping its statement.
+
+    Past the deadline every failure counts (SQLite reports its interrupt as a
+    plain error). Before it, only PostgreSQL's timeout errors do: lock_timeout
+    fires with part of the budget still left.
+    """
+    left = remaining()
+    if left is None:
+        return False
+    if left <= 0:
+        return True
+    return _sqlstate(error) in CANCELLED_SQLSTATES
+
+
+def transaction_timeouts() -> Optional[Tuple[int, int]]:
+    """``(statement_timeout, lock_timeout)`` in milliseconds for the time left.
+
+    None when there is no deadline; raises ``DeadlineExceeded`` if there is
+    no time left.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    if left <= 0:
+        raise DeadlineExceeded()
+    # Zero would mean "no timeout" to PostgreSQL
+    statement_ms = max(1, int(left * 1000))
+    return statement_ms, max(1, int(statement_ms * DB_LOCK_TIMEOUT_SHARE))
+
+
+def sqlite_progress() -> int:
+    """SQLite progress handler: non-zero interrupts the running statement."""
+    return 1 if expired() else 0
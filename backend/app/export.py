@@ -0,0 +1,103 @@
+"""Streaming CSV/NDJSON exports.
+
+Exports are generators of text chunks, so a ``StreamingResponse`` (or the CLI)
+sends rows as the database cursor produces them and memory use stays flat
+however many rows there are. ``gzip_chunks`` compresses such a stream on the
+fly.
+
+The full leaderboard can also be exported from the command line::
+
+    python -m app.export --format csv --gzip -o leaderboard.csv.gz
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from . import ids
+
+# Rows encoded per chunk of a streamed export
+EXPORT_CHUNK_ROWS = 500
+
+LEADERBOARD_EXPORT_COLUMNS = ["rank", "id", "username", "highScore", "totalChops"]
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def encode_rows(rows: Iterable[dict], columns: List[str], export_format: str) -> Iterator[str]:
+    """Encode rows as CSV (with a header) or NDJSON, a chunk at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        record = {column: _plain(row[column]) for column in columns}
+        if writer:
+            writer.writerow(record.values())
+        else:
+            buffer.write(json.dumps(record) + "\n")
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip a stream of text chunks, flushing after each so clients see progress."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def encode_rank_cursor(row: dict) -> str:
+    """Cursor resuming a leaderboard export after ``row``."""
+    return f"{row['rank']}:{row['highScore']}:{row['id']}"
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[int, int, str]:
+    """``(rank, high_score, user_id)`` from ``rank:highScore:id``.
+
+    Raises ``ValueError`` if the cursor is malformed.
+    """
+    rank, high_score, user_id = cursor.split(":", 2)
+    if not ids.is_valid(user_id):
+        raise ValueError("cursor has an invalid user id")
+    return int(rank), int(high_score), user_id
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    import sys
+    from .database import ReadSessionLocal, SessionLocal, init_read_engine, read_pool_configured
+    from .db import database
+
+    parser = argparse.ArgumentParser(description="Export the full leaderboard.")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="ndjson")
+    parser.add_argument("--after", help="resume after this rank cursor (rank:highScore:id)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    after = decode_rank_cursor(args.after) if args.after else None
+    init_read_engine()
+    db = (ReadSessionLocal if read_pool_configured() else SessionLocal)()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        chunks = encode_rows(database.iter_leaderboard(db, after=after), LEADERBOARD_EXPORT_COLUMNS, args.format)
+        for chunk in gzip_chunks(chunks) if args.gzip else (chunk.encode() for chunk in chunks):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Generate a large synthetic dataset for scale testing.
+
+Usage:
+    uv run python -m app.generate --users 1000000 --sessions 10000000
+
+Users and their game sessions are produced in batches and written with bulk
+inserts (``COPY`` on PostgreSQL, multi-row executemany elsewhere), so memory
+stays flat however many rows are requested. Passwords are hashed once per
+password class rather than once per user; every generated account logs in with
+``password<class>`` (``password0``, ``password1``, ...).
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import func, select # type: ignore
+from .database import init_engine, init_db
+from .db_models import User, GameSession, UserStats
+from .auth_utils import hash_password
+from . import ids, stats
+
+USER_COLUMNS = [
+    "id", "username", "email", "password", "created_at", "high_score", "high_score_at", "total_chops", "games_played",
+]
+SESSION_COLUMNS = ["id", "user_id", "score", "chops", "duration", "started_at", "ended_at"]
+STATS_COLUMNS = ["user_id", *stats.EMPTY_STATS, "last_played_on"]
+
+# Seeded players score roughly 20 points per chop and chop about once per 0.7s
+POINTS_PER_CHOP = 20
+SECONDS_PER_CHOP = 0.7
+# Window in which generated accounts were created and played
+HISTORY_DAYS = 365
+
+
+def _time_ordered_id(at: datetime, rng: random.Random) -> str:
+    """Reproducible UUIDv7 for a row created at ``at``."""
+    return str(ids.uuid7_at(int(at.timestamp() * 1000), rng.getrandbits(74)))
+
+
+def generate_batches(
+    users: int,
+    sessions: int,
+    batch_size: int,
+    password_hashes: List[str],
+    start: int = 0,
+    seed: int = 0,
+) -> Iterator[Tuple[List[dict], List[dict]]]:
+    """Yield ``(users, sessions)`` row batches.
+
+    Player skill is log-normal, so a few players score far above the median,
+    and each player's session count is exponential around the requested mean.
+    User aggregates are computed from the sessions generated for them.
+    """
+    # Offsetting by ``start`` keeps reruns from regenerating the same ids
+    rng = random.Random(f"{seed}:{start}")
+    now = datetime.now(timezone.utc)
+    mean_sessions = sessions / users if users else 0
+
+    for batch_start in range(start, start + users, batch_size):
+        user_rows, session_rows = [], []
+        for n in range(batch_start, min(batch_start + batch_size, start + users)):
+            created_at = now - timedelta(seconds=rng.uniform(0, HISTORY_DAYS * 86400))
+            user_id = _time_ordered_id(created_at, rng)
+            skill = rng.lognormvariate(6.5, 0.8)
+            games = round(rng.expovariate(1 / mean_sessions)) if mean_sessions else 0
+
+            high_score = total_chops = 0
+            high_score_at = created_at
+            played_for = (now - created_at).total_seconds()
+            for _ in range(games):
+                score = max(0, int(rng.gauss(skill, skill * 0.35)))
+                chops = max(0, score // POINTS_PER_CHOP + rng.randint(-3, 3))
+                duration = round(chops * SECONDS_PER_CHOP + rng.uniform(1, 10), 1)
+                started_at = created_at + timedelta(seconds=rng.uniform(0, played_for))
+                ended_at = started_at + timedelta(seconds=duration)
+                session_rows.append({
+                    "id": _time_ordered_id(started_at, rng),
+                    "user_id": user_id,
+                    "score": score,
+                    "chops": chops,
+                    "duration": duration,
+                    "started_at": started_at,
+                    "ended_at": ended_at,
+                })
+                # Sessions come out of time order; keep the first to reach the best score
+                if score > high_score or (score == high_score and ended_at < high_score_at):
+                    high_score, high_score_at = score, ended_at
+                total_chops += chops
+
+            user_rows.append({
+                "id": user_id,
+                "username": f"Lumberjack{n}",
+                "email": f"lumberjack{n}@example.test",
+                "password": password_hashes[n % len(password_hashes)],
+                "created_at": created_at,
+                "high_score": high_score,
+                "high_score_at": high_score_at,
+                "total_chops": total_chops,
+                "games_played": games,
+            })
+        yield user_rows, session_rows
+
+
+def stats_rows(session_rows: List[dict]) -> List[dict]:
+    """``user_stats`` rows aggregating the given sessions."""
+    by_user = {}
+    for row in sorted(session_rows, key=lambda row: (row["user_id"], row["ended_at"])):
+        user_stats = by_user.get(row["user_id"])
+        if user_stats is None:
+            user_stats = by_user[row["user_id"]] = UserStats(user_id=row["user_id"], **stats.EMPTY_STATS)
+        stats.add_game(user_stats, row["score"], row["chops"], row["duration"], row["ended_at"])
+    return [{column: getattr(user_stats, column) for column in STATS_COLUMNS} for user_stats in by_user.values()]
+
+
+def _copy_rows(conn, table: str, columns: List[str], rows: List[dict]) -> None:
+    """Stream rows into PostgreSQL with COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def write_batch(conn, user_rows: List[dict], session_rows: List[dict]) -> None:
+    """Bulk insert one batch of users followed by their sessions and stats."""
+    user_stats = stats_rows(session_rows)
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        _copy_rows(conn, User.__tablename__, USER_COLUMNS, user_rows)
+        if session_rows:
+            _copy_rows(conn, GameSession.__tablename__, SESSION_COLUMNS, session_rows)
+            _copy_rows(conn, UserStats.__tablename__, STATS_COLUMNS, user_stats)
+        return
+    conn.execute(User.__table__.insert(), user_rows)
+    if session_rows:
+        conn.execute(GameSession.__table__.insert(), session_rows)
+        conn.execute(UserStats.__table__.insert(), user_stats)
+
+
+def generate_dataset(users: int, sessions: int, batch_size: int, password_classes: int, seed: int) -> None:
+    """Generate and insert the dataset, reporting progress per batch."""
+    init_db()
+    engine = init_engine()
+    password_hashes = [hash_password(f"password{i}") for i in range(password_classes)]
+
+    with engine.connect() as conn:
+        # Continue numbering after existing users so reruns add rather than collide
+        start = conn.execute(select(func.count()).select_from(User)).scalar_one()
+
+    started = time.perf_counter()
+    written_users = written_sessions = 0
+    batches = generate_batches(users, sessions, batch_size, password_hashes, start=start, seed=seed)
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            # A crash mid-load only loses generated data, so skip per-commit fsyncs
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.commit()
+        for user_rows, session_rows in batches:
+            with conn.begin():
+                write_batch(conn, user_rows, session_rows)
+            written_users += len(user_rows)
+            written_sessions += len(session_rows)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{written_users:>10} users, {written_sessions:>11} sessions "
+                f"({written_users / elapsed:,.0f} users/s)"
+            )
+
+    elapsed = time.perf_counter() - started
+    print(f"Generated {written_users} users and {written_sessions} sessions in {elapsed:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Lumberjack Legends dataset.")
+    parser.add_argument("--users", type=int, default=100_000, help="number of users to create")
+    parser.add_argument("--sessions", type=int, default=1_000_000, help="approximate number of game sessions")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="users written per transaction")
+    parser.add_argument("--password-classes", type=int, default=4, help="distinct passwords (one bcrypt hash each)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for reproducible datasets")
+    args = parser.parse_args()
+    generate_dataset(args.users, args.sessions, args.batch_size, max(1, args.password_classes), args.seed)
+
+
+if __name__ == "__main__":
+    main()
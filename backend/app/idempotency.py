@@ -0,0 +1,219 @@
+"""Idempotency-Key support for retried write requests.
+
+Responses are remembered per user, route and client-supplied key. A retry with
+the same key gets the stored response back without re-running the write.
+Entries live in a bounded in-memory LRU with a TTL; with
+``IDEMPOTENCY_STORE=db`` they are also written to the ``idempotency_keys``
+table so retries landing on another worker are answered too.
+
+A request claims its key before writing. While the claim is held, a duplicate
+is refused with ``RequestInProgress`` rather than applying the write again.
+In the table the claim is a pending row inserted in the write's own
+transaction, so it commits (or rolls back) together with the write.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, bindparam, text, update # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from . import db_models
+
+# How long a stored response is replayed for
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Upper bound on responses kept in memory per worker
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+# ``response`` of a row whose request has claimed the key but not finished
+PENDING = ""
+
+# Portable insert-if-absent; PostgreSQL and SQLite share the syntax. On
+# PostgreSQL a duplicate waits here until the claiming transaction ends.
+CLAIM_KEY = text(
+    "INSERT INTO idempotency_keys (key, response, expires_at) "
+    "VALUES (:key, :response, :expires_at) ON CONFLICT (key) DO NOTHING"
+).bindparams(bindparam("expires_at", type_=DateTime()))
+
+
+class RequestInProgress(Exception):
+    """Another request holding the same Idempotency-Key has not finished."""
+
+
+def scoped_key(user_id: str, scope: str, key: str) -> str:
+    """Namespace a client key so users and routes cannot collide."""
+    return f"{user_id}:{scope}:{key}"
+
+
+class IdempotencyStore:
+    """Bounded, TTL-evicting in-memory response store."""
+
+    def __init__(
+        self,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pending: set = set()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, key: str) -> Optional[dict]:
+        """Return the stored response for ``key`` if it has not expired."""
+        with self._lock:
+            return self._lookup(key)
+
+    def claim(self, db: Session, key: str) -> Optional[dict]:
+        """Reserve ``key`` for the calling request.
+
+        Returns ``None`` once reserved, or the stored response of an earlier
+        request with the same key. Raises ``RequestInProgress`` while another
+        request holds it. The reservation ends with ``put`` or ``release``.
+        """
+        with self._lock:
+            response = self._lookup(key)
+            if response is not None:
+                return response
+            if key in self._pending:
+                raise RequestInProgress(key)
+            self._pending.add(key)
+        return None
+
+    def release(self, key: str) -> None:
+        """Drop a reservation whose request ended without storing a response."""
+        with self._lock:
+            self._pending.discard(key)
+
+    def put(self, db: Session, key: str, response: dict) -> None:
+        """Remember the response for ``key``."""
+        self._remember(key, response)
+
+    def purge_expired(self, db: Session) -> int:
+        """Drop expired responses; returns the number removed."""
+        now = self.clock()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self) -> None:
+        """Forget every stored response."""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _remember(self, key: str, response: dict) -> None:
+        with self._lock:
+            self._pending.discard(key)
+            self._entries[key] = (self.clock() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            now = self.clock()
+            # Expired entries are dropped from the old end first, then the
+            # least recently used ones once the bound is exceeded.
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+
+
+class DbIdempotencyStore(IdempotencyStore):
+    """In-memory store backed by the ``idempotency_keys`` table."""
+
+    def get(self, db: Session, key: str) -> Optional[dict]:
+        response = super().get(db, key)
+        if response is not None:
+            return response
+        row = self._row(db, key)
+        if row is None or row.response == PENDING:
+            return None
+        response = json.loads(row.response)
+        self._remember(key, response)
+        return response
+
+    def claim(self, db: Session, key: str) -> Optional[dict]:
+        """Reserve ``key`` in memory and with a pending row (caller commits).
+
+        The row is left uncommitted, so it lands with the write that follows
+        it; if that write rolls back, so does the claim.
+        """
+        response = super().claim(db, key)
+        if response is not None:
+            return response
+        try:
+            now = datetime.now(timezone.utc)
+            expires_at = now + timedelta(seconds=self.ttl_seconds)
+            claimed = db.execute(CLAIM_KEY, {"key": key, "response": PENDING, "expires_at": expires_at}).rowcount
+            if not claimed:
+                # An expired row is taken over in place
+                claimed = db.execute(
+                    update(db_models.IdempotencyKey)
+                    .where(db_models.IdempotencyKey.key == key, db_models.IdempotencyKey.expires_at <= now)
+                    .values(response=PENDING, expires_at=expires_at)
+                ).rowcount
+            if claimed:
+                return None
+            row = self._row(db, key)
+            if row is None or row.response == PENDING:
+                raise RequestInProgress(key)
+        except BaseException:
+            self.release(key)
+            raise
+        response = json.loads(row.response)
+        self._remember(key, response)
+        return response
+
+    def put(self, db: Session, key: str, response: dict) -> None:
+        super().put(db, key, response)
+        db.merge(db_models.IdempotencyKey(
+            key=key,
+            response=json.dumps(response),
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds),
+        ))
+        db.commit()
+
+    def _row(self, db: Session, key: str) -> Optional[db_models.IdempotencyKey]:
+        return db.query(db_models.IdempotencyKey).filter(
+            db_models.IdempotencyKey.key == key,
+            db_models.IdempotencyKey.expires_at > datetime.now(timezone.utc),
+        ).first()
+
+    def purge_expired(self, db: Session) -> int:
+        """Drop expired responses and delete expired rows; returns the rows removed."""
+        super().purge_expired(db)
+        removed = db.query(db_models.IdempotencyKey).filter(
+            db_models.IdempotencyKey.expires_at <= datetime.now(timezone.utc)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """Build the store selected by ``IDEMPOTENCY_STORE`` (memory or db)."""
+    if os.getenv("IDEMPOTENCY_STORE", "memory").lower() == "db":
+        return DbIdempotencyStore()
+    return IdempotencyStore()
+
+
+# Process-wide store instance
+idempotency_store = create_idempotency_store()
@@ -0,0 +1,235 @@
+"""Time-ordered, compact primary keys.
+
+New users and game sessions get UUIDv7 ids (RFC 9562): a 48-bit millisecond
+timestamp followed by random bits. Rows inserted together land on the same
+B-tree pages instead of random ones, which keeps inserts cache-friendly and
+indexes dense.
+
+``UUIDString`` stores ids as native ``uuid`` on PostgreSQL and as 16-byte
+blobs elsewhere, instead of 36-character text. The Python value stays the
+canonical string, so API payloads and tokens are unchanged. Both encodings
+sort like the string form.
+
+Databases created before this change hold ids in text columns, including the
+non-UUID ids of the demo seed. Convert them with ``python -m app.ids``; see
+``migrate_ids``.
+"""
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import MetaData, inspect, select, text # type: ignore
+from sqlalchemy.types import LargeBinary, TypeDecorator # type: ignore
+
+# Namespace for deriving a stable UUID from a legacy non-UUID id
+LEGACY_NAMESPACE = uuid.UUID("6f1c0b52-5d1e-4d53-9a3c-1c0f2b7e4a10")
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7_at(ms: int, random_bits: int, counter: Optional[int] = None) -> uuid.UUID:
+    """UUIDv7 for a millisecond timestamp from 74 random bits.
+
+    ``counter`` replaces the 12 ``rand_a`` bits, to order ids within one
+    millisecond.
+    """
+    rand_a = (random_bits >> 62) & 0xFFF if counter is None else counter
+    rand_b = random_bits & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | rand_a << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def uuid7() -> uuid.UUID:
+    """New UUIDv7, increasing within this process even inside one millisecond."""
+    global _last_ms, _counter
+    random_bits = int.from_bytes(os.urandom(10), "big") >> 6
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms, _counter = ms, random.getrandbits(11)
+        else:
+            # Same millisecond (or the clock stepped back): count up instead
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms, _counter = _last_ms + 1, 0
+        return uuid7_at(_last_ms, random_bits, _counter)
+
+
+def new_id() -> str:
+    """New primary key value."""
+    return str(uuid7())
+
+
+def is_valid(value) -> bool:
+    """Whether ``value`` can be stored as an id (a UUID string)."""
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def legacy_id(value: str) -> str:
+    """The UUID form of an id from a text-keyed database.
+
+    UUID strings are kept; anything else (such as the seed's ``"1"``) maps to
+    a stable UUIDv5, so references to it can be rewritten consistently.
+    """
+    if is_valid(value):
+        return str(uuid.UUID(value))
+    return str(uuid.uuid5(LEGACY_NAMESPACE, value))
+
+
+class UUIDString(TypeDecorator):
+    """UUID column whose Python value is the canonical string."""
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import UUID # type: ignore
+            return dialect.type_descriptor(UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        # Raises ValueError for non-UUID values; callers validate untrusted ids
+        value = uuid.UUID(str(value))
+        return str(value) if dialect.name == "postgresql" else value.bytes
+
+    def literal_processor(self, dialect):
+        # Rendered by hand: the BLOB impl has no literal form for these values
+        def process(value):
+            value = uuid.UUID(str(value))
+            return f"'{value}'" if dialect.name == "postgresql" else f"X'{value.hex}'"
+        return process
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return str(uuid.UUID(bytes=bytes(value)))
+        return str(value)
+
+
+# (table, column) pairs holding user or session ids; parents first
+ID_COLUMNS = [
+    ("users", "id"),
+    ("game_sessions", "id"),
+    ("game_sessions", "user_id"),
+    ("user_stats", "user_id"),
+]
+
+
+def _legacy_tables(conn):
+    """Tables whose id columns are still text, in ``ID_COLUMNS`` order."""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    tables = []
+    for table, column in ID_COLUMNS:
+        if table not in existing or table in tables:
+            continue
+        types = {col["name"]: col["type"] for col in inspector.get_columns(table)}
+        if column in types and types[column].python_type is str:
+            tables.append(table)
+    return tables
+
+
+def _migrate_postgresql(conn, tables) -> int:
+    """Rewrite non-UUID ids, then change the column types in place."""
+    inspector = inspect(conn)
+    foreign_keys = [
+        (table, fk) for table in tables for fk in inspector.get_foreign_keys(table)
+        if fk["referred_table"] == "users"
+    ]
+    for table, fk in foreign_keys:
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{fk["name"]}"'))
+
+    rewritten = 0
+    for table, column in ID_COLUMNS:
+        if table not in tables:
+            continue
+        legacy = conn.execute(text(
+            f"SELECT DISTINCT {column} FROM {table} "
+            f"WHERE {column} !~* '^[0-9a-f]{{8}}-?([0-9a-f]{{4}}-?){{3}}[0-9a-f]{{12}}$'"
+        )).scalars().all()
+        for value in legacy:
+            rewritten += conn.execute(
+                text(f"UPDATE {table} SET {column} = :new WHERE {column} = :old"),
+                {"new": legacy_id(value), "old": value},
+            ).rowcount
+    for table, column in ID_COLUMNS:
+        if table in tables:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid"))
+
+    for table, fk in foreign_keys:
+        conn.execute(text(
+            f'ALTER TABLE {table} ADD CONSTRAINT "{fk["name"]}" '
+            f'FOREIGN KEY ({", ".join(fk["constrained_columns"])}) '
+            f'REFERENCES users ({", ".join(fk["referred_columns"])})'
+        ))
+    return rewritten
+
+
+def _migrate_by_copy(conn, tables, batch_size: int) -> int:
+    """Rebuild each table with blob ids (SQLite cannot change column types)."""
+    from .database import Base
+    from . import db_models # noqa: F401  (registers the tables)
+
+    inspector = inspect(conn)
+    for table in tables:
+        for index in inspector.get_indexes(table):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_legacy"))
+    Base.metadata.create_all(bind=conn, tables=[Base.metadata.tables[table] for table in tables])
+
+    copied = 0
+    for table in tables:
+        target = Base.metadata.tables[table]
+        id_columns = [column for name, column in ID_COLUMNS if name == table]
+        # Read the old rows through the new column types so dates are parsed
+        legacy = target.to_metadata(MetaData(), name=f"{table}_legacy")
+        present = {column["name"] for column in inspector.get_columns(f"{table}_legacy")}
+        result = conn.execute(select(*[column for column in legacy.c if column.name in present])).mappings()
+        while True:
+            rows = [dict(row) for row in result.fetchmany(batch_size)]
+            if not rows:
+                break
+            for row in rows:
+                for column in id_columns:
+                    row[column] = legacy_id(row[column])
+            conn.execute(target.insert(), rows)
+            copied += len(rows)
+    for table in reversed(tables):
+        conn.execute(text(f"DROP TABLE {table}_legacy"))
+    return copied
+
+
+def migrate_ids(engine, batch_size: int = 10000) -> int:
+    """Convert text id columns to ``UUIDString`` storage.
+
+    Non-UUID ids are replaced by ``legacy_id`` everywhere they appear. Safe to
+    rerun: tables already converted are skipped. Returns the rows rewritten
+    (on SQLite every row is, since the tables are rebuilt).
+    Mirrored leaderboard stores hold the old ids and need a rebuild afterwards
+    (``python -m app.leaderboard_store``).
+    """
+    with engine.begin() as conn:
+        tables = _legacy_tables(conn)
+        if not tables:
+            return 0
+        if conn.dialect.name == "postgresql":
+            return _migrate_postgresql(conn, tables)
+        return _migrate_by_copy(conn, tables, batch_size)
+
+
+if __name__ == "__main__":
+    from .database import init_engine
+    print(f"Migrated ids; {migrate_ids(init_engine())} rows rewritten")
@@ -0,0 +1,383 @@
+"""Pluggable leaderboard storage.
+
+``Database`` keeps ``users`` as the source of truth and forwards leaderboard
+reads and score updates to a ``LeaderboardStore``:
+
+- ``SqlLeaderboardStore`` answers straight from the ``users`` table (default).
+- ``RedisLeaderboardStore`` mirrors high scores into Redis sorted sets so
+  reads and rank lookups never touch the primary database.
+- ``InMemoryLeaderboardStore`` is a pure-Python stand-in with the same
+  semantics, used for tests and single-process deployments.
+
+Mirrored stores are rebuilt from ``users`` after a cold start with ``rebuild``.
+``app.server`` runs it once before starting its workers, and
+``python -m app.leaderboard_store`` runs it as a one-off job.
+"""
+import abc
+import bisect
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session # type: ignore
+from . import db_models
+from .ranking import DEFAULT_RANK_MODE, TOP_USERS, USER_RANK, assign_ranks, moment, sort_key
+
+# Number of users written to a mirrored store per round trip during rebuild
+REBUILD_BATCH_SIZE = 1000
+# Seconds a Redis rebuild holds its lock before another rebuild may take over
+REBUILD_LOCK_SECONDS = 600
+# Scores raised this long before a rebuild started are reapplied after the
+# swap, covering clock skew between the workers that stamped them
+REBUILD_CATCH_UP_SECONDS = 60
+
+
+def _entry(user: dict) -> dict:
+    """Fields a leaderboard entry needs from a user dict."""
+    return {
+        "id": user["id"],
+        "username": user["username"],
+        "highScore": user["highScore"],
+        "highScoreAt": user.get("highScoreAt"),
+        "totalChops": user["totalChops"],
+    }
+
+
+def _iter_users(db: Session, raised_since: Optional[datetime] = None):
+    """Stream every user (or those whose high score rose since a moment) as a leaderboard entry."""
+    query = db.query(
+        db_models.User.id,
+        db_models.User.username,
+        db_models.User.high_score,
+        db_models.User.high_score_at,
+        db_models.User.total_chops,
+    )
+    if raised_since is not None:
+        query = query.filter(db_models.User.high_score_at >= raised_since)
+    query = query.yield_per(REBUILD_BATCH_SIZE)
+    for user_id, username, high_score, high_score_at, total_chops in query:
+        yield {
+            "id": user_id,
+            "username": username,
+            "highScore": high_score,
+            "highScoreAt": high_score_at,
+            "totalChops": total_chops,
+        }
+
+
+class LeaderboardStore(abc.ABC):
+    """Interface for leaderboard reads and score updates.
+
+    Every store orders and ranks players the same way; see ``app.ranking``
+    for the order and the ``rank``, ``dense`` and ``row`` tie modes.
+    """
+
+    # Whether the store keeps its own copy of the data that must be rebuilt
+    mirrored = False
+    # Whether that copy is shared by every worker rather than held per process
+    shared = False
+
+    @abc.abstractmethod
+    def get_leaderboard(self, db: Session, limit: int = 10, mode: str = DEFAULT_RANK_MODE) -> List[dict]:
+        """Get top users by high score, each with its ``rank``."""
+
+    @abc.abstractmethod
+    def get_user_rank(self, db: Session, user_id: str, mode: str = DEFAULT_RANK_MODE) -> int:
+        """Get user's rank based on high score, or 0 if unranked."""
+
+    @abc.abstractmethod
+    def submit_score(self, user: dict) -> None:
+        """Record a user's current high score, username and chops.
+
+        The stored score only ever increases (``ZADD GT`` semantics).
+        """
+
+    def rebuild(self, db: Session) -> int:
+        """Rebuild the store from the ``users`` table; returns the user count."""
+        return 0
+
+
+class SqlLeaderboardStore(LeaderboardStore):
+    """Leaderboard served directly from the ``users`` table."""
+
+    def get_leaderboard(self, db: Session, limit: int = 10, mode: str = DEFAULT_RANK_MODE) -> List[dict]:
+        rows = db.connection().execute(TOP_USERS[mode], {"limit": limit})
+        return [
+            {
+                "id": row.id, "username": row.username, "highScore": row.high_score,
+                "highScoreAt": row.high_score_at, "totalChops": row.total_chops, "rank": row.rank,
+            }
+            for row in rows
+        ]
+
+    def get_user_rank(self, db: Session, user_id: str, mode: str = DEFAULT_RANK_MODE) -> int:
+        rank = db.connection().execute(USER_RANK[mode], {"user_id": user_id}).scalar()
+        return rank or 0
+
+    def submit_score(self, user: dict) -> None:
+        # The users table already holds the score
+        pass
+
+
+class InMemoryLeaderboardStore(LeaderboardStore):
+    """Process-local sorted leaderboard with the same semantics as the SQL store."""
+
+    mirrored = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        # Sorted by ranking.sort_key: (-score, reached at, user_id)
+        self._order: List[Tuple[int, float, str]] = []
+        # Distinct negated scores, sorted, and how many players hold each
+        self._scores: List[int] = []
+        self._holders: Dict[int, int] = {}
+
+    def get_leaderboard(self, db: Session, limit: int = 10, mode: str = DEFAULT_RANK_MODE) -> List[dict]:
+        with self._lock:
+            entries = [dict(self._entries[key[2]]) for key in self._order[:limit]]
+        return assign_ranks(entries, mode)
+
+    def get_user_rank(self, db: Session, user_id: str, mode: str = DEFAULT_RANK_MODE) -> int:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return 0
+            if mode == "row":
+                return bisect.bisect_left(self._order, sort_key(entry)) + 1
+            if mode == "dense":
+                return bisect.bisect_left(self._scores, -entry["highScore"]) + 1
+            return bisect.bisect_left(self._order, (-entry["highScore"],)) + 1
+
+    def submit_score(self, user: dict) -> None:
+        entry = _entry(user)
+        with self._lock:
+            existing = self._entries.get(entry["id"])
+            if existing is not None and entry["highScore"] <= existing["highScore"]:
+                entry["highScore"], entry["highScoreAt"] = existing["highScore"], existing["highScoreAt"]
+            else:
+                if existing is not None:
+                    self._remove(existing)
+                self._add(entry)
+            self._entries[entry["id"]] = entry
+
+    def rebuild(self, db: Session) -> int:
+        entries = {entry["id"]: entry for entry in _iter_users(db)}
+        holders: Dict[int, int] = {}
+        for entry in entries.values():
+            holders[-entry["highScore"]] = holders.get(-entry["highScore"], 0) + 1
+        order = sorted(sort_key(entry) for entry in entries.values())
+        with self._lock:
+            self._entries = entries
+            self._order = order
+            self._scores = sorted(holders)
+            self._holders = holders
+        return len(entries)
+
+    def _add(self, entry: dict) -> None:
+        bisect.insort(self._order, sort_key(entry))
+        score = -entry["highScore"]
+        if not self._holders.get(score):
+            bisect.insort(self._scores, score)
+        self._holders[score] = self._holders.get(score, 0) + 1
+
+    def _remove(self, entry: dict) -> None:
+        del self._order[bisect.bisect_left(self._order, sort_key(entry))]
+        score = -entry["highScore"]
+        self._holders[score] -= 1
+        if not self._holders[score]:
+            del self._holders[score]
+            del self._scores[bisect.bisect_left(self._scores, score)]
+
+
+# Scores are stored inverted and zero-padded in sorted-set members so that
+# lexicographic order is leaderboard order; they must stay below this.
+REDIS_SCORE_LIMIT = 10**12
+
+
+def _inverted(score: int) -> str:
+    return f"{REDIS_SCORE_LIMIT - 1 - score:012d}"
+
+
+def _member(entry: dict) -> str:
+    """Sorted-set member placing ``entry`` in leaderboard order."""
+    return f"{_inverted(entry['highScore'])}:{round(moment(entry['highScoreAt']) * 1000):013d}:{entry['id']}"
+
+
+class RedisLeaderboardStore(LeaderboardStore):
+    """Leaderboard kept in Redis sorted sets plus a hash of display fields.
+
+    All sorted-set scores are 0 and members sort lexicographically:
+
+    - ``<key>:scores`` has one member per player, ``<inverted score>:<reached
+      at ms>:<id>``, so ``ZRANGEBYLEX`` reads the leaderboard in order and
+      ``ZLEXCOUNT`` counts the players ahead of anyone in O(log n).
+    - ``<key>:distinct`` has one member per score that some player holds,
+      for ``dense`` ranks.
+
+    A rebuild holds ``<key>:rebuild-lock`` for its duration, so concurrent
+    rebuilds (several hosts starting at once) do not swap over each other.
+    """
+
+    mirrored = True
+    shared = True
+
+    def __init__(self, client, key: str = "leaderboard"):
+        self.client = client
+        self.scores_key = f"{key}:scores"
+        self.distinct_key = f"{key}:distinct"
+        self.users_key = f"{key}:users"
+        self.lock_key = f"{key}:rebuild-lock"
+
+    def get_leaderboard(self, db: Session, limit: int = 10, mode: str = DEFAULT_RANK_MODE) -> List[dict]:
+        members = self.client.zrangebylex(self.scores_key, "-", "+", start=0, num=limit)
+        if not members:
+            return []
+        user_ids = [member.split(":", 2)[2] for member in members]
+        metas = self.client.hmget(self.users_key, user_ids)
+        entries = []
+        for member, user_id, meta in zip(members, user_ids, metas):
+            fields = self._fields(meta) if meta else {"username": "", "totalChops": 0, "highScoreAt": None}
+            entries.append({
+                "id": user_id,
+                "username": fields["username"],
+                "highScore": REDIS_SCORE_LIMIT - 1 - int(member.split(":", 1)[0]),
+                "highScoreAt": fields["highScoreAt"],
+                "totalChops": fields["totalChops"],
+            })
+        return assign_ranks(entries, mode)
+
+    def get_user_rank(self, db: Session, user_id: str, mode: str = DEFAULT_RANK_MODE) -> int:
+        meta = self.client.hget(self.users_key, user_id)
+        if meta is None:
+            return 0
+        entry = dict(self._fields(meta), id=user_id)
+        if mode == "row":
+            return self.client.zlexcount(self.scores_key, "-", f"({_member(entry)}") + 1
+        if mode == "dense":
+            return self.client.zlexcount(self.distinct_key, "-", f"({_inverted(entry['highScore'])}") + 1
+        return self.client.zlexcount(self.scores_key, "-", f"({_inverted(entry['highScore'])}") + 1
+
+    def submit_score(self, user: dict) -> None:
+        def write(pipe):
+            # Runs under WATCH on the scores set; redis-py retries it if
+            # another writer changes the set before EXEC
+            entry = _entry(user)
+            meta = pipe.hget(self.users_key, entry["id"])
+            existing = dict(self._fields(meta), id=entry["id"]) if meta else None
+            if existing is not None and entry["highScore"] <= existing["highScore"]:
+                entry["highScore"], entry["highScoreAt"] = existing["highScore"], existing["highScoreAt"]
+                existing = None
+                raised = False
+            else:
+                raised = True
+            # Whether the old score is left with no other holder
+            last_holder = existing is not None and pipe.zlexcount(
+                self.scores_key, f"[{_inverted(existing['highScore'])}:", f"({_inverted(existing['highScore'])};"
+            ) == 1
+            pipe.multi()
+            if existing is not None:
+                pipe.zrem(self.scores_key, _member(existing))
+                if last_holder:
+                    pipe.zrem(self.distinct_key, _inverted(existing["highScore"]))
+            if raised:
+                pipe.zadd(self.scores_key, {_member(entry): 0})
+                pipe.zadd(self.distinct_key, {_inverted(entry["highScore"]): 0})
+            self._write_fields(pipe, self.users_key, entry)
+
+        self.client.transaction(write, self.scores_key)
+
+    def rebuild(self, db: Session) -> int:
+        """Rebuild from ``users``; returns 0 without writing if another rebuild holds the lock."""
+        token = uuid.uuid4().hex
+        if not self.client.set(self.lock_key, token, nx=True, ex=REBUILD_LOCK_SECONDS):
+            return 0
+        try:
+            return self._rebuild(db, token)
+        finally:
+            if self.client.get(self.lock_key) == token:
+                self.client.delete(self.lock_key)
+
+    def _rebuild(self, db: Session, token: str) -> int:
+        started = datetime.now(timezone.utc)
+        # Build into temporary keys of this run's own and swap them in so
+        # readers never see a half-populated leaderboard.
+        keys = [self.scores_key, self.distinct_key, self.users_key]
+        tmp_scores, tmp_distinct, tmp_users = [f"{key}:rebuild:{token}" for key in keys]
+        count = 0
+        pipe = self.client.pipeline()
+        for entry in _iter_users(db):
+            pipe.zadd(tmp_scores, {_member(entry): 0})
+            pipe.zadd(tmp_distinct, {_inverted(entry["highScore"]): 0})
+            self._write_fields(pipe, tmp_users, entry)
+            count += 1
+            if count % REBUILD_BATCH_SIZE == 0:
+                pipe.execute()
+        pipe.execute()
+
+        if count:
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.rename(f"{key}:rebuild:{token}", key)
+            pipe.execute()
+        else:
+            self.client.delete(*keys)
+
+        # Scores raised while the snapshot was read went to the keys just
+        # replaced; reapply them (submit_score only ever raises a score). The
+        # read transaction is ended first so the query sees those commits.
+        db.rollback()
+        for entry in _iter_users(db, started - timedelta(seconds=REBUILD_CATCH_UP_SECONDS)):
+            self.submit_score(entry)
+        return count
+
+    @staticmethod
+    def _fields(meta: str) -> dict:
+        fields = json.loads(meta)
+        reached = fields.get("highScoreAt")
+        fields["highScoreAt"] = datetime.fromtimestamp(reached / 1000, timezone.utc) if reached else None
+        return fields
+
+    @staticmethod
+    def _write_fields(pipe, users_key: str, entry: dict) -> None:
+        pipe.hset(users_key, entry["id"], json.dumps({
+            "username": entry["username"],
+            "totalChops": entry["totalChops"],
+            "highScore": entry["highScore"],
+            "highScoreAt": round(moment(entry["highScoreAt"]) * 1000),
+        }))
+
+
+def create_leaderboard_store() -> LeaderboardStore:
+    """Build the store selected by ``LEADERBOARD_BACKEND`` (sql, memory or redis)."""
+    backend = os.getenv("LEADERBOARD_BACKEND", "sql").lower()
+    if backend == "memory":
+        return InMemoryLeaderboardStore()
+    if backend == "redis":
+        import redis # type: ignore
+        client = redis.Redis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+        return RedisLeaderboardStore(client)
+    return SqlLeaderboardStore()
+
+
+def reconcile(store: LeaderboardStore) -> int:
+    """Rebuild a mirrored store from the ``users`` table."""
+    if not store.mirrored:
+        return 0
+    from .database import SessionLocal, init_engine
+    init_engine()
+    db = SessionLocal()
+    try:
+        return store.rebuild(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    count = reconcile(create_leaderboard_store())
+    print(f"Rebuilt leaderboard store with {count} users")
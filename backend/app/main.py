@@ -1,28 +1,287 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, APIRouter # type: ignore
+from fastapi import FastAPI, Depends, HTTPException, status, Query, APIRouter, Header, Request # type: ignore
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
-import jwt # type: ignore
+from fastapi.concurrency import run_in_threadpool # type: ignore
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse # type: ignore
+from contextlib import asynccontextmanager, suppress
+import anyio # type: ignore
+import asyncio
+import base64
+import json
+import logging
+import math
 import os
+import re
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Literal, Optional
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError # type: ignore
 from sqlalchemy.orm import Session # type: ignore
 from .models import (
-    User, AuthResponse, LoginRequest, SignupRequest, ProfileUpdateRequest,
-    LeaderboardResponse, LeaderboardEntry, ScoreSubmitRequest,
-    GameSessionResponse, SessionEndRequest
+    User, AuthResponse, AvailabilityResponse, LoginRequest, SignupRequest, ProfileUpdateRequest,
+    LeaderboardResponse, LeaderboardEntry, ScoreSubmitRequest, DistributionResponse,
+    GameSessionResponse, SessionEndRequest, SessionHistoryResponse, GameStats, StatsResponse
 )
-from .db import database
-from .database import get_db, init_db
-from .auth_utils import hash_password, verify_password
+from .db import database, DuplicateUserError
+from . import ids
+from .bloom import taken_names, SIGNUP_BLOOM_FILTER
+from .score_histogram import score_histogram, MAX_DISTRIBUTION_BINS
+from .cache_bus import invalidation_bus, PostgresBus, VersionedCache
+from .leaderboard_store import reconcile
+from .ranking import DEFAULT_RANK_MODE
+from .metrics import registry as metrics_registry
+from .circuit_breaker import db_breaker
+from . import deadline
+from starlette.routing import Match # type: ignore
+from .spool import session_spool
+from .idempotency import idempotency_store, scoped_key, RequestInProgress
+from .database import (
+    get_db, init_db, init_engine, init_read_engine, read_pool_configured, read_replica_configured, track_writes, dispose_engine, warm_pool,
+    SessionLocal, ReadSessionLocal, THREADPOOL_SIZE,
+)
+from .auth_utils import hash_password, verify_password, password_executor, PasswordExecutorOverloaded
+from .rate_limit import auth_rate_limiter
+from .export import encode_rows, gzip_chunks, decode_rank_cursor, LEADERBOARD_EXPORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard pages cached per worker until the next committed score change
+leaderboard_cache = VersionedCache(invalidation_bus, "leaderboard")
+# The cache holds the longest page served; shorter pages are slices of it
+LEADERBOARD_MAX_LIMIT = 100
+
+# Connections opened at startup so the first requests don't pay for connecting
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", "4"))
+# Set by app.server for its workers: the supervisor has already created the
+# tables and rebuilt any mirrored leaderboard store before starting them
+SUPERVISED = os.getenv("APP_SUPERVISED") == "1"
+# Seconds between background maintenance runs (expired idempotency keys, ...)
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "300"))
+
+# After a write, a client reads from the primary for this long so it sees its
+# own changes; replica reads are also cached no longer than this.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "lumberjack_primary"
+
+# Last top page served per ranking mode, answered (marked stale) while the
+# database is unavailable
+leaderboard_snapshots: dict = {}
+
+def top_leaderboard(db: Session, mode: str = DEFAULT_RANK_MODE) -> list:
+    """Top ``LEADERBOARD_MAX_LIMIT`` entries, served from the cache when current."""
+    def compute():
+        return database.get_leaderboard(db, LEADERBOARD_MAX_LIMIT, mode)
+    if db.info.get("read_your_writes"):
+        # The cached page may come from a replica that hasn't seen this client's write
+        entries = compute()
+    else:
+        max_age = READ_YOUR_WRITES_SECONDS if db.info.get("replica") else None
+        entries = leaderboard_cache.get_or_compute(("top", mode), compute, max_age=max_age)
+    leaderboard_snapshots[mode] = entries
+    return entries
+
+def apply_spooled_session_end(entry: dict) -> None:
+    """Write one spooled session end, remembering its response for retries."""
+    db = SessionLocal()
+    try:
+        session = database.end_session(db, entry["session_id"], entry["score"], entry["chops"], entry["duration"])
+        if session is None:
+            logger.warning("Dropping spooled end of unknown session %s", entry["session_id"])
+            return
+        response = GameSessionResponse(success=True, session=session)
+        remember_response(db, entry["user_id"], f"session-end:{entry['session_id']}", entry["idempotency_key"], response)
+    finally:
+        db.close()
+
+def replay_session_spool() -> int:
+    """Write spooled session ends to the database; stops at the first failure."""
+    try:
+        return session_spool.replay(apply_spooled_session_end)
+    except Exception:
+        logger.exception("Replaying spooled session ends stopped")
+        return 0
+
+def _replay_when_closed() -> None:
+    # Runs on the thread whose query closed the breaker; replay off that path
+    threading.Thread(target=replay_session_spool, name="spool-replay", daemon=True).start()
+
+db_breaker.on_close(_replay_when_closed)
+
+def run_maintenance() -> None:
+    """Flush and purge work that does not belong on the request path."""
+    replay_session_spool()
+    db = SessionLocal()
+    try:
+        idempotency_store.purge_expired(db)
+        # Pick up high scores raised and names taken on other workers
+        score_histogram.load(db)
+        if SIGNUP_BLOOM_FILTER and not taken_names.exclusive:
+            taken_names.load(db)
+    finally:
+        db.close()
+
+async def maintenance_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(run_maintenance)
+        except Exception:
+            logger.exception("Background maintenance failed")
+
+def startup() -> None:
+    """Bring up the engine, pools and caches before the first request."""
+    if not SUPERVISED:
+        init_db()
+    warm_pool(init_engine(), DB_POOL_WARMUP)
+    if read_pool_configured():
+        warm_pool(init_read_engine(), DB_POOL_WARMUP)
+    password_executor.start()
+    # The supervisor rebuilds a shared (Redis) store once; a process-local
+    # one only exists here, so every worker fills its own
+    if not (SUPERVISED and database.leaderboard_store.shared):
+        reconcile(database.leaderboard_store)
+    # Session ends a previous process accepted while the database was down
+    replay_session_spool()
+    db = SessionLocal()
+    try:
+        if SIGNUP_BLOOM_FILTER:
+            # Other workers (or hosts sharing PostgreSQL) sign users up too
+            taken_names.exclusive = (int(os.getenv("WEB_CONCURRENCY", "1")) <= 1
+                                     and not isinstance(invalidation_bus, PostgresBus))
+            taken_names.load(db)
+        score_histogram.load(db)
+        top_leaderboard(db)
+    finally:
+        db.close()
+    invalidation_bus.start()
+
+def shutdown() -> None:
+    """Drain in-flight work and release every pool."""
+    invalidation_bus.stop()
+    password_executor.shutdown(wait=True)
+    try:
+        run_maintenance()
+    finally:
+        session_spool.dispose()
+        dispose_engine()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    await run_in_threadpool(startup)
+    maintenance = asyncio.create_task(maintenance_loop(MAINTENANCE_INTERVAL_SECONDS))
+    try:
+        yield
+    finally:
+        maintenance.cancel()
+        with suppress(asyncio.CancelledError):
+            await maintenance
+        await run_in_threadpool(shutdown)
 
 app = FastAPI(
     title="Lumberjack Legends API",
     version="0.1.0",
     description="Backend for Lumberjack Legends",
     docs_url="/api/docs",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan,
 )
 
+# Routes answered while the database is unavailable: they never touch it, or
+# they have a degraded mode of their own (stale leaderboard, spooled session end)
+DATABASE_FREE_PATHS = {"/api/health", "/api/metrics", "/api/auth/logout", "/api/docs", "/api/openapi.json"}
+DEGRADED_ROUTES = re.compile(r"(GET /api/leaderboard|POST /api/game/session/[^/]+/end)")
+
+def database_available(request: Request) -> bool:
+    """Whether the circuit breaker let this request through to the database."""
+    return getattr(request.state, "database_available", True)
+
+def database_unavailable_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database unavailable, try again shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(db_breaker.retry_after())))},
+    )
+
+# Registered before CORS so that CORS wraps it and its 503s carry CORS headers
+@app.middleware("http")
+async def fail_fast_without_database(request: Request, call_next):
+    """Refuse database-backed requests at once while the circuit breaker is open."""
+    path = request.url.path
+    if not path.startswith("/api/") or path in DATABASE_FREE_PATHS:
+        return await call_next(request)
+    request.state.database_available = db_breaker.allow()
+    if not request.state.database_available and not DEGRADED_ROUTES.fullmatch(f"{request.method} {path}"):
+        return database_unavailable_response()
+    return await call_next(request)
+
+# Errors meaning the database is unreachable or not keeping up
+DATABASE_ERRORS = (OperationalError, PoolTimeoutError)
+
+def record_database_error(exc: Exception) -> None:
+    # The engine reports operational errors itself; a pool checkout timing out
+    # never reaches it. That includes a wait cut short by the deadline: no
+    # connection came free within the request's budget.
+    if isinstance(exc, PoolTimeoutError):
+        db_breaker.record_failure()
+
+async def database_error_handler(request: Request, exc: Exception):
+    record_database_error(exc)
+    if deadline.expired():
+        # statement_timeout, or SQLite interrupting a statement, at the deadline
+        return deadline_exceeded_response(request)
+    return database_unavailable_response()
+
+for error in DATABASE_ERRORS:
+    app.add_exception_handler(error, database_error_handler)
+
+def route_name(request: Request) -> str:
+    """The "METHOD /path/template" of the route a request resolves to."""
+    for route in router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return f"{request.method} {route.path}"
+    return f"{request.method} unmatched"
+
+def deadline_exceeded_response(request: Request) -> JSONResponse:
+    deadline.DEADLINE_EXCEEDED.inc(route=route_name(request))
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "Request took too long"},
+    )
+
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_handler(request: Request, exc: deadline.DeadlineExceeded):
+    return deadline_exceeded_response(request)
+
+# Outside the breaker check, inside CORS
+@app.middleware("http")
+async def enforce_deadline(request: Request, call_next):
+    """Answer 504 once a request has used up its route's latency budget."""
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    budget = deadline.budget_for(route_name(request))
+    if budget is None:
+        return await call_next(request)
+    # Copied into the task and thread serving the request; bounds its database work
+    token = deadline.start(budget)
+    try:
+        handler = asyncio.ensure_future(call_next(request))
+    finally:
+        deadline.reset(token)
+    done, _ = await asyncio.wait({handler}, timeout=budget)
+    if handler in done:
+        return handler.result()
+    # A sync handler's thread cannot be interrupted, and cancelling waits for
+    # it, so answer now; its database work is already cut off at the deadline
+    handler.cancel()
+    handler.add_done_callback(_discard_outcome)
+    return deadline_exceeded_response(request)
+
+def _discard_outcome(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,10 +291,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database on startup
-@app.on_event("startup")
-def startup_event():
-    init_db()
+@app.middleware("http")
+async def stick_writers_to_primary(request: Request, call_next):
+    """Mark clients that just wrote so their next reads skip the replica."""
+    if not read_replica_configured():
+        return await call_next(request)
+    writes = track_writes()
+    response = await call_next(request)
+    if writes["wrote"]:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, "1",
+            max_age=max(1, math.ceil(READ_YOUR_WRITES_SECONDS)), httponly=True, samesite="lax",
+        )
+    return response
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Session for read-only queries: the read pool, unless this client just wrote (replicas only)."""
+    if not read_pool_configured():
+        yield db
+        return
+    if request.cookies.get(READ_YOUR_WRITES_COOKIE):
+        db.info["read_your_writes"] = True
+        yield db
+        return
+    init_read_engine()
+    read_db = ReadSessionLocal()
+    if read_replica_configured():
+        read_db.info["replica"] = True
+    try:
+        yield read_db
+    finally:
+        read_db.close()
 
 # Security
 security = HTTPBearer()
@@ -43,6 +329,7 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    import jwt # type: ignore
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -52,10 +339,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
+def token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    """User id a valid bearer token was issued to; checked without the database."""
+    import jwt # type: ignore
     token = credentials.credentials
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -64,12 +350,99 @@ def get_current_user(
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    
-    user = database.get_user_by_id(db, user_id)
+    return user_id
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    try:
+        user = database.get_user_by_id(db, token_subject(credentials))
+    finally:
+        # Hand the primary connection back at once. Many routes only read
+        # (some stream for as long as the client reads), and SQLite's primary
+        # is a single connection that every writer queues for.
+        db.rollback()
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
+def get_playing_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """The current user; while the database is unavailable, only the token's user id."""
+    if not database_available(request):
+        return {"id": token_subject(credentials)}
+    return get_current_user(credentials, db)
+
+def claim_response(db: Session, user_id: str, scope: str, key: Optional[str]) -> Optional[dict]:
+    """Claim a request's Idempotency-Key; returns the stored response for a retry, if any.
+
+    A duplicate arriving while the first request with the key still runs gets
+    a 409 instead of applying the write a second time.
+    """
+    if not key:
+        return None
+    try:
+        return idempotency_store.claim(db, scoped_key(user_id, scope, key))
+    except RequestInProgress:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"},
+        )
+
+def release_claim(user_id: str, scope: str, key: Optional[str]) -> None:
+    """End a claim whose request finished without storing a response."""
+    if key:
+        idempotency_store.release(scoped_key(user_id, scope, key))
+
+def remember_response(db: Session, user_id: str, scope: str, key: Optional[str], response) -> None:
+    """Store a response so retries with the same Idempotency-Key replay it."""
+    if key:
+        idempotency_store.put(db, scoped_key(user_id, scope, key), response.model_dump(mode="json"))
+
+def enforce_auth_rate_limit(http_request: Request, email: str) -> None:
+    """Reject credential attempts over the per-IP or per-email budget."""
+    ip = http_request.client.host if http_request.client else "unknown"
+    retry_after = auth_rate_limiter.check(ip, email)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+def run_password_task(fn, *args):
+    """Run bcrypt work on the password executor, shedding load when it is saturated."""
+    try:
+        return password_executor.run(fn, *args)
+    except PasswordExecutorOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+def encode_session_cursor(session: dict) -> str:
+    """Opaque cursor pointing just past ``session`` in history order."""
+    raw = json.dumps([session["startedAt"].isoformat(), session["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_session_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        started_at, session_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not ids.is_valid(session_id):
+            raise ValueError("cursor has an invalid session id")
+        return datetime.fromisoformat(started_at), str(session_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+SESSION_EXPORT_COLUMNS = ["id", "startedAt", "endedAt", "score", "chops", "duration"]
+
 # API Router
 router = APIRouter(prefix="/api")
 
@@ -78,33 +451,89 @@ router = APIRouter(prefix="/api")
 def health_check():
     return {"status": "ok", "service": "lumberjack-legends"}
 
+# This worker's counters in the Prometheus text format
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Auth Routes
 @router.post("/auth/login", response_model=AuthResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    user = database.get_user_by_email(db, request.email)
-    if not user or not verify_password(request.password, user["password"]):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
+    enforce_auth_rate_limit(http_request, request.email)
+    try:
+        user = database.get_user_by_email(db, request.email)
+    finally:
+        # Not held through bcrypt: SQLite's primary is a single connection
+        db.rollback()
+    if not user or not run_password_task(verify_password, request.password, user["password"]):
         return AuthResponse(success=False, error="Invalid email or password")
     
     token = create_access_token(data={"sub": user["id"]})
     return AuthResponse(success=True, user=User(**user), token=token)
 
+# Signup error messages by the field that was already taken
+DUPLICATE_USER_ERRORS = {
+    "email": "Email already registered",
+    "username": "Username already taken",
+}
+
+def email_taken(db: Session, email: str, exact: bool = False) -> bool:
+    """Check an email, answering from the Bloom filter when it is certainly free.
+
+    With ``exact`` the filter's negative is only trusted if no other worker
+    can have taken the email since it was loaded.
+    """
+    if not taken_names.email_maybe_taken(email) and (taken_names.exclusive or not exact):
+        return False
+    return database.get_user_by_email(db, email) is not None
+
+def username_taken(db: Session, username: str, exact: bool = False) -> bool:
+    """Check a username, answering from the Bloom filter when it is certainly free.
+
+    ``exact`` as for ``email_taken``.
+    """
+    if not taken_names.username_maybe_taken(username) and (taken_names.exclusive or not exact):
+        return False
+    return database.get_user_by_username(db, username) is not None
+
 @router.post("/auth/signup", response_model=AuthResponse, status_code=201)
-def signup(request: SignupRequest, db: Session = Depends(get_db)):
-    if database.get_user_by_email(db, request.email):
-        return AuthResponse(success=False, error="Email already registered")
-    
-    # Check username uniqueness
-    if database.get_user_by_username(db, request.username):
-        return AuthResponse(success=False, error="Username already taken")
+def signup(request: SignupRequest, http_request: Request, db: Session = Depends(get_db)):
+    enforce_auth_rate_limit(http_request, request.email)
+    # Reject likely duplicates before paying for bcrypt; the unique
+    # constraints on insert remain the source of truth.
+    try:
+        if email_taken(db, request.email):
+            return AuthResponse(success=False, error=DUPLICATE_USER_ERRORS["email"])
+        if username_taken(db, request.username):
+            return AuthResponse(success=False, error=DUPLICATE_USER_ERRORS["username"])
+    finally:
+        # Not held through bcrypt: SQLite's primary is a single connection
+        db.rollback()
 
     # Hash the password before storing
     user_data = request.model_dump()
-    user_data["password"] = hash_password(user_data["password"])
+    user_data["password"] = run_password_task(hash_password, user_data["password"])
     
-    new_user = database.create_user(db, user_data)
+    try:
+        new_user = database.create_user(db, user_data)
+    except DuplicateUserError as e:
+        return AuthResponse(success=False, error=DUPLICATE_USER_ERRORS[e.field])
     token = create_access_token(data={"sub": new_user["id"]})
     return AuthResponse(success=True, user=User(**new_user), token=token)
 
+@router.get("/auth/available", response_model=AvailabilityResponse)
+def check_availability(
+    username: Optional[str] = Query(None),
+    email: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    response = AvailabilityResponse(success=True)
+    if username is not None:
+        response.usernameAvailable = not username_taken(db, username, exact=True)
+    if email is not None:
+        response.emailAvailable = not email_taken(db, email, exact=True)
+    return response
+
 @router.post("/auth/logout")
 def logout(current_user: dict = Depends(get_current_user)):
     return {"success": True}
@@ -120,46 +549,116 @@ def update_profile(
     db: Session = Depends(get_db)
 ):
     updates = request.model_dump(exclude_unset=True)
-    updated_user = database.update_user(db, current_user["id"], updates)
+    try:
+        updated_user = database.update_user(db, current_user["id"], updates)
+    except DuplicateUserError as exc:
+        return AuthResponse(success=False, error=DUPLICATE_USER_ERRORS[exc.field])
     return AuthResponse(success=True, user=User(**updated_user)) # type: ignore
 
 # Leaderboard Routes
-@router.get("/leaderboard", response_model=LeaderboardResponse)
-def get_leaderboard(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
-    entries_data = database.get_leaderboard(db, limit)
+def leaderboard_entries(entries_data: list) -> list:
     entries = []
-    for i, entry in enumerate(entries_data):
+    for entry in entries_data:
         entries.append(LeaderboardEntry(
             id=entry["id"],
             username=entry["username"],
             score=entry["highScore"],
             chops=entry["totalChops"],
-            rank=i + 1,
-            timestamp=datetime.now() # Mock timestamp
+            rank=entry["rank"],
+            timestamp=entry["highScoreAt"] or datetime.now(timezone.utc),
         ))
-    
+    return entries
+
+def leaderboard_response(db: Session, limit: int, ranking: str) -> LeaderboardResponse:
+    entries = leaderboard_entries(top_leaderboard(db, ranking)[:limit])
     # User rank (if we could get current user optionally, but here we don't have it easily without auth)
     # The spec says userRank is optional.
     return LeaderboardResponse(success=True, entries=entries)
 
+@router.get("/leaderboard", response_model=LeaderboardResponse)
+def get_leaderboard(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    ranking: Literal["rank", "dense", "row"] = Query(DEFAULT_RANK_MODE, description="How tied scores are ranked"),
+    db: Session = Depends(get_read_db),
+):
+    if database_available(request):
+        try:
+            return leaderboard_response(db, limit, ranking)
+        except DATABASE_ERRORS as exc:
+            record_database_error(exc)
+    snapshot = leaderboard_snapshots.get(ranking)
+    if snapshot is None:
+        return database_unavailable_response()
+    return LeaderboardResponse(success=True, entries=leaderboard_entries(snapshot[:limit]), stale=True)
+
+@router.get("/leaderboard/distribution", response_model=DistributionResponse)
+def get_score_distribution(
+    score: Optional[int] = Query(None, ge=0, description="Score to place within the distribution"),
+    bins: int = Query(20, ge=1, le=MAX_DISTRIBUTION_BINS),
+    db: Session = Depends(get_read_db),
+):
+    if not score_histogram.loaded:
+        score_histogram.load(db)
+    return DistributionResponse(
+        success=True,
+        totalPlayers=score_histogram.total,
+        buckets=score_histogram.distribution(bins),
+        percentile=score_histogram.percentile(score) if score is not None else None,
+        rankEstimate=score_histogram.rank_estimate(score) if score is not None else None,
+    )
+
+@router.get("/leaderboard/export")
+def export_leaderboard(
+    request: Request,
+    export_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    after: Optional[str] = Query(None, description="Resume after this rank:highScore:id"),
+    db: Session = Depends(get_read_db),
+):
+    try:
+        resume = decode_rank_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    chunks = encode_rows(database.iter_leaderboard(db, after=resume), LEADERBOARD_EXPORT_COLUMNS, export_format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="lumberjack-leaderboard.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
 @router.post("/leaderboard", response_model=LeaderboardResponse)
 def submit_score(
     request: ScoreSubmitRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    # Update user stats
-    updates = {
-        "totalChops": current_user["totalChops"] + request.chops,
-        "gamesPlayed": current_user["gamesPlayed"] + 1
-    }
-    if request.score > current_user["highScore"]:
-        updates["highScore"] = request.score
-    
-    database.update_user(db, current_user["id"], updates)
-    
-    # Return updated leaderboard
-    return get_leaderboard(limit=10, db=db)
+    cached = claim_response(db, current_user["id"], "leaderboard", idempotency_key)
+    if cached is not None:
+        return LeaderboardResponse(**cached)
+
+    try:
+        # Update user stats
+        updates = {
+            "totalChops": current_user["totalChops"] + request.chops,
+            "gamesPlayed": current_user["gamesPlayed"] + 1
+        }
+        if request.score > current_user["highScore"]:
+            updates["highScore"] = request.score
+
+        # Commits the claim together with the score
+        database.update_user(db, current_user["id"], updates)
+
+        # Return updated leaderboard
+        response = leaderboard_response(db, 10, DEFAULT_RANK_MODE)
+        remember_response(db, current_user["id"], "leaderboard", idempotency_key, response)
+        return response
+    finally:
+        release_claim(current_user["id"], "leaderboard", idempotency_key)
 
 # Game Routes
 @router.post("/game/session", response_model=GameSessionResponse, status_code=201)
@@ -170,28 +669,81 @@ def start_session(
     session = database.create_session(db, current_user["id"])
     return GameSessionResponse(success=True, session=session)
 
-@router.post("/game/session/{session_id}/end", response_model=GameSessionResponse)
+def spool_session_end(user_id: str, session_id: str, request: SessionEndRequest, idempotency_key: Optional[str]):
+    """Accept a session end into the local spool; it is written once the database is back."""
+    if not ids.is_valid(session_id):
+        return GameSessionResponse(success=False, error="Session not found")
+    session_spool.add(user_id, session_id, request.score, request.chops, request.duration, idempotency_key)
+    response = GameSessionResponse(success=True, queued=True)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response.model_dump(mode="json"))
+
+@router.post("/game/session/{session_id}/end", response_model=GameSessionResponse,
+             responses={202: {"model": GameSessionResponse, "description": "Spooled while the database is unavailable"}})
 def end_session(
     session_id: str,
     request: SessionEndRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_playing_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    if not database_available(http_request):
+        return spool_session_end(current_user["id"], session_id, request, idempotency_key)
+
+    scope = f"session-end:{session_id}"
+    try:
+        cached = claim_response(db, current_user["id"], scope, idempotency_key)
+        if cached is not None:
+            return GameSessionResponse(**cached)
+        try:
+            # Commits the claim together with the session end
+            session = database.end_session(db, session_id, request.score, request.chops, request.duration)
+            if not session:
+                return GameSessionResponse(success=False, error="Session not found")
+            response = GameSessionResponse(success=True, session=session)
+            remember_response(db, current_user["id"], scope, idempotency_key, response)
+            return response
+        finally:
+            release_claim(current_user["id"], scope, idempotency_key)
+    except DATABASE_ERRORS as exc:
+        record_database_error(exc)
+        # Whether or not the write landed, replaying it is safe: ending is idempotent
+        return spool_session_end(current_user["id"], session_id, request, idempotency_key)
+
+@router.get("/game/sessions", response_model=SessionHistoryResponse)
+def get_session_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    start: Optional[datetime] = Query(None, alias="from", description="Only games started at or after this time"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only games started before this time"),
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
-    session = database.end_session(db, session_id, request.score, request.chops, request.duration)
-    if not session:
-        return GameSessionResponse(success=False, error="Session not found")
+    after = decode_session_cursor(cursor) if cursor else None
+    # One extra row tells us whether there is another page
+    sessions = database.get_user_sessions(db, current_user["id"], limit + 1, after=after, start=start, end=end)
+    next_cursor = encode_session_cursor(sessions[limit - 1]) if len(sessions) > limit else None
+    return SessionHistoryResponse(success=True, sessions=sessions[:limit], nextCursor=next_cursor)
 
-    return GameSessionResponse(success=True, session=session)
+@router.get("/game/sessions/export")
+def export_session_history(
+    export_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    rows = database.iter_user_sessions(db, current_user["id"], start=start, end=end)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"lumberjack-sessions.{export_format}"
+    return StreamingResponse(
+        encode_rows(rows, SESSION_EXPORT_COLUMNS, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-@router.get("/game/stats")
-def get_stats(current_user: dict = Depends(get_current_user)):
-    return {
-        "success": True,
-        "stats": {
-            "totalGames": current_user["gamesPlayed"],
-            "avgScore": round(current_user["totalChops"] / current_user["gamesPlayed"]) if current_user["gamesPlayed"] > 0 else 0,
-            "topScore": current_user["highScore"]
-        }
-    }
+@router.get("/game/stats", response_model=StatsResponse)
+def get_stats(current_user: dict = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    return StatsResponse(success=True, stats=GameStats(**database.get_user_stats(db, current_user)))
 
 app.include_router(router)
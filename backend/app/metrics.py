@@ -0,0 +1,82 @@
+"""Process-local counters, served in the Prometheus text format.
+
+Counters are registered once at import time by the module that owns them and
+incremented from any thread. ``GET /api/metrics`` renders the registry so a
+Prometheus scraper (or a person with curl) can read them; each worker reports
+its own values.
+"""
+import threading
+from typing import Dict, List, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """Named collection of counters."""
+
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        """Register a counter, or return the one already registered under ``name``."""
+        if name not in self._counters:
+            self._counters[name] = Counter(name, help_text, labels)
+        return self._counters[name]
+
+    def render(self) -> str:
+        """All counters in the Prometheus text exposition format."""
+        lines = []
+        for counter in self._counters.values():
+            lines.append(f"# HELP {counter.name} {counter.help_text}")
+            lines.append(f"# TYPE {counter.name} counter")
+            for values, value in counter.samples():
+                labels = ",".join(
+                    f'{name}="{_escape(label)}"' for name, label in zip(counter.labels, values)
+                )
+                lines.append(f"{counter.name}{{{labels}}} {value:g}" if labels else f"{counter.name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zero every counter (tests)."""
+        for counter in self._counters.values():
+            counter.reset()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry
+registry = Registry()
@@ -17,6 +17,11 @@ class AuthResponse(BaseModel):
     token: Optional[str] = None
     error: Optional[str] = None
 
+class AvailabilityResponse(BaseModel):
+    success: bool
+    usernameAvailable: Optional[bool] = None
+    emailAvailable: Optional[bool] = None
+
 class LeaderboardEntry(BaseModel):
     id: str
     username: str
@@ -29,6 +34,21 @@ class LeaderboardResponse(BaseModel):
     success: bool
     entries: List[LeaderboardEntry]
     userRank: Optional[int] = None
+    # Served from the last page read while the database is unavailable
+    stale: bool = False
+    error: Optional[str] = None
+
+class DistributionBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+class DistributionResponse(BaseModel):
+    success: bool
+    totalPlayers: int
+    buckets: List[DistributionBucket]
+    percentile: Optional[float] = None
+    rankEstimate: Optional[int] = None
     error: Optional[str] = None
 
 class GameSession(BaseModel):
@@ -43,6 +63,29 @@ class GameSession(BaseModel):
 class GameSessionResponse(BaseModel):
     success: bool
     session: Optional[GameSession] = None
+    # Accepted into the local spool while the database is unavailable
+    queued: bool = False
+    error: Optional[str] = None
+
+class SessionHistoryResponse(BaseModel):
+    success: bool
+    sessions: List[GameSession]
+    nextCursor: Optional[str] = None
+    error: Optional[str] = None
+
+class GameStats(BaseModel):
+    totalGames: int
+    avgScore: int
+    topScore: int
+    avgDuration: float
+    chopsPerSecond: float
+    currentStreak: int
+    bestStreak: int
+    percentile: float
+
+class StatsResponse(BaseModel):
+    success: bool
+    stats: Optional[GameStats] = None
     error: Optional[str] = None
 
 # Request Models
@@ -0,0 +1,130 @@
+"""Leaderboard rank semantics shared by every leaderboard store.
+
+Players are ordered by high score, then by who reached it first
+(``users.high_score_at``), then by id. The rank shown for that order depends
+on the tie mode:
+
+- ``rank``: players with equal scores share a rank and the next rank skips
+  (1, 2, 2, 4), like ``RANK()``.
+- ``dense``: equal scores share a rank with no gaps (1, 2, 2, 3), like
+  ``DENSE_RANK()``.
+- ``row``: every player gets their own position (1, 2, 3, 4), like
+  ``ROW_NUMBER()``; the earlier of two equal scores ranks higher.
+
+In SQL the top-N page is ranked with window functions and a single player's
+rank is a count over ``ix_users_leaderboard``, so neither reads the whole
+table. Databases created before ``high_score_at`` existed are upgraded with
+``python -m app.ranking``.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import DateTime, and_, bindparam, distinct, func, inspect, or_, select, text, update # type: ignore
+from sqlalchemy.orm import aliased # type: ignore
+from . import db_models
+
+RANK_MODES = ("rank", "dense", "row")
+DEFAULT_RANK_MODE = "rank"
+
+User = db_models.User
+
+# Leaderboard order; ix_users_leaderboard holds exactly these columns
+LEADERBOARD_ORDER = (User.high_score.desc(), User.high_score_at, User.id)
+
+_WINDOWS = {
+    "rank": func.rank().over(order_by=User.high_score.desc()),
+    "dense": func.dense_rank().over(order_by=User.high_score.desc()),
+    "row": func.row_number().over(order_by=LEADERBOARD_ORDER),
+}
+
+# Top-N page per mode, built once and run with a bound limit
+TOP_USERS = {
+    mode: select(
+        User.id, User.username, User.high_score, User.high_score_at, User.total_chops,
+        window.label("rank"),
+    ).order_by(*LEADERBOARD_ORDER).limit(bindparam("limit"))
+    for mode, window in _WINDOWS.items()
+}
+
+
+def _ahead_of(me, mode: str):
+    """Condition on ``User`` for players ranked strictly ahead of ``me``."""
+    if mode != "row":
+        return User.high_score > me.high_score
+    return or_(
+        User.high_score > me.high_score,
+        and_(User.high_score == me.high_score, or_(
+            User.high_score_at < me.high_score_at,
+            and_(User.high_score_at == me.high_score_at, User.id < me.id),
+        )),
+    )
+
+
+def _user_rank(mode: str):
+    me = aliased(User, name="me")
+    counted = func.count(distinct(User.high_score)) if mode == "dense" else func.count()
+    ahead = select(counted).where(_ahead_of(me, mode)).scalar_subquery()
+    return select(ahead + 1).where(me.id == bindparam("user_id"))
+
+
+# One player's rank per mode: a count of the players ahead, in one statement
+USER_RANK = {mode: _user_rank(mode) for mode in RANK_MODES}
+
+
+def moment(value: Optional[datetime]) -> float:
+    """``high_score_at`` as a UTC timestamp; naive values are taken as UTC."""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def sort_key(entry: dict):
+    """Position of a leaderboard entry in leaderboard order."""
+    return (-entry["highScore"], moment(entry.get("highScoreAt")), entry["id"])
+
+
+def assign_ranks(entries: List[dict], mode: str) -> List[dict]:
+    """Set ``rank`` on entries already in leaderboard order, starting from the top."""
+    rank = dense = 0
+    previous = None
+    for position, entry in enumerate(entries, 1):
+        if entry["highScore"] != previous:
+            rank, dense, previous = position, dense + 1, entry["highScore"]
+        entry["rank"] = {"rank": rank, "dense": dense, "row": position}[mode]
+    return entries
+
+
+def migrate_high_score_at(engine) -> int:
+    """Add and backfill ``users.high_score_at`` and the leaderboard index.
+
+    A player's existing high score is dated by their earliest ended session
+    with that score, or their signup if there is none. Safe to rerun; returns
+    the users backfilled.
+    """
+    with engine.begin() as conn:
+        columns = {column["name"] for column in inspect(conn).get_columns("users")}
+        if "high_score_at" not in columns:
+            column_type = DateTime().compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE users ADD COLUMN high_score_at {column_type}"))
+        GameSession = db_models.GameSession
+        reached = select(func.min(GameSession.ended_at)).where(
+            GameSession.user_id == User.id,
+            GameSession.score == User.high_score,
+            GameSession.ended_at.isnot(None),
+        ).scalar_subquery()
+        backfilled = conn.execute(
+            update(User.__table__).where(User.high_score_at.is_(None))
+            .values(high_score_at=func.coalesce(reached, User.created_at))
+        ).rowcount
+        conn.execute(text("DROP INDEX IF EXISTS ix_users_high_score"))
+        for index in User.__table__.indexes:
+            if index.name == "ix_users_leaderboard":
+                index.create(conn, checkfirst=True)
+    return backfilled
+
+
+if __name__ == "__main__":
+    from .database import init_engine
+    print(f"Backfilled high_score_at for {migrate_high_score_at(init_engine())} users")
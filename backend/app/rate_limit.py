@@ -0,0 +1,109 @@
+"""Token-bucket rate limiting for the credential endpoints.
+
+Each key (client IP, account email) owns a bucket of ``capacity`` tokens that
+refills at ``refill_per_second``. A request spends one token; an empty bucket
+means the caller is told how long to wait. Buckets live in a ``BucketStore`` so
+the in-memory default can be swapped for a store shared between workers.
+"""
+import abc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class BucketStore(abc.ABC):
+    """Storage for token buckets."""
+
+    @abc.abstractmethod
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """Spend one token from ``key``'s bucket.
+
+        Returns 0 if the token was granted, otherwise the seconds until one
+        becomes available.
+        """
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Forget every bucket."""
+
+
+class InMemoryBucketStore(BucketStore):
+    """Per-process bucket store with a bound on tracked keys.
+
+    Beyond ``max_keys`` the least recently used buckets are dropped; a bucket
+    nobody has touched for a while has usually refilled anyway.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = self.clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            granted = tokens >= 1
+            self._buckets[key] = (tokens - 1 if granted else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0 if granted else (1 - tokens) / refill_per_second
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """Token-bucket limiter for one class of keys."""
+
+    def __init__(self, capacity: float, refill_per_second: float, store: Optional[BucketStore] = None):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.store = store or InMemoryBucketStore()
+
+    def hit(self, key: str) -> float:
+        """Record an attempt for ``key``; returns seconds to wait, 0 if allowed."""
+        return self.store.take(key, self.capacity, self.refill_per_second)
+
+    def reset(self) -> None:
+        """Forget every tracked key."""
+        self.store.clear()
+
+
+class AuthRateLimiter:
+    """Limits login and signup attempts per client IP and per account email."""
+
+    def __init__(self, per_ip: RateLimiter, per_email: RateLimiter):
+        self.per_ip = per_ip
+        self.per_email = per_email
+
+    def check(self, ip: str, email: str) -> float:
+        """Spend a token from both buckets; returns seconds to wait, 0 if allowed."""
+        return max(
+            self.per_ip.hit(f"ip:{ip}"),
+            self.per_email.hit(f"email:{email.lower()}"),
+        )
+
+    def reset(self) -> None:
+        """Forget every tracked key."""
+        self.per_ip.reset()
+        self.per_email.reset()
+
+
+def create_auth_rate_limiter() -> AuthRateLimiter:
+    """Build the auth limiter from ``AUTH_RATE_LIMIT_*`` settings (attempts per minute)."""
+    ip_per_minute = float(os.getenv("AUTH_RATE_LIMIT_PER_IP", "30"))
+    email_per_minute = float(os.getenv("AUTH_RATE_LIMIT_PER_EMAIL", "10"))
+    return AuthRateLimiter(
+        per_ip=RateLimiter(capacity=ip_per_minute, refill_per_second=ip_per_minute / 60),
+        per_email=RateLimiter(capacity=email_per_minute, refill_per_second=email_per_minute / 60),
+    )
+
+
+# Process-wide limiter instance
+auth_rate_limiter = create_auth_rate_limiter()
@@ -0,0 +1,164 @@
+"""In-memory histogram of every player's high score.
+
+Answers "you beat 87% of lumberjacks" and approximate-rank questions in
+O(buckets) instead of scanning ``users``. Buckets are log-linear (HDR
+histogram style): scores below ``sub_buckets`` get one bucket each, and every
+power of two above that is split into ``sub_buckets / 2`` equal buckets, so
+the relative error stays below ``2 / sub_buckets`` at any magnitude.
+
+The histogram is loaded from ``users`` at startup (or on first use) and kept
+current as this worker creates users and raises high scores. The periodic
+maintenance task reloads it, which picks up changes made by other workers.
+"""
+import threading
+from typing import List
+
+from sqlalchemy import func # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from . import db_models
+
+# Largest number of display bins whose edges line up with histogram buckets
+MAX_DISTRIBUTION_BINS = 32
+
+
+class ScoreHistogram:
+    """Log-linear histogram of non-negative integer scores."""
+
+    def __init__(self, sub_buckets: int = 64):
+        if sub_buckets < 2 or sub_buckets & (sub_buckets - 1):
+            raise ValueError("sub_buckets must be a power of two >= 2")
+        self.sub_buckets = sub_buckets
+        self._bits = sub_buckets.bit_length() - 1
+        self._counts: List[int] = []
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def bucket_index(self, score: int) -> int:
+        """Index of the bucket holding ``score``."""
+        score = max(score, 0)
+        if score < self.sub_buckets:
+            return score
+        shift = score.bit_length() - self._bits
+        half = self.sub_buckets // 2
+        return self.sub_buckets + (shift - 1) * half + (score >> shift) - half
+
+    def bucket_bounds(self, index: int):
+        """Inclusive ``(low, high)`` score range of a bucket."""
+        if index < self.sub_buckets:
+            return index, index
+        half = self.sub_buckets // 2
+        shift, offset = divmod(index - self.sub_buckets, half)
+        shift += 1
+        low = (half + offset) << shift
+        return low, low + (1 << shift) - 1
+
+    def load(self, db: Session) -> int:
+        """Rebuild from ``users``; returns the number of players counted."""
+        counts: List[int] = []
+        total = 0
+        rows = db.query(db_models.User.high_score, func.count()).group_by(db_models.User.high_score)
+        for score, count in rows:
+            index = self.bucket_index(score or 0)
+            if index >= len(counts):
+                counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += count
+            total += count
+        with self._lock:
+            self._counts = counts
+            self._total = total
+            self._loaded = True
+        return total
+
+    def add(self, score: int) -> None:
+        """Count a new player with ``score``."""
+        with self._lock:
+            if self._loaded:
+                self._adjust(score, 1)
+                self._total += 1
+
+    def replace(self, old_score: int, new_score: int) -> None:
+        """Move a player whose high score changed."""
+        if old_score == new_score:
+            return
+        with self._lock:
+            if self._loaded:
+                self._adjust(old_score, -1)
+                self._adjust(new_score, 1)
+
+    def _adjust(self, score: int, delta: int) -> None:
+        index = self.bucket_index(score)
+        if index >= len(self._counts):
+            self._counts.extend([0] * (index + 1 - len(self._counts)))
+        self._counts[index] = max(0, self._counts[index] + delta)
+
+    def _split(self, score: int):
+        """Estimated players strictly below and strictly above ``score``."""
+        index = self.bucket_index(score)
+        with self._lock:
+            counts = self._counts
+            below = sum(counts[:index])
+            above = sum(counts[index + 1:])
+            if index < len(counts) and counts[index]:
+                # Assume players are spread evenly across the bucket
+                low, high = self.bucket_bounds(index)
+                width = high - low + 1
+                below += counts[index] * (max(score, 0) - low) / width
+                above += counts[index] * (high - max(score, 0)) / width
+        return below, above
+
+    def percentile(self, score: int) -> float:
+        """Percentage of players with a lower high score than ``score``."""
+        if not self._total:
+            return 0.0
+        below, _ = self._split(score)
+        return round(100.0 * below / self._total, 1)
+
+    def rank_estimate(self, score: int) -> int:
+        """Approximate leaderboard position ``score`` would hold."""
+        _, above = self._split(score)
+        return int(round(above)) + 1
+
+    def distribution(self, bins: int = 20) -> List[dict]:
+        """Player counts over at most ``bins`` equal-width score ranges.
+
+        Bin widths are powers of two, so with ``bins <= MAX_DISTRIBUTION_BINS``
+        every histogram bucket falls inside exactly one bin and counts are exact.
+        """
+        bins = max(1, min(bins, MAX_DISTRIBUTION_BINS, self.sub_buckets // 2))
+        with self._lock:
+            counts = list(self._counts)
+        top = max((index for index, count in enumerate(counts) if count), default=None)
+        if top is None:
+            return []
+        max_score = self.bucket_bounds(top)[1]
+        width = 1
+        while width * bins <= max_score:
+            width *= 2
+        result = [
+            {"min": start, "max": start + width - 1, "count": 0}
+            for start in range(0, max_score + 1, width)
+        ]
+        for index, count in enumerate(counts):
+            if count:
+                result[self.bucket_bounds(index)[0] // width]["count"] += count
+        return result
+
+    def reset(self) -> None:
+        """Forget all counts until the next ``load``."""
+        with self._lock:
+            self._counts = []
+            self._total = 0
+            self._loaded = False
+
+
+# Process-wide histogram
+score_histogram = ScoreHistogram()
@@ -0,0 +1,146 @@
+"""Production entry point: ``python -m app.server``.
+
+Runs the API under uvicorn with one worker process per CPU the container may
+actually use. That is the cgroup CPU quota when one is set, not the host's
+core count. ``WEB_CONCURRENCY`` overrides the choice. uvloop and httptools are
+used when installed.
+
+Workers are supervised by uvicorn's process manager, so a deploy can reload
+the code without dropping the listening socket:
+
+- ``SIGHUP`` restarts the workers one by one.
+- ``SIGTTIN`` and ``SIGTTOU`` add or remove a worker.
+
+Each worker finishes its in-flight requests, for up to
+``GRACEFUL_TIMEOUT_SECONDS``, before its lifespan shutdown runs.
+
+On SQLite a single worker is run: cache invalidations there only reach the
+process that made the write.
+"""
+import argparse
+import importlib.util
+import logging
+import math
+import os
+from typing import Optional
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# Set for the workers this supervisor starts
+SUPERVISED_ENV = "APP_SUPERVISED"
+# Seconds a stopping worker waits for in-flight requests
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: str = CGROUP_ROOT) -> Optional[float]:
+    """CPU quota of this container in cores, or None if unlimited."""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max":
+            return None
+        try:
+            return int(quota) / int(period)
+        except ValueError:
+            return None
+    # cgroup v1: quota of -1 means unlimited
+    quota = _read(os.path.join(root, "cpu", "cpu.cfs_quota_us"))
+    period = _read(os.path.join(root, "cpu", "cpu.cfs_period_us"))
+    try:
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    except ValueError:
+        pass
+    return None
+
+
+def available_cpus(root: str = CGROUP_ROOT) -> int:
+    """Cores this process may run on, capped by the cgroup quota."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        # A fractional quota would throttle an extra worker rather than feed it
+        cpus = min(cpus, max(1, math.floor(limit)))
+    return cpus
+
+
+def worker_count(root: str = CGROUP_ROOT) -> int:
+    """Worker processes to run: ``WEB_CONCURRENCY`` or one per available CPU."""
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return available_cpus(root)
+
+
+def cap_workers(workers: int, backend: str) -> int:
+    """``workers``, or 1 where cached reads cannot be invalidated across processes."""
+    if workers > 1 and backend == "sqlite":
+        # SQLite has no cross-process invalidation bus (LocalBus): the other
+        # workers' caches would never see a write
+        logger.warning("SQLite database: running 1 worker instead of %d", workers)
+        return 1
+    return workers
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Lumberjack Legends API.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: from CPU quota)")
+    parser.add_argument("--reload", action="store_true", help="restart on code changes (development only)")
+    args = parser.parse_args()
+
+    import uvicorn # type: ignore
+    from uvicorn.supervisors import Multiprocess # type: ignore
+
+    options = dict(
+        host=args.host,
+        port=args.port,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT_SECONDS,
+    )
+    if args.reload:
+        uvicorn.run("app.main:app", reload=True, **options)
+        return
+
+    # Create tables once here, and have the workers skip it (APP_SUPERVISED):
+    # workers doing it concurrently would race
+    from .database import init_db, dispose_engine, DATABASE_BACKEND
+    from .leaderboard_store import create_leaderboard_store, reconcile
+    init_db()
+    # Likewise rebuild a shared (Redis) leaderboard once, not once per worker;
+    # a process-local store is filled by each worker instead
+    store = create_leaderboard_store()
+    if store.shared:
+        reconcile(store)
+    dispose_engine()
+
+    workers = cap_workers(args.workers or worker_count(), DATABASE_BACKEND)
+    # Workers size their per-process pools (bcrypt threads) from this
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    # Tells workers the one-off startup work above is done
+    os.environ[SUPERVISED_ENV] = "1"
+    # The supervisor is used even for one worker so SIGHUP reloads still work
+    config = uvicorn.Config("app.main:app", workers=workers, **options)
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+
+if __name__ == "__main__":
+    main()
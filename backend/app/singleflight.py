@@ -0,0 +1,130 @@
+"""Request coalescing ("single-flight") for identical concurrent reads.
+
+When a score change bumps the leaderboard version, every cached page goes
+stale at once and each request arriving before the first recompute finishes
+would run the same query. A ``SingleFlight`` lets the first caller for a key
+run the computation while later callers for that key wait for its result.
+Callers put the invalidation-bus version in the key, so nobody joins a
+computation that started before a write they have already seen.
+
+Thread-pool handlers call ``do``; async handlers ``await do_async``. Both share
+one in-flight table, so an async request can join a computation started on a
+worker thread and the other way round. Results are not kept once a
+computation lands; caching stays with ``VersionedCache``.
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .metrics import registry
+
+CALLS = registry.counter(
+    "singleflight_calls_total", "Computations run by a single-flight group", ("flight",)
+)
+COALESCED = registry.counter(
+    "singleflight_coalesced_total", "Requests served by another request's in-flight computation", ("flight",)
+)
+
+
+class _Flight:
+    """One in-progress computation and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        # Set when the leader was cancelled; waiters retry instead
+        self.abandoned = False
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with equal keys into one computation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """Return ``fn()``, or the result of an identical call already running."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                return self._lead(key, flight, fn)
+            flight.done.wait()
+            if not flight.abandoned:
+                return self._result(flight)
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Return ``await fn()``, or the result of an identical call already running."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                CALLS.inc(flight=self.name)
+                try:
+                    value = await fn()
+                except Exception as exc:
+                    self._land(key, flight, error=exc)
+                    raise
+                except BaseException:
+                    self._land(key, flight, abandoned=True)
+                    raise
+                self._land(key, flight, value=value)
+                return value
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                landed = flight.done.is_set()
+                if not landed:
+                    flight.waiters.append((loop, future))
+            if not landed:
+                await future
+            if not flight.abandoned:
+                return self._result(flight)
+
+    def in_flight(self) -> int:
+        """Number of computations currently running."""
+        return len(self._flights)
+
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _lead(self, key: Hashable, flight: _Flight, fn: Callable[[], object]):
+        CALLS.inc(flight=self.name)
+        try:
+            value = fn()
+        except Exception as exc:
+            self._land(key, flight, error=exc)
+            raise
+        except BaseException:
+            self._land(key, flight, abandoned=True)
+            raise
+        self._land(key, flight, value=value)
+        return value
+
+    def _land(self, key: Hashable, flight: _Flight, value=None, error=None, abandoned=False) -> None:
+        with self._lock:
+            # Removed first: a caller arriving from now on starts a new computation
+            del self._flights[key]
+            flight.value, flight.error, flight.abandoned = value, error, abandoned
+            flight.done.set()
+            waiters, flight.waiters = flight.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _result(self, flight: _Flight):
+        COALESCED.inc(flight=self.name)
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
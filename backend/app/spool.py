@@ -0,0 +1,129 @@
+"""Durable local spool for game-session ends made while the database is down.
+
+While the database circuit breaker is open, ``POST /api/game/session/{id}/end``
+is written here instead: a SQLite file beside the worker, committed with
+``synchronous=FULL`` before the client gets its ``202``. Once the breaker
+closes (and at startup, for anything a previous process left behind) the
+entries are replayed through ``Database.end_session`` in arrival order.
+
+Ending a session is idempotent, so an entry replayed twice (two workers
+sharing the file, or a crash between applying an entry and deleting it) is
+harmless. A session is spooled at most once; later ends for it are ignored, as
+the database would ignore them.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import (  # type: ignore
+    Column, DateTime, Float, Integer, MetaData, String, Table, create_engine, delete, event, func, select,
+)
+
+logger = logging.getLogger(__name__)
+
+# SQLite file holding session ends that could not be written to the database
+SESSION_SPOOL_PATH = os.getenv("SESSION_SPOOL_PATH", "./session_spool.db")
+
+metadata = MetaData()
+
+spooled_session_ends = Table(
+    "spooled_session_ends",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("session_id", String, unique=True, nullable=False),
+    Column("user_id", String, nullable=False),
+    Column("score", Integer, nullable=False),
+    Column("chops", Integer, nullable=False),
+    Column("duration", Float, nullable=False),
+    Column("idempotency_key", String),
+    Column("received_at", DateTime, nullable=False),
+)
+
+
+class SessionEndSpool:
+    """Append-and-replay queue of session ends in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+    def _connect(self):
+        with self._engine_lock:
+            if self._engine is None:
+                engine = create_engine(f"sqlite:///{self.path}")
+
+                @event.listens_for(engine, "connect")
+                def _durable(dbapi_connection, connection_record):
+                    cursor = dbapi_connection.cursor()
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                    # Every spooled write reaches the disk before it is acknowledged
+                    cursor.execute("PRAGMA synchronous=FULL")
+                    cursor.execute("PRAGMA busy_timeout=5000")
+                    cursor.close()
+
+                metadata.create_all(engine)
+                self._engine = engine
+        return self._engine
+
+    def add(self, user_id: str, session_id: str, score: int, chops: int, duration: float,
+            idempotency_key: Optional[str] = None) -> bool:
+        """Spool a session end; False if that session is already spooled."""
+        # Imported here: the dialect package is already loaded once an engine exists
+        from sqlalchemy.dialects.sqlite import insert
+        with self._connect().begin() as conn:
+            return conn.execute(
+                insert(spooled_session_ends).values(
+                    session_id=str(session_id), user_id=str(user_id), score=score, chops=chops,
+                    duration=duration, idempotency_key=idempotency_key,
+                    received_at=datetime.now(timezone.utc),
+                ).on_conflict_do_nothing(index_elements=["session_id"])
+            ).rowcount == 1
+
+    def pending(self) -> int:
+        """Entries waiting to be replayed."""
+        if self._engine is None and not os.path.exists(self.path):
+            return 0
+        with self._connect().connect() as conn:
+            return conn.execute(select(func.count()).select_from(spooled_session_ends)).scalar()
+
+    def replay(self, apply: Callable[[dict], None]) -> int:
+        """Apply entries oldest first, deleting each once applied.
+
+        Stops at the first entry ``apply`` raises for, which stays spooled.
+        Returns the entries applied; 0 if another thread is already replaying.
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return 0
+        applied = 0
+        try:
+            if self.pending() == 0:
+                return 0
+            engine = self._connect()
+            with engine.connect() as conn:
+                entries = [dict(row._mapping) for row in conn.execute(
+                    select(spooled_session_ends).order_by(spooled_session_ends.c.id)
+                )]
+            for entry in entries:
+                apply(entry)
+                with engine.begin() as conn:
+                    conn.execute(delete(spooled_session_ends).where(spooled_session_ends.c.id == entry["id"]))
+                applied += 1
+            return applied
+        finally:
+            self._replay_lock.release()
+            if applied:
+                logger.info("Replayed %d spooled session ends", applied)
+
+    def dispose(self) -> None:
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+# Process-wide spool
+session_spool = SessionEndSpool(SESSION_SPOOL_PATH)
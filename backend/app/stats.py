@@ -0,0 +1,168 @@
+"""Per-user game statistics kept as running aggregates.
+
+``end_session`` folds each finished game into the player's ``user_stats`` row
+(sums, best score, daily streaks), so reading stats is a primary-key lookup
+rather than an aggregate over the player's whole session history.
+
+Rows for sessions played before the table existed are backfilled with
+``python -m app.stats``.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Date, bindparam, text # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from . import db_models
+from .ids import UUIDString
+from .score_histogram import score_histogram
+
+# Sessions read per round trip while backfilling
+REBUILD_BATCH_SIZE = 10000
+
+
+EMPTY_STATS = {
+    "games": 0, "score_sum": 0, "best_score": 0, "chops_sum": 0,
+    "duration_sum": 0.0, "current_streak": 0, "best_streak": 0,
+}
+
+
+STATS_COLUMNS = [*EMPTY_STATS, "last_played_on"]
+
+# ON CONFLICT statements built with the dialect insert() are never cached by
+# SQLAlchemy, so the per-game upsert is spelled out once; PostgreSQL and
+# SQLite share the syntax.
+UPSERT_STATS = text(
+    f"INSERT INTO user_stats (user_id, {', '.join(STATS_COLUMNS)}) "
+    f"VALUES (:user_id, {', '.join(':' + column for column in STATS_COLUMNS)}) "
+    f"ON CONFLICT (user_id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in STATS_COLUMNS)
+).bindparams(
+    bindparam("user_id", type_=UUIDString()),
+    bindparam("last_played_on", type_=Date()),
+)
+
+
+# Empty row for a player's first game, so it can be locked like any other
+CREATE_STATS = text(
+    f"INSERT INTO user_stats (user_id, {', '.join(STATS_COLUMNS)}) "
+    f"VALUES (:user_id, {', '.join(':' + column for column in STATS_COLUMNS)}) "
+    f"ON CONFLICT (user_id) DO NOTHING"
+).bindparams(
+    bindparam("user_id", type_=UUIDString()),
+    bindparam("last_played_on", type_=Date()),
+)
+
+
+def _advance_streak(stats: db_models.UserStats, played_on: date) -> None:
+    """Count a game played on ``played_on`` towards the daily streak."""
+    last = stats.last_played_on
+    if last is None or played_on > last + timedelta(days=1):
+        stats.current_streak = 1
+    elif played_on == last + timedelta(days=1):
+        stats.current_streak += 1
+    elif played_on < last:
+        # A late-arriving older game can't extend the streak
+        return
+    stats.best_streak = max(stats.best_streak, stats.current_streak)
+    stats.last_played_on = played_on
+
+
+def add_game(stats: db_models.UserStats, score: int, chops: int, duration: float, ended_at: datetime) -> None:
+    """Fold one ended session into ``stats``."""
+    stats.games += 1
+    stats.score_sum += score
+    stats.chops_sum += chops
+    stats.duration_sum += duration
+    stats.best_score = max(stats.best_score, score)
+    _advance_streak(stats, ended_at.date())
+
+
+def from_row(user_id: str, row) -> db_models.UserStats:
+    """Detached ``UserStats`` from a row with its columns."""
+    user_stats = db_models.UserStats(user_id=user_id, **{column: getattr(row, column) for column in EMPTY_STATS})
+    user_stats.last_played_on = row.last_played_on
+    return user_stats
+
+
+def create_missing(db: Session, user_id: str) -> None:
+    """Insert an empty stats row for ``user_id`` unless it has one (caller commits)."""
+    if db.get_bind().dialect.name not in ("postgresql", "sqlite"):
+        if db.get(db_models.UserStats, user_id) is None:
+            db.add(db_models.UserStats(user_id=user_id, **EMPTY_STATS))
+            db.flush()
+        return
+    db.execute(CREATE_STATS, {"user_id": user_id, **EMPTY_STATS, "last_played_on": None})
+
+
+def save(db: Session, user_stats: db_models.UserStats) -> None:
+    """Write a detached stats row with a single upsert (caller commits).
+
+    Every column is overwritten, so ``user_stats`` must have been read under
+    the row's lock: ``end_session`` selects it ``FOR UPDATE``, and a second
+    end for the same player waits and then reads the first one's result.
+    """
+    if db.get_bind().dialect.name not in ("postgresql", "sqlite"):
+        db.merge(user_stats)
+        return
+    db.execute(UPSERT_STATS, {column: getattr(user_stats, column) for column in ["user_id", *STATS_COLUMNS]})
+
+
+def get_user_stats(db: Session, user: dict, today: Optional[date] = None) -> dict:
+    """Stats for ``user`` (a user dict) in the shape the API returns."""
+    stats = db.get(db_models.UserStats, user["id"])
+    if not score_histogram.loaded:
+        score_histogram.load(db)
+    today = today or datetime.now(timezone.utc).date()
+    # Averages are over ended sessions; totalGames stays the profile counter,
+    # which also counts scores submitted without a session.
+    games = stats.games if stats else 0
+    current_streak = 0
+    if stats and stats.last_played_on and stats.last_played_on >= today - timedelta(days=1):
+        current_streak = stats.current_streak
+    return {
+        "totalGames": user["gamesPlayed"],
+        "avgScore": round(stats.score_sum / games) if games else 0,
+        "topScore": user["highScore"],
+        "avgDuration": round(stats.duration_sum / games, 1) if games else 0.0,
+        "chopsPerSecond": round(stats.chops_sum / stats.duration_sum, 2) if stats and stats.duration_sum else 0.0,
+        "currentStreak": current_streak,
+        "bestStreak": stats.best_streak if stats else 0,
+        "percentile": score_histogram.percentile(user["highScore"]),
+    }
+
+
+def rebuild_user_stats(db: Session) -> int:
+    """Recompute every ``user_stats`` row from ended sessions; returns the user count."""
+    db.query(db_models.UserStats).delete(synchronize_session=False)
+    sessions = db.query(
+        db_models.GameSession.user_id,
+        db_models.GameSession.score,
+        db_models.GameSession.chops,
+        db_models.GameSession.duration,
+        db_models.GameSession.ended_at,
+    ).filter(
+        db_models.GameSession.ended_at.isnot(None)
+    ).order_by(
+        db_models.GameSession.user_id, db_models.GameSession.ended_at
+    ).yield_per(REBUILD_BATCH_SIZE)
+
+    stats = None
+    count = 0
+    for user_id, score, chops, duration, ended_at in sessions:
+        if stats is None or stats.user_id != user_id:
+            stats = db_models.UserStats(user_id=user_id, **EMPTY_STATS)
+            db.add(stats)
+            count += 1
+        add_game(stats, score, chops, duration, ended_at)
+    db.commit()
+    return count
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt stats for {rebuild_user_stats(db)} users")
+    finally:
+        db.close()
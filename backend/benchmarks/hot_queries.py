@@ -0,0 +1,150 @@
+"""Per-call cost of the hot read queries: ORM ``Query`` vs prebuilt statements.
+
+Times ``get_current_user`` (JWT decode plus user-by-id) and
+``get_leaderboard(10)`` three ways:
+
+- ``query``: the old ``db.query(...).filter(...)`` form, rebuilt on every call
+  and loading ORM entities.
+- ``prebuilt``: the current module-level ``select()`` constructs with bound
+  parameters, returning plain rows.
+- ``prebuilt+prepared``: the same, with server-side prepared statements. Only
+  runs for ``postgresql+psycopg://`` URLs; psycopg2 cannot prepare.
+
+Against SQLite (the default, an in-memory database) the time is almost all
+Python overhead. Against PostgreSQL the difference between the last two rows
+is the parse/plan work saved on the server per round trip.
+
+Usage:
+    uv run python benchmarks/hot_queries.py --calls 20000
+    DATABASE_URL=postgresql+psycopg://... uv run python benchmarks/hot_queries.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.security import HTTPAuthorizationCredentials # type: ignore
+from sqlalchemy import create_engine # type: ignore
+from sqlalchemy.engine import make_url # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy.pool import StaticPool # type: ignore
+from app import db_models, ids
+from app.database import Base
+from app.db import database
+from app.main import create_access_token, get_current_user
+
+BENCH_PREFIX = "hotq"
+
+
+def query_user_by_id(db, user_id):
+    user = db.query(db_models.User).filter(db_models.User.id == user_id).first()
+    return user.to_dict() if user else None
+
+
+def query_leaderboard(db, limit):
+    users = db.query(db_models.User).order_by(db_models.User.high_score.desc()).limit(limit).all()
+    return [user.to_dict() for user in users]
+
+
+def make_engine(url, prepare_threshold="default"):
+    if make_url(url).get_backend_name() == "sqlite":
+        return create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    connect_args = {} if prepare_threshold == "default" else {"prepare_threshold": prepare_threshold}
+    return create_engine(url, connect_args=connect_args)
+
+
+def seed(engine, users):
+    Base.metadata.create_all(engine)
+    rows = [{
+        "id": ids.new_id(),
+        "username": f"{BENCH_PREFIX}{n}",
+        "email": f"{BENCH_PREFIX}{n}@example.com",
+        "password": "x",
+        "high_score": random.randrange(100_000),
+        "total_chops": 0,
+        "games_played": 0,
+    } for n in range(users)]
+    with engine.begin() as conn:
+        conn.execute(db_models.User.__table__.insert(), rows)
+    return [row["id"] for row in rows]
+
+
+def cleanup(engine):
+    with engine.begin() as conn:
+        conn.execute(db_models.User.__table__.delete().where(db_models.User.username.like(f"{BENCH_PREFIX}%")))
+
+
+def time_calls(engine, calls, call):
+    with Session(bind=engine) as db:
+        for _ in range(min(calls, 200)):
+            call(db)
+        began = time.perf_counter()
+        for _ in range(calls):
+            call(db)
+            # Keep the identity map from answering repeat lookups
+            db.expunge_all()
+        return (time.perf_counter() - began) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL", "sqlite://")
+    engine = make_engine(url)
+    user_ids = seed(engine, args.users)
+    tokens = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": user_id}))
+        for user_id in random.sample(user_ids, min(100, len(user_ids)))
+    ]
+
+    def current_user(lookup):
+        def call(db):
+            credentials = random.choice(tokens)
+            if lookup is None:
+                return get_current_user(credentials, db)
+            # get_current_user with the old lookup: same JWT work, different query
+            import jwt # type: ignore
+            from app.main import ALGORITHM, SECRET_KEY
+            payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+            return lookup(db, payload["sub"])
+        return call
+
+    scenarios = {
+        "get_current_user": {
+            "query": current_user(query_user_by_id),
+            "prebuilt": current_user(None),
+        },
+        "get_leaderboard": {
+            "query": lambda db: query_leaderboard(db, 10),
+            "prebuilt": lambda db: database.get_leaderboard(db, 10),
+        },
+    }
+    engines = {"query": engine, "prebuilt": engine}
+    if make_url(url).get_driver_name() == "psycopg":
+        engines["query"] = engines["prebuilt"] = make_engine(url, prepare_threshold=None)
+        engines["prebuilt+prepared"] = make_engine(url, prepare_threshold=1)
+        for calls in scenarios.values():
+            calls["prebuilt+prepared"] = calls["prebuilt"]
+
+    try:
+        for scenario, variants in scenarios.items():
+            baseline = None
+            for variant, call in variants.items():
+                micros = time_calls(engines[variant], args.calls, call)
+                baseline = baseline or micros
+                print(f"{scenario:<18} {variant:<16} {micros:>9.1f} us/call  {baseline / micros:>5.2f}x")
+    finally:
+        cleanup(engine)
+        for each in set(engines.values()):
+            each.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare insert throughput and index size for text UUIDv4 keys vs UUIDv7 keys.
+
+Two copies of a ``game_sessions``-shaped table are filled side by side:
+
+- ``bench_sessions_text``: ``VARCHAR`` primary key and ``user_id`` holding
+  random ``uuid4`` strings (the old schema).
+- ``bench_sessions_uuid7``: ``UUIDString`` columns (native ``uuid`` on
+  PostgreSQL, 16-byte blobs on SQLite) holding time-ordered UUIDv7 ids.
+
+Rows go in with ``executemany`` batches, alternating between the tables. The
+script prints rows/second for each tenth of the fill, so the slowdown as the
+random-key index outgrows memory is visible, and ends with the index sizes.
+A 10M-row run on PostgreSQL takes a while; start with ``--rows 1000000``.
+
+Usage:
+    DATABASE_URL=postgresql://... uv run python benchmarks/id_inserts.py --rows 10000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, create_engine, text # type: ignore
+from app.ids import UUIDString, new_id
+
+metadata = MetaData()
+TABLES = {
+    kind: Table(
+        f"bench_sessions_{kind}", metadata,
+        Column("id", id_type, primary_key=True),
+        Column("user_id", id_type, nullable=False),
+        Column("score", Integer, nullable=False),
+        Column("chops", Integer, nullable=False),
+        Column("duration", Float, nullable=False),
+        Column("started_at", DateTime, nullable=False),
+        Index(f"ix_bench_{kind}_user", "user_id"),
+    )
+    for kind, id_type in (("text", String), ("uuid7", UUIDString))
+}
+
+
+def make_rows(kind, count, users, started):
+    rows = []
+    for n in range(count):
+        user = users[random.randrange(len(users))]
+        rows.append({
+            "id": str(uuid.uuid4()) if kind == "text" else new_id(),
+            "user_id": user[kind],
+            "score": random.randrange(5000),
+            "chops": random.randrange(250),
+            "duration": 60.0,
+            "started_at": started + timedelta(milliseconds=n),
+        })
+    return rows
+
+
+def index_sizes(conn):
+    """Bytes used by each benchmark table's indexes, where the backend reports it."""
+    sizes = {}
+    for kind, table in TABLES.items():
+        if conn.dialect.name == "postgresql":
+            sizes[kind] = conn.execute(text("SELECT pg_indexes_size(:name)"), {"name": table.name}).scalar()
+        elif conn.dialect.name == "sqlite":
+            try:
+                sizes[kind] = conn.execute(text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name)"
+                ), {"name": table.name}).scalar()
+            except Exception:
+                return {}
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="rows inserted into each table")
+    parser.add_argument("--users", type=int, default=100_000, help="distinct user ids to reference")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark tables in place")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///./id_inserts_bench.db"))
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    users = [{"text": str(uuid.uuid4()), "uuid7": new_id()} for _ in range(args.users)]
+    started = datetime.now(timezone.utc)
+    step = max(args.rows // 10, args.batch_size)
+    elapsed = {kind: 0.0 for kind in TABLES}
+    window = {kind: 0.0 for kind in TABLES}
+
+    try:
+        inserted = 0
+        while inserted < args.rows:
+            count = min(args.batch_size, args.rows - inserted)
+            for kind, table in TABLES.items():
+                rows = make_rows(kind, count, users, started + timedelta(milliseconds=inserted))
+                began = time.perf_counter()
+                with engine.begin() as conn:
+                    conn.execute(table.insert(), rows)
+                took = time.perf_counter() - began
+                elapsed[kind] += took
+                window[kind] += took
+            inserted += count
+            if inserted % step < count or inserted == args.rows:
+                print(f"{inserted:>12,} rows  " + "  ".join(
+                    f"{kind}: {min(step, inserted) / window[kind]:>9,.0f} rows/s" for kind in TABLES
+                ), flush=True)
+                window = {kind: 0.0 for kind in TABLES}
+
+        print()
+        for kind in TABLES:
+            print(f"{kind:<6} overall {args.rows / elapsed[kind]:>9,.0f} rows/s")
+        with engine.connect() as conn:
+            for kind, size in index_sizes(conn).items():
+                print(f"{kind:<6} indexes {size / 2**20:>9,.1f} MiB")
+    finally:
+        if not args.keep:
+            metadata.drop_all(engine)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
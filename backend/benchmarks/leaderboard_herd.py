@@ -0,0 +1,110 @@
+"""Leaderboard queries and latency for a burst of reads right after a score change.
+
+Seeds a SQLite file with ``--users`` players, then ``--rounds`` times bumps the
+leaderboard version (as a committed score does) and releases ``--readers``
+threads at once, each fetching the top-100 page through
+``Database.get_leaderboard``. Runs with coalescing off (every reader queries)
+and on (readers share the one query in flight), and prints the queries run
+per burst and the median and worst time for a burst to be served.
+
+Usage:
+    uv run python benchmarks/leaderboard_herd.py --readers 200 --rounds 20
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import sessionmaker # type: ignore
+from app import database as database_module, db_models, ids
+from app.cache_bus import invalidation_bus
+from app.database import Base
+from app.db import database
+
+
+def seed(engine, users):
+    Base.metadata.create_all(engine)
+    rows = [{
+        "id": ids.new_id(),
+        "username": f"herd{n}",
+        "email": f"herd{n}@example.com",
+        "password": "x",
+        "high_score": random.randrange(100_000),
+        "total_chops": 0,
+        "games_played": 0,
+    } for n in range(users)]
+    with engine.begin() as conn:
+        conn.execute(db_models.User.__table__.insert(), rows)
+
+
+def burst(Reader, readers):
+    """Release ``readers`` threads at once; seconds until the last is served."""
+    gate = threading.Barrier(readers + 1)
+
+    def read():
+        db = Reader()
+        try:
+            gate.wait()
+            database.get_leaderboard(db, 100)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    gate.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'herd.db'}"
+        writer = database_module._create_engine(url)
+        seed(writer, args.users)
+        reader = database_module._create_engine(url, read_only=True)
+        Reader = sessionmaker(bind=reader)
+        queries = 0
+
+        @event.listens_for(reader, "before_cursor_execute")
+        def count(conn, cursor, statement, parameters, context, executemany):
+            nonlocal queries
+            if "FROM users" in statement:
+                queries += 1
+
+        print(f"{'coalescing':<11} {'queries/burst':>14} {'p50':>9} {'max':>9}")
+        for coalescing in (False, True):
+            flight_key = database._flight_key
+            if not coalescing:
+                database._flight_key = lambda db, *read: None
+            try:
+                queries, timings = 0, []
+                for _ in range(args.rounds):
+                    invalidation_bus.bump("leaderboard")
+                    timings.append(burst(Reader, args.readers))
+            finally:
+                database._flight_key = flight_key
+            label = "on" if coalescing else "off"
+            print(f"{label:<11} {queries / args.rounds:>14.1f} {statistics.median(timings) * 1e3:>7.1f}ms "
+                  f"{max(timings) * 1e3:>7.1f}ms", flush=True)
+        reader.dispose()
+        writer.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Measure how API throughput scales with the number of worker processes.
+
+For each worker count, the script does the following:
+
+1. Starts ``python -m app.server --workers N`` against ``DATABASE_URL``.
+2. Drives the server from ``--load-processes`` client processes.
+3. Reports requests/second and latency percentiles for two scenarios:
+   - ``leaderboard``: ``GET /api/leaderboard?limit=10``.
+   - ``session``: create a game session, then end it. This covers the auth,
+     write and invalidation path.
+
+The load generator runs on the same machine, so leave it some cores. On an
+8-core box ``--workers 1 2 4 --load-processes 4`` gives a fair picture. The
+server runs with ``BCRYPT_ROUNDS=4`` and relaxed auth rate limits so the
+setup signups don't dominate.
+
+Usage:
+    DATABASE_URL=postgresql://... uv run python benchmarks/server_scaling.py --workers 1 2 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx # type: ignore
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ("leaderboard", "session")
+
+
+def wait_until_healthy(base_url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become healthy")
+
+
+async def _signup(client):
+    name = f"bench{uuid.uuid4().hex[:12]}"
+    response = await client.post("/api/auth/signup", json={
+        "username": name, "email": f"{name}@example.com", "password": "benchpass",
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def _client_loop(client, scenario, stop_at, latencies, errors):
+    try:
+        headers = await _signup(client) if scenario == "session" else None
+    except httpx.HTTPError:
+        errors.append(1)
+        return
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            if scenario == "leaderboard":
+                (await client.get("/api/leaderboard", params={"limit": 10})).raise_for_status()
+            else:
+                created = await client.post("/api/game/session", headers=headers)
+                created.raise_for_status()
+                session_id = created.json()["session"]["id"]
+                (await client.post(
+                    f"/api/game/session/{session_id}/end", headers=headers,
+                    json={"score": 420, "chops": 21, "duration": 15.0},
+                )).raise_for_status()
+        except httpx.HTTPError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def _drive(base_url, scenario, connections, duration):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(*(
+            _client_loop(client, scenario, stop_at, latencies, errors) for _ in range(connections)
+        ))
+    return latencies, len(errors)
+
+
+def _load_process(args):
+    return asyncio.run(_drive(*args))
+
+
+def run_scenario(base_url, scenario, load_processes, connections, duration):
+    """Return ``(requests_per_second, p50_ms, p99_ms, errors)`` for one scenario."""
+    jobs = [(base_url, scenario, connections, duration)] * load_processes
+    with multiprocessing.Pool(load_processes) as pool:
+        results = pool.map(_load_process, jobs)
+    latencies = sorted(value for chunk, _ in results for value in chunk)
+    errors = sum(count for _, count in results)
+    if not latencies:
+        return 0.0, 0.0, 0.0, errors
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / duration, statistics.median(latencies) * 1000, p99 * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to compare")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--load-processes", type=int, default=2, help="client processes generating load")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        "BCRYPT_ROUNDS": "4",
+        "AUTH_RATE_LIMIT_PER_IP": "1000000",
+        "AUTH_RATE_LIMIT_PER_EMAIL": "1000000",
+    }
+    results = {}
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.server", "--host", "127.0.0.1",
+             "--port", str(args.port), "--workers", str(workers)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_healthy(base_url)
+            for scenario in args.scenarios:
+                rps, p50, p99, errors = run_scenario(
+                    base_url, scenario, args.load_processes, args.connections, args.duration
+                )
+                results[workers, scenario] = rps
+                print(f"workers={workers:<3} {scenario:<12} {rps:>9.1f} req/s  "
+                      f"p50 {p50:>7.1f} ms  p99 {p99:>7.1f} ms  errors {errors}", flush=True)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+    baseline = min(args.workers)
+    print()
+    for scenario in args.scenarios:
+        base = results.get((baseline, scenario))
+        if not base:
+            continue
+        speedups = ", ".join(
+            f"{workers}: {results[workers, scenario] / base:.2f}x" for workers in args.workers
+        )
+        print(f"{scenario:<12} speedup vs {baseline} worker(s): {speedups}")
+
+
+if __name__ == "__main__":
+    main()
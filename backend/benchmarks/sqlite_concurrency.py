@@ -0,0 +1,114 @@
+"""Leaderboard read throughput on SQLite while ``end_session`` writes run.
+
+Runs the same load twice on a fresh SQLite file:
+
+- ``off``: driver defaults (rollback journal, ``synchronous=FULL``); readers
+  and writers share one pooled engine.
+- ``production``: the ``SQLITE_PROFILE`` settings (WAL, tuned pragmas), one
+  writer connection and a pool of read-only connections.
+
+``--writers`` threads start and end game sessions back to back for
+``--seconds``, while ``--readers`` threads fetch the top-10 leaderboard. The
+script prints reads/s, writes/s and how many operations
+failed with "database is locked".
+
+Usage:
+    uv run python benchmarks/sqlite_concurrency.py --seconds 10 --readers 8 --writers 2
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.exc import OperationalError # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import database as database_module, db_models, ids
+from app.database import Base
+from app.db import database
+
+
+def seed(engine, users):
+    Base.metadata.create_all(engine)
+    rows = [{
+        "id": ids.new_id(),
+        "username": f"sqlite{n}",
+        "email": f"sqlite{n}@example.com",
+        "password": "x",
+        "high_score": random.randrange(100_000),
+        "total_chops": 0,
+        "games_played": 0,
+    } for n in range(users)]
+    with engine.begin() as conn:
+        conn.execute(db_models.User.__table__.insert(), rows)
+    return [row["id"] for row in rows]
+
+
+def run(profile, args):
+    database_module.SQLITE_PROFILE = profile
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'bench.db'}"
+        writer = database_module._create_engine(url)
+        reader = database_module._create_engine(url, read_only=True) if profile == "production" else writer
+        user_ids = seed(writer, args.users)
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.seconds
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def write_loop():
+            with Session(bind=writer) as db:
+                while time.monotonic() < deadline:
+                    try:
+                        session = database.create_session(db, random.choice(user_ids))
+                        database.end_session(db, session["id"], random.randrange(100_000), 50, 60.0)
+                        count("writes")
+                    except OperationalError:
+                        db.rollback()
+                        count("locked")
+
+        def read_loop():
+            with Session(bind=reader) as db:
+                while time.monotonic() < deadline:
+                    try:
+                        database.get_leaderboard(db, 10)
+                        db.rollback()  # end the read transaction, as a request would
+                        count("reads")
+                    except OperationalError:
+                        db.rollback()
+                        count("locked")
+
+        threads = [threading.Thread(target=write_loop) for _ in range(args.writers)]
+        threads += [threading.Thread(target=read_loop) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for engine in {writer, reader}:
+            engine.dispose()
+    return {key: value / args.seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'profile':<11} {'reads/s':>9} {'writes/s':>9} {'locked/s':>9}")
+    for profile in ("off", "production"):
+        rates = run(profile, args)
+        print(f"{profile:<11} {rates['reads']:>9,.0f} {rates['writes']:>9,.0f} {rates['locked']:>9,.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
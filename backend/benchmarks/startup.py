@@ -0,0 +1,75 @@
+"""Measure how long importing the API takes in a fresh interpreter.
+
+Runs ``python -X importtime -c "import app.main"`` several times and reports
+the median cumulative import time plus the heaviest modules. With
+``--budget-ms`` the script exits non-zero when the median exceeds the budget,
+which CI uses to catch import-time regressions.
+
+Usage:
+    uv run python benchmarks/startup.py --runs 5 --budget-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TARGET_MODULE = "app.main"
+# Modules that should stay out of the import graph until first use
+DEFERRED_MODULES = ("psycopg2", "psycopg", "jwt", "bcrypt", "redis")
+
+
+def measure_once():
+    """Import the app once; returns ``(total_us, {module: cumulative_us})``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {TARGET_MODULE}"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        cumulative_us = parts[1].strip() if len(parts) == 3 else ""
+        if cumulative_us.isdigit():
+            modules[parts[2].strip()] = int(cumulative_us)
+    return modules[TARGET_MODULE], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the median exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="heaviest modules to list")
+    args = parser.parse_args()
+
+    totals, last_modules = [], {}
+    for _ in range(args.runs):
+        total, last_modules = measure_once()
+        totals.append(total / 1000)
+    median = statistics.median(totals)
+
+    print(f"import {TARGET_MODULE}: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f})")
+    top_level = {name: us for name, us in last_modules.items() if "." not in name and name != TARGET_MODULE}
+    print("Heaviest packages:")
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    loaded = [name for name in DEFERRED_MODULES if name in last_modules]
+    if loaded:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(loaded)}")
+        sys.exit(1)
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
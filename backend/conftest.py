@@ -0,0 +1,163 @@
+"""Shared database fixtures for ``tests/`` and ``tests_integration/``.
+
+Each pytest worker gets one database that is created (and seeded, by overriding
+the ``seed`` fixture) on first use. Every test then runs inside an outer
+transaction that is rolled back afterwards; application code committing only
+releases a SAVEPOINT, so tests are isolated without re-creating tables or
+re-seeding data.
+
+Set ``TEST_DATABASE_URL`` to run against PostgreSQL instead of SQLite. Each
+suite, and under pytest-xdist each worker, then gets its own database
+(``<name>_tests_gw0``, ...).
+"""
+import os
+from typing import Optional
+import pytest # type: ignore
+from sqlalchemy import create_engine, event, text # type: ignore
+from sqlalchemy.engine import make_url # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy.pool import StaticPool # type: ignore
+from app import auth_utils
+from app.main import app, leaderboard_cache, leaderboard_snapshots
+from app.circuit_breaker import db_breaker
+from app.database import Base, get_db
+from app.idempotency import idempotency_store
+from app.rate_limit import auth_rate_limiter
+from app.score_histogram import score_histogram
+
+# Minimum bcrypt cost: hashing is the slowest thing the suite does otherwise
+auth_utils.BCRYPT_ROUNDS = 4
+
+
+def private_database_url(url: str, suite: Optional[str] = None) -> str:
+    """Give a test suite, and each pytest-xdist worker, its own database."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return url  # in-memory databases are already private to the engine
+    suffix = "".join(f"_{part}" for part in (suite, os.getenv("PYTEST_XDIST_WORKER")) if part)
+    if not suffix:
+        return url
+    if parsed.get_backend_name() == "sqlite":
+        root, ext = os.path.splitext(parsed.database)
+        return parsed.set(database=f"{root}{suffix}{ext}").render_as_string(hide_password=False)
+
+    name = f"{parsed.database}{suffix}"
+    admin = create_engine(parsed, isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}
+            ).scalar()
+            if not exists:
+                conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+    finally:
+        admin.dispose()
+    return parsed.set(database=name).render_as_string(hide_password=False)
+
+
+def create_test_engine(url: str):
+    """Create an engine whose connections support nested SAVEPOINTs."""
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url)
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,  # Use static pool to keep same connection across threads
+    )
+
+    # pysqlite's own transaction handling breaks SAVEPOINT; let SQLAlchemy
+    # emit BEGIN itself.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+@pytest.fixture(scope="session")
+def default_database_url():
+    """Database used when TEST_DATABASE_URL is unset; overridden per test directory."""
+    return "sqlite:///:memory:"
+
+
+@pytest.fixture(scope="session")
+def seed():
+    """Callable that fills a fresh database; overridden per test directory."""
+    return lambda engine: None
+
+
+@pytest.fixture(scope="session")
+def _test_engines():
+    """Engines created so far, keyed by database URL."""
+    engines = {}
+    yield engines
+    for engine in engines.values():
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def test_engine(request, _test_engines, default_database_url, seed):
+    """Engine for this suite's database, created and seeded on first use."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        url = private_database_url(url, suite=request.path.parent.name)
+    else:
+        url = private_database_url(default_database_url)
+    if url not in _test_engines:
+        engine = create_test_engine(url)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        seed(engine)
+        _test_engines[url] = engine
+    return _test_engines[url]
+
+
+@pytest.fixture(scope="session")
+def hashed_password():
+    """Low-cost bcrypt hash of ``"password"``, computed once."""
+    return auth_utils.hash_password("password")
+
+
+@pytest.fixture(autouse=True)
+def connection(test_engine):
+    """Run each test in a transaction that is rolled back afterwards."""
+    conn = test_engine.connect()
+    transaction = conn.begin()
+
+    def override_get_db():
+        """Override database dependency for testing"""
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    leaderboard_cache.clear()
+    leaderboard_snapshots.clear()
+    db_breaker.reset()
+    idempotency_store.clear()
+    auth_rate_limiter.reset()
+    score_histogram.reset()
+    try:
+        yield conn
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        transaction.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def db_session(connection):
+    """Provide a database session for direct database manipulation"""
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
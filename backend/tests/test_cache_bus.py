@@ -0,0 +1,73 @@
+import json
+from app.cache_bus import LocalBus, PostgresBus, VersionedCache, invalidation_bus
+from app.main import leaderboard_cache
+from app import db_models
+
+
+def test_versioned_cache_recomputes_after_bump():
+    bus = LocalBus()
+    cache = VersionedCache(bus, "leaderboard")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute(10, compute) == 1
+    assert cache.get_or_compute(10, compute) == 1
+    bus.bump("leaderboard")
+    assert cache.get_or_compute(10, compute) == 2
+
+
+def test_publish_applies_only_on_commit(db_session):
+    before = invalidation_bus.version("leaderboard")
+    db_session.query(db_models.User).count()
+    invalidation_bus.publish(db_session, "leaderboard")
+    db_session.rollback()
+    db_session.commit()
+    assert invalidation_bus.version("leaderboard") == before
+    invalidation_bus.publish(db_session, "leaderboard")
+    db_session.commit()
+    assert invalidation_bus.version("leaderboard") == before + 1
+
+
+def test_postgres_bus_ignores_own_notifications():
+    bus = PostgresBus()
+    bus.handle(json.dumps({"origin": bus.origin, "topics": ["users"]}))
+    assert bus.version("users") == 0
+    bus.handle(json.dumps({"origin": "other-worker", "topics": ["users"]}))
+    assert bus.version("users") == 1
+
+
+def test_leaderboard_served_fresh_after_score_update(client, auth_token):
+    client.get("/api/leaderboard")
+    cached_versions = {entry[0] for entry in leaderboard_cache._entries.values()}
+    client.post("/api/leaderboard",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        json={"score": 9999, "chops": 100}
+    )
+    assert invalidation_bus.version("leaderboard") not in cached_versions
+    data = client.get("/api/leaderboard").json()
+    assert data["entries"][0]["username"] == "ForestKing"
+
+
+def test_postgres_bus_reconnects_and_invalidates_everything(caplog):
+    bus = PostgresBus(reconnect_delay=0.01)
+    cache = VersionedCache(bus, "leaderboard")
+    cache.get_or_compute(10, lambda: "page")
+    attempts = []
+
+    def listen_once(listening):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("server closed the connection unexpectedly")
+        listening()
+        bus._stopping.set()
+
+    bus._listen_once = listen_once
+    bus._listen()
+    assert len(attempts) == 3
+    # Notifications sent while disconnected are lost, so nothing cached survives
+    assert bus.version("leaderboard") == 1
+    assert cache.get_or_compute(10, lambda: "fresh") == "fresh"
+    assert "lost its LISTEN connection" in caplog.text
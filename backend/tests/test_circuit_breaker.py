@@ -0,0 +1,231 @@
+import pytest # type: ignore
+from sqlalchemy import text # type: ignore
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import database as database_module, deadline, main
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, db_breaker
+from app.db import database
+from app.ids import legacy_id
+from app.spool import SessionEndSpool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(**options):
+    clock = FakeClock()
+    settings = dict(failure_rate=0.5, slow_call_seconds=1.0, slow_rate=0.8,
+                    window_seconds=10, min_calls=4, open_seconds=5, clock=clock)
+    settings.update(options)
+    return CircuitBreaker("test", **settings), clock
+
+
+def test_opens_on_error_rate_once_enough_calls():
+    breaker, clock = _breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED  # under min_calls
+    breaker.record(0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow() and breaker.retry_after() == 5
+
+
+def test_old_calls_leave_the_window():
+    breaker, clock = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 11
+    for _ in range(3):
+        breaker.record(0.01)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    # Running counts follow the calls left in the window
+    assert (len(breaker._calls), breaker._failed, breaker._slow) == (4, 1, 0)
+
+
+def test_opens_on_latency():
+    breaker, clock = _breaker()
+    for _ in range(4):
+        breaker.record(1.5)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    breaker, clock = _breaker()
+    closed = []
+    breaker.on_close(lambda: closed.append(True))
+    breaker.trip()
+    clock.now += 5
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    # A failed probe opens it for another period
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+    breaker.record(0.01)
+    assert breaker.state == CLOSED and closed == [True]
+
+
+def test_probe_that_never_reports_is_replaced():
+    breaker, clock = _breaker()
+    breaker.trip()
+    clock.now += 5
+    assert breaker.allow()
+    clock.now += 4
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_engines_report_to_the_breaker(monkeypatch):
+    breaker, clock = _breaker(min_calls=2)
+    monkeypatch.setattr(database_module, "db_breaker", breaker)
+    engine = database_module._create_engine("sqlite://")
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+        with pytest.raises(IntegrityError):
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+        assert breaker.state == CLOSED and len(breaker._calls) == 2
+        for _ in range(2):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+    assert breaker.state == OPEN
+    engine.dispose()
+
+
+def test_deadline_cancellations_are_slow_calls_not_failures(monkeypatch):
+    # Longer than the statement may run
+    breaker, clock = _breaker(min_calls=2, slow_call_seconds=1.0)
+    monkeypatch.setattr(database_module, "db_breaker", breaker)
+    engine = database_module._create_engine("sqlite://")
+    endless = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n")
+    token = deadline.start(0.05)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(endless)
+    finally:
+        deadline.reset(token)
+        engine.dispose()
+    # A database hanging until every deadline still looks slow
+    assert (breaker._failed, breaker._slow) == (0, 1)
+
+
+def test_checkout_timeouts_count_as_failures_at_the_deadline(monkeypatch):
+    breaker, clock = _breaker(min_calls=1)
+    monkeypatch.setattr(main, "db_breaker", breaker)
+    token = deadline.start(0)
+    try:
+        main.record_database_error(PoolTimeoutError())
+    finally:
+        deadline.reset(token)
+    assert breaker.state == OPEN
+
+
+def test_lock_timeout_counts_as_the_deadline_before_it_expires():
+    class LockNotAvailable(Exception):
+        pgcode = "55P03"
+
+    assert not deadline.cancelled_by_deadline(LockNotAvailable())
+    token = deadline.start(10)
+    try:
+        assert deadline.cancelled_by_deadline(LockNotAvailable())
+        assert not deadline.cancelled_by_deadline(ConnectionError())
+    finally:
+        deadline.reset(token)
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = SessionEndSpool(str(tmp_path / "spool.db"))
+    monkeypatch.setattr(main, "session_spool", spool)
+    yield spool
+    spool.dispose()
+
+
+def test_open_breaker_fails_fast(client, auth_token):
+    db_breaker.trip()
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 503 and int(response.headers["Retry-After"]) >= 1
+    assert client.get("/api/health").status_code == 200
+    assert client.get("/api/game/stats", headers={"Authorization": f"Bearer {auth_token}"}).status_code == 503
+
+
+def test_leaderboard_serves_last_page_while_open(client):
+    db_breaker.trip()
+    assert client.get("/api/leaderboard").status_code == 503  # nothing served yet
+
+    db_breaker.reset()
+    fresh = client.get("/api/leaderboard", params={"limit": 3}).json()
+    assert fresh["stale"] is False
+    db_breaker.trip()
+    stale = client.get("/api/leaderboard", params={"limit": 2}).json()
+    assert stale["stale"] is True
+    assert stale["entries"] == fresh["entries"][:2]
+
+
+def test_leaderboard_falls_back_when_a_query_fails(client, monkeypatch):
+    client.get("/api/leaderboard")
+    main.leaderboard_cache.clear()
+
+    def unreachable(*args):
+        raise OperationalError("SELECT", {}, Exception("server closed the connection"))
+
+    monkeypatch.setattr(database, "get_leaderboard", unreachable)
+    body = client.get("/api/leaderboard").json()
+    assert body["stale"] is True and body["entries"][0]["username"] == "PaulBunyan"
+
+
+def test_session_end_is_spooled_and_replayed(client, auth_token, connection, spool, monkeypatch):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    session_id = client.post("/api/game/session", headers=headers).json()["session"]["id"]
+
+    db_breaker.trip()
+    end = {"score": 7777, "chops": 70, "duration": 42.0}
+    response = client.post(f"/api/game/session/{session_id}/end", json=end,
+                           headers={**headers, "Idempotency-Key": "end-1"})
+    assert response.status_code == 202
+    assert response.json()["queued"] is True and response.json()["session"] is None
+    # A retry is not spooled twice
+    assert client.post(f"/api/game/session/{session_id}/end", json=end, headers=headers).status_code == 202
+    assert spool.pending() == 1
+    # Tokens are still checked
+    assert client.post(f"/api/game/session/{session_id}/end", json=end,
+                       headers={"Authorization": "Bearer forged"}).status_code == 401
+
+    db_breaker.reset()
+    monkeypatch.setattr(main, "SessionLocal",
+                        lambda: Session(bind=connection, join_transaction_mode="create_savepoint"))
+    assert main.replay_session_spool() == 1
+    assert spool.pending() == 0
+    me = client.get("/api/auth/me", headers=headers).json()["user"]
+    assert me["highScore"] == 7777
+    # The retried request replays what the spooled write produced
+    replayed = client.post(f"/api/game/session/{session_id}/end", json=end,
+                           headers={**headers, "Idempotency-Key": "end-1"}).json()
+    assert replayed["session"]["score"] == 7777 and replayed["queued"] is False
+
+
+def test_replay_stops_at_failure_and_keeps_the_rest(spool):
+    for n in range(3):
+        spool.add(legacy_id("1"), legacy_id(f"spooled-{n}"), n, n, 1.0)
+    applied = []
+
+    def apply(entry):
+        if len(applied) == 1:
+            raise OperationalError("UPDATE", {}, Exception("gone again"))
+        applied.append(entry["session_id"])
+
+    with pytest.raises(OperationalError):
+        spool.replay(apply)
+    assert applied == [legacy_id("spooled-0")] and spool.pending() == 2
+    assert spool.replay(lambda entry: applied.append(entry["session_id"])) == 2
+    assert applied[1:] == [legacy_id("spooled-1"), legacy_id("spooled-2")]
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import pytest # type: ignore
+from sqlalchemy import text # type: ignore
+from sqlalchemy.exc import OperationalError # type: ignore
+from starlette.requests import Request # type: ignore
+from app import database as database_module, deadline, main
+from app.db import database
+from app.metrics import registry
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    registry.reset()
+
+
+@pytest.fixture
+def no_deadline():
+    token = deadline._deadline.set(None)
+    yield
+    deadline.reset(token)
+
+
+def test_route_budgets(monkeypatch):
+    assert deadline.parse_route_deadlines(" GET  /api/leaderboard=250, GET /api/x=none,") == {
+        "GET /api/leaderboard": 250.0, "GET /api/x": None,
+    }
+    with pytest.raises(ValueError):
+        deadline.parse_route_deadlines("250")
+    monkeypatch.setitem(deadline.route_deadlines_ms, "GET /api/leaderboard", 250)
+    assert deadline.budget_for("GET /api/leaderboard") == 0.25
+    assert deadline.budget_for("GET /api/leaderboard/export") is None
+    assert deadline.budget_for("GET /api/auth/me") == deadline.REQUEST_DEADLINE_MS / 1000
+
+
+def test_transaction_timeouts_follow_the_time_left(no_deadline):
+    assert deadline.transaction_timeouts() is None
+    token = deadline.start(2.0)
+    try:
+        statement_ms, lock_ms = deadline.transaction_timeouts()
+        assert 1900 < statement_ms <= 2000 and lock_ms == int(statement_ms * deadline.DB_LOCK_TIMEOUT_SHARE)
+    finally:
+        deadline.reset(token)
+    token = deadline.start(-0.001)
+    try:
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.transaction_timeouts()
+    finally:
+        deadline.reset(token)
+
+
+def test_postgres_transactions_begin_with_local_timeouts():
+    executed = []
+
+    class FakeConnection:
+        class dialect:
+            name = "postgresql"
+
+        def execute(self, statement, params):
+            executed.append((str(statement), params))
+
+    token = deadline.start(1.5)
+    try:
+        database_module._begin_within_deadline(FakeConnection())
+    finally:
+        deadline.reset(token)
+    [(sql, params)] = executed
+    assert "set_config('statement_timeout'" in sql and "set_config('lock_timeout'" in sql and ", true)" in sql
+    assert params["statement_timeout"].endswith("ms") and int(params["statement_timeout"][:-2]) > 1400
+
+
+def test_sqlite_statement_is_interrupted_at_the_deadline():
+    engine = database_module._create_engine("sqlite://")
+    endless = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c")
+    token = deadline.start(0.05)
+    try:
+        began = time.monotonic()
+        with engine.connect() as conn, pytest.raises(OperationalError, match="interrupted"):
+            conn.execute(endless)
+        assert time.monotonic() - began < 1
+        # No new transaction starts once the time is up
+        with engine.connect() as conn, pytest.raises(deadline.DeadlineExceeded):
+            conn.execute(text("SELECT 1"))
+    finally:
+        deadline.reset(token)
+        engine.dispose()
+
+
+def test_slow_route_answers_504_and_is_counted(client, monkeypatch):
+    monkeypatch.setitem(deadline.route_deadlines_ms, "GET /api/leaderboard", 50)
+    seen = {}
+
+    def slow_leaderboard(db, limit, mode):
+        seen["remaining"] = deadline.remaining()
+        time.sleep(0.3)
+        return []
+
+    monkeypatch.setattr(database, "get_leaderboard", slow_leaderboard)
+    answered = []
+    respond = main.deadline_exceeded_response
+    monkeypatch.setattr(main, "deadline_exceeded_response",
+                        lambda request: answered.append(time.monotonic()) or respond(request))
+    began = time.monotonic()
+    response = client.get("/api/leaderboard")
+    assert response.status_code == 504
+    # Answered at the deadline, without waiting for the handler's thread
+    assert answered[0] - began < 0.25
+    # The handler's thread sees the same deadline
+    assert 0 < seen["remaining"] <= 0.05
+    assert deadline.DEADLINE_EXCEEDED.value(route="GET /api/leaderboard") == 1
+    assert 'request_deadline_exceeded_total{route="GET /api/leaderboard"} 1' in client.get("/api/metrics").text
+
+
+def test_routes_without_budget_run_unbounded(client, monkeypatch):
+    monkeypatch.setitem(deadline.route_deadlines_ms, "GET /api/health", None)
+    assert client.get("/api/health").status_code == 200
+    assert main.route_name(_request("GET", "/api/game/session/abc/end")) == "GET unmatched"
+    assert main.route_name(_request("POST", "/api/game/session/abc/end")) == "POST /api/game/session/{session_id}/end"
+
+
+def _request(method, path):
+    return Request({"type": "http", "method": method, "path": path, "root_path": "",
+                    "query_string": b"", "headers": [], "path_params": {}})
+
+
+def test_database_timeout_at_the_deadline_is_a_504():
+    token = deadline.start(-0.001)
+    try:
+        error = OperationalError("SELECT", {}, Exception("canceling statement due to statement timeout"))
+        response = asyncio.run(main.database_error_handler(_request("GET", "/api/game/stats"), error))
+    finally:
+        deadline.reset(token)
+    assert response.status_code == 504
+    assert deadline.DEADLINE_EXCEEDED.value(route="GET /api/game/stats") == 1
@@ -0,0 +1,82 @@
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql # type: ignore
+from app import db_models
+from app.database import pipeline
+from app.db import database, SESSION_FOR_END
+from app.ids import legacy_id
+
+
+def _counters(db_session, user_id):
+    user = db_session.get(db_models.User, user_id)
+    db_session.refresh(user)
+    return user.high_score, user.total_chops, user.games_played
+
+
+def test_end_session_updates_user_and_stats_once(db_session):
+    high_score, total_chops, games_played = _counters(db_session, legacy_id("24"))
+    session = database.create_session(db_session, legacy_id("24"))
+
+    ended = database.end_session(db_session, session["id"], high_score + 700, 40, 30.0)
+    assert (ended["score"], ended["chops"], ended["userId"]) == (high_score + 700, 40, legacy_id("24"))
+    assert ended["endedAt"] is not None
+    # A retry reports the stored result and counts nothing again
+    assert database.end_session(db_session, session["id"], 1, 1, 1.0)["score"] == high_score + 700
+
+    assert _counters(db_session, legacy_id("24")) == (high_score + 700, total_chops + 40, games_played + 1)
+    user_stats = db_session.get(db_models.UserStats, legacy_id("24"))
+    assert (user_stats.games, user_stats.score_sum, user_stats.chops_sum) == (1, high_score + 700, 40)
+
+    lower = database.create_session(db_session, legacy_id("24"))
+    database.end_session(db_session, lower["id"], 5, 2, 10.0)
+    assert _counters(db_session, legacy_id("24"))[0] == high_score + 700
+    db_session.refresh(user_stats)
+    assert (user_stats.games, user_stats.best_score) == (2, high_score + 700)
+
+
+def test_end_session_locks_session_user_and_stats_rows():
+    sql = str(SESSION_FOR_END.compile(dialect=postgresql.dialect()))
+    # Stats are rewritten from this read, so a concurrent end must wait for it
+    assert sql.endswith("FOR UPDATE OF game_sessions, users, user_stats")
+
+
+def test_end_unknown_session_writes_nothing(db_session):
+    assert database.end_session(db_session, str(uuid.uuid4()), 10, 1, 1.0) is None
+    assert db_session.query(db_models.UserStats).count() == 0
+
+
+
+class FakePsycopgSession:
+    """Just enough of a Session on a psycopg (v3) connection for ``pipeline``."""
+
+    def __init__(self):
+        self.events = []
+        self.in_pipeline = False
+        driver_connection = SimpleNamespace(pipeline=self._pipeline, commit=lambda: self.events.append("COMMIT"))
+        self._connection = SimpleNamespace(
+            dialect=SimpleNamespace(driver="psycopg"),
+            connection=SimpleNamespace(driver_connection=driver_connection),
+        )
+
+    @contextmanager
+    def _pipeline(self):
+        self.in_pipeline = True
+        yield
+        self.in_pipeline = False
+        self.events.append("sync")
+
+    def connection(self):
+        return self._connection
+
+    def commit(self):
+        # The session hands its connection back to the pool here
+        assert not self.in_pipeline
+        self.events.append("session commit")
+
+
+def test_pipeline_commits_before_the_session_releases_the_connection():
+    db = FakePsycopgSession()
+    with pipeline(db):
+        db.events.append("update")
+    assert db.events == ["update", "COMMIT", "sync", "session commit"]
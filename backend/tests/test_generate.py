@@ -0,0 +1,34 @@
+from app.db_models import GameSession, User, UserStats
+from app.generate import SESSION_COLUMNS, STATS_COLUMNS, USER_COLUMNS, generate_batches
+
+
+def test_batches_are_bounded_and_consistent():
+    batches = list(generate_batches(users=250, sessions=1000, batch_size=100, password_hashes=["a", "b"], seed=1))
+    assert [len(users) for users, _ in batches] == [100, 100, 50]
+
+    users = [user for batch, _ in batches for user in batch]
+    sessions = [session for _, batch in batches for session in batch]
+    assert len({user["username"] for user in users}) == 250
+    assert {user["password"] for user in users} == {"a", "b"}
+
+    for user in users:
+        own = [s for s in sessions if s["user_id"] == user["id"]]
+        assert user["games_played"] == len(own)
+        assert user["high_score"] == max((s["score"] for s in own), default=0)
+        assert user["total_chops"] == sum(s["chops"] for s in own)
+
+
+def test_copy_columns_cover_every_required_column():
+    # COPY writes only the listed columns; a NOT NULL column without a server
+    # default left out of the list is inserted as NULL and fails on PostgreSQL
+    for table, columns in [(User.__table__, USER_COLUMNS), (GameSession.__table__, SESSION_COLUMNS),
+                           (UserStats.__table__, STATS_COLUMNS)]:
+        required = {column.name for column in table.columns if not column.nullable and column.server_default is None}
+        assert required <= set(columns), table.name
+        assert set(columns) <= set(table.columns.keys()), table.name
+
+
+def test_generated_rows_fill_every_copied_column():
+    users, sessions = next(generate_batches(users=5, sessions=20, batch_size=5, password_hashes=["a"], seed=2))
+    assert all(set(USER_COLUMNS) <= set(user) for user in users)
+    assert all(set(SESSION_COLUMNS) <= set(session) for session in sessions)
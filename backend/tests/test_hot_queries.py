@@ -0,0 +1,27 @@
+from app import database as database_module
+from app.db import database
+from app.ids import legacy_id
+
+
+def test_hot_lookups_reuse_compiled_statements(db_session):
+    cache = db_session.get_bind().engine._compiled_cache
+    assert database.get_user_by_id(db_session, legacy_id("1"))["username"] == "ForestKing"
+    assert database.get_user_by_email(db_session, "AXE@master.com")["username"] == "AxeMaster"
+    assert database.get_leaderboard(db_session, 2)[0]["username"] == "PaulBunyan"
+    cached = len(cache)
+
+    # New parameter values reuse the compiled statements
+    assert database.get_user_by_id(db_session, legacy_id("4"))["username"] == "PaulBunyan"
+    assert database.get_user_by_email(db_session, "paul@LEGENDS.com")["username"] == "PaulBunyan"
+    assert [user["username"] for user in database.get_leaderboard(db_session, 3)] == [
+        "PaulBunyan", "ForestKing", "AxeMaster",
+    ]
+    assert len(cache) == cached
+
+
+def test_prepared_statements_only_configured_for_psycopg(monkeypatch):
+    monkeypatch.setattr(database_module, "DB_PREPARE_THRESHOLD", "1")
+    assert database_module._connect_args("postgresql+psycopg://u@h/db") == {"prepare_threshold": 1}
+    assert database_module._connect_args("postgresql://u@h/db") == {}
+    monkeypatch.setattr(database_module, "DB_PREPARE_THRESHOLD", "")
+    assert database_module._connect_args("postgresql+psycopg://u@h/db") == {"prepare_threshold": None}
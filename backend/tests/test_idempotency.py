@@ -0,0 +1,118 @@
+import pytest # type: ignore
+
+from app import db_models
+from app.idempotency import IdempotencyStore, DbIdempotencyStore, RequestInProgress, idempotency_store, scoped_key
+from app.ids import legacy_id
+
+
+def test_store_evicts_expired_and_least_recent():
+    now = [0.0]
+    store = IdempotencyStore(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    store.put(None, "a", {"n": 1})
+    store.put(None, "b", {"n": 2})
+    store.get(None, "a")
+    store.put(None, "c", {"n": 3})
+    assert store.get(None, "b") is None
+    assert store.get(None, "a") == {"n": 1}
+    now[0] = 11
+    assert store.get(None, "c") is None
+
+
+def test_db_store_survives_memory_loss(db_session):
+    store = DbIdempotencyStore()
+    store.put(db_session, "user:scope:key", {"success": True})
+    store.clear()
+    assert store.get(db_session, "user:scope:key") == {"success": True}
+    db_session.query(db_models.IdempotencyKey).delete()
+    db_session.commit()
+
+
+def test_claim_refuses_duplicates_until_the_response_is_stored():
+    store = IdempotencyStore()
+    assert store.claim(None, "a") is None
+    with pytest.raises(RequestInProgress):
+        store.claim(None, "a")
+    store.put(None, "a", {"n": 1})
+    assert store.claim(None, "a") == {"n": 1}
+    # A request that failed gives its key up
+    assert store.claim(None, "b") is None
+    store.release("b")
+    assert store.claim(None, "b") is None
+
+
+def test_db_claim_commits_with_the_write(db_session):
+    store = DbIdempotencyStore()
+    assert store.claim(db_session, "user:scope:key") is None
+    db_session.rollback()
+    # The failed write took its claim with it
+    store.release("user:scope:key")
+    assert store.claim(db_session, "user:scope:key") is None
+    db_session.commit()
+    # Another worker sees the committed claim as still in progress
+    store.clear()
+    with pytest.raises(RequestInProgress):
+        store.claim(db_session, "user:scope:key")
+    store.put(db_session, "user:scope:key", {"success": True})
+    store.clear()
+    assert store.claim(db_session, "user:scope:key") == {"success": True}
+    db_session.query(db_models.IdempotencyKey).delete()
+    db_session.commit()
+
+
+def _end(client, token, session_id, key=None, score=100):
+    headers = {"Authorization": f"Bearer {token}"}
+    if key:
+        headers["Idempotency-Key"] = key
+    return client.post(f"/api/game/session/{session_id}/end", headers=headers,
+                       json={"score": score, "chops": 10, "duration": 60})
+
+
+def test_retried_session_end_counts_once(client, auth_token, db_session):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    session_id = client.post("/api/game/session", headers=headers).json()["session"]["id"]
+
+    first = _end(client, auth_token, session_id, key="retry-1").json()
+    assert _end(client, auth_token, session_id, key="retry-1").json() == first
+    # Without a key the already-ended session is returned unchanged
+    assert _end(client, auth_token, session_id, score=999).json()["session"]["score"] == 100
+
+    user = db_session.get(db_models.User, legacy_id("1"))
+    assert user.games_played == 121
+    assert user.total_chops == 15010
+
+
+def test_retried_score_submit_counts_once(client, auth_token, db_session):
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "submit-1"}
+    for _ in range(2):
+        response = client.post("/api/leaderboard", headers=headers, json={"score": 10, "chops": 5})
+        assert response.status_code == 200
+    assert db_session.get(db_models.User, legacy_id("1")).games_played == 121
+
+
+def test_retried_score_submit_counts_once_with_db_store(client, auth_token, db_session, monkeypatch):
+    from app import main
+    monkeypatch.setattr(main, "idempotency_store", DbIdempotencyStore())
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "submit-db"}
+    first = client.post("/api/leaderboard", headers=headers, json={"score": 10, "chops": 5}).json()
+    main.idempotency_store.clear()
+    assert client.post("/api/leaderboard", headers=headers, json={"score": 10, "chops": 5}).json() == first
+    assert db_session.get(db_models.User, legacy_id("1")).games_played == 121
+
+
+def test_duplicate_submit_in_progress_is_refused(client, auth_token, db_session):
+    idempotency_store.claim(None, scoped_key(legacy_id("1"), "leaderboard", "submit-2"))
+    response = client.post("/api/leaderboard", json={"score": 10, "chops": 5},
+                           headers={"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "submit-2"})
+    assert response.status_code == 409
+    assert db_session.get(db_models.User, legacy_id("1")).games_played == 120
+
+
+def test_purge_expired_drops_stale_responses():
+    now = [0.0]
+    store = IdempotencyStore(max_entries=10, ttl_seconds=10, clock=lambda: now[0])
+    store.put(None, "a", {"n": 1})
+    now[0] = 5
+    store.put(None, "b", {"n": 2})
+    now[0] = 12
+    assert store.purge_expired(None) == 1
+    assert store.get(None, "b") == {"n": 2}
@@ -0,0 +1,69 @@
+import uuid
+from sqlalchemy import create_engine, text # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import db_models, ids
+from app.ids import legacy_id
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id VARCHAR PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, "
+    "password VARCHAR NOT NULL, created_at DATETIME NOT NULL, high_score INTEGER NOT NULL, "
+    "total_chops INTEGER NOT NULL, games_played INTEGER NOT NULL)",
+    "CREATE UNIQUE INDEX ix_users_username ON users (username)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_users_high_score ON users (high_score)",
+    "CREATE TABLE game_sessions (id VARCHAR PRIMARY KEY, user_id VARCHAR NOT NULL REFERENCES users (id), "
+    "score INTEGER NOT NULL, chops INTEGER NOT NULL, duration FLOAT NOT NULL, "
+    "started_at DATETIME NOT NULL, ended_at DATETIME)",
+    "CREATE INDEX ix_game_sessions_user_history ON game_sessions (user_id, started_at DESC, id DESC)",
+]
+
+
+def test_uuid7_is_time_ordered():
+    generated = [ids.uuid7() for _ in range(5000)]
+    assert all(value.version == 7 and value.variant == uuid.RFC_4122 for value in generated)
+    assert generated == sorted(generated)
+    assert [str(value) for value in generated] == sorted(str(value) for value in generated)
+
+
+def test_ids_are_stored_as_16_bytes_on_sqlite(db_session):
+    if db_session.get_bind().dialect.name != "sqlite":
+        return
+    stored = db_session.execute(text("SELECT id FROM users WHERE username = 'ForestKing'")).scalar_one()
+    assert stored == uuid.UUID(legacy_id("1")).bytes
+    assert db_session.get(db_models.User, legacy_id("1")).username == "ForestKing"
+
+
+def test_unknown_or_malformed_session_id_is_not_found(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for session_id in (str(ids.uuid7()), "not-a-uuid"):
+        response = client.post(f"/api/game/session/{session_id}/end", headers=headers,
+                               json={"score": 1, "chops": 1, "duration": 1.0})
+        assert response.json()["success"] is False
+
+
+def test_migrate_converts_text_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    existing = str(uuid.uuid4())
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        for user_id, name in [("1", "Legacy"), (existing, "Modern")]:
+            conn.execute(text(
+                "INSERT INTO users VALUES (:id, :name, :email, 'x', '2024-01-01 00:00:00.000000', 10, 0, 1)"
+            ), {"id": user_id, "name": name, "email": f"{name.lower()}@example.com"})
+        conn.execute(text(
+            "INSERT INTO game_sessions VALUES ('session-1', '1', 10, 1, 5.0, "
+            "'2024-01-02 00:00:00.000000', '2024-01-02 00:00:05.000000')"
+        ))
+
+    assert ids.migrate_ids(engine, batch_size=1) == 3
+    assert ids.migrate_ids(engine) == 0
+    with Session(bind=engine) as db:
+        assert db.get(db_models.User, legacy_id("1")).username == "Legacy"
+        assert db.get(db_models.User, existing).username == "Modern"
+        session = db.get(db_models.GameSession, legacy_id("session-1"))
+        assert session.user_id == legacy_id("1")
+        assert session.ended_at.second == 5
+        indexes = {row[0] for row in db.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        assert "ix_game_sessions_user_history" in indexes
+    engine.dispose()
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from app import db_models
+from app.db import database
+from app.ids import legacy_id
+from app.export import encode_rank_cursor, main as export_main
+
+
+REACHED = datetime(2024, 9, 1, tzinfo=timezone.utc)
+
+
+def _add_tied_users(db_session):
+    """Two more players on 2200, tying AxeMaster, all reaching it at the same moment."""
+    db_session.get(db_models.User, legacy_id("2")).high_score_at = REACHED
+    for user_id, username in [("3", "TimberTom"), ("30", "BirchBeth")]:
+        db_session.add(db_models.User(
+            id=legacy_id(user_id), username=username, email=f"{username.lower()}@example.com",
+            password="x", high_score=2200, high_score_at=REACHED, total_chops=100, games_played=2,
+        ))
+    db_session.commit()
+
+
+def test_ranks_are_distinct_and_follow_leaderboard_order(db_session):
+    _add_tied_users(db_session)
+    rows = list(database.iter_leaderboard(db_session, batch_size=2))
+    tied = sorted(legacy_id(user_id) for user_id in ["2", "3", "30"])
+    assert [row["rank"] for row in rows] == [1, 2, 3, 4, 5, 6]
+    assert [row["id"] for row in rows] == [legacy_id("4"), legacy_id("1"), *tied, legacy_id("24")]
+
+    # Whoever reached the score first comes first
+    db_session.get(db_models.User, tied[2]).high_score_at = REACHED - timedelta(days=1)
+    db_session.commit()
+    rows = list(database.iter_leaderboard(db_session))
+    assert [row["id"] for row in rows[2:5]] == [tied[2], *tied[:2]]
+    assert rows == [dict(row, rank=rank) for rank, row in enumerate(rows, 1)]
+
+
+def test_resume_from_rank_cursor_continues_numbering(db_session):
+    _add_tied_users(db_session)
+    full = list(database.iter_leaderboard(db_session))
+    # Cursor taken in the middle of the tie on 2200
+    resumed = list(database.iter_leaderboard(db_session, after=(3, 2200, full[2]["id"])))
+    assert resumed == full[3:]
+
+
+def test_export_endpoint_streams_ndjson_and_csv(client):
+    exported = client.get("/api/leaderboard/export")
+    assert exported.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in exported.text.splitlines()]
+    assert [row["username"] for row in rows] == ["PaulBunyan", "ForestKing", "AxeMaster", "RedwoodRookie"]
+    assert rows[0] == {"rank": 1, "id": legacy_id("4"), "username": "PaulBunyan", "highScore": 5000, "totalChops": 50000}
+
+    cursor = encode_rank_cursor(rows[1])
+    exported = client.get("/api/leaderboard/export", params={"format": "csv", "after": cursor})
+    csv_rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [(row["rank"], row["username"]) for row in csv_rows] == [("3", "AxeMaster"), ("4", "RedwoodRookie")]
+
+
+def test_export_endpoint_gzips_when_accepted(client):
+    exported = client.get("/api/leaderboard/export", headers={"Accept-Encoding": "gzip"})
+    assert exported.headers["content-encoding"] == "gzip"
+    assert len(exported.text.splitlines()) == 4
+
+    raw = client.get("/api/leaderboard/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+
+
+def test_export_endpoint_rejects_bad_cursor(client):
+    assert client.get("/api/leaderboard/export", params={"after": "nope"}).status_code == 400
+
+
+def test_cli_writes_gzipped_export(tmp_path, monkeypatch, db_session):
+    monkeypatch.setattr("app.database.SessionLocal", lambda: db_session)
+    monkeypatch.setattr("app.database.init_read_engine", lambda: None)
+    monkeypatch.setattr(db_session, "close", lambda: None)
+    output = tmp_path / "leaderboard.ndjson.gz"
+    export_main(["--gzip", "-o", str(output), "--after", f"2:2500:{legacy_id('1')}"])
+    lines = gzip.decompress(output.read_bytes()).decode().splitlines()
+    assert [json.loads(line)["rank"] for line in lines] == [3, 4]
@@ -0,0 +1,292 @@
+import json
+from datetime import datetime, timezone
+import pytest # type: ignore
+from sqlalchemy import create_engine, inspect # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import db_models, ids
+from app.database import Base
+from app.ids import legacy_id
+from app.leaderboard_store import (
+    InMemoryLeaderboardStore, LeaderboardStore, RedisLeaderboardStore, SqlLeaderboardStore
+)
+from app.ranking import RANK_MODES, USER_RANK, migrate_high_score_at
+
+
+class FakeSortedSetRedis:
+    """Minimal stand-in for the redis-py commands the Redis store uses.
+
+    Every sorted set member has score 0, as in the store, so order is
+    lexicographic.
+    """
+
+    def __init__(self):
+        self.zsets, self.hashes, self.strings = {}, {}, {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches):
+        pipe = FakePipeline(self, immediate=True)
+        func(pipe)
+        pipe.execute()
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, set()).update(mapping)
+
+    def zrem(self, key, *members):
+        self.zsets.get(key, set()).difference_update(members)
+
+    @staticmethod
+    def _in_range(member, low, high):
+        above = low == "-" or (member >= low[1:] if low[0] == "[" else member > low[1:])
+        below = high == "+" or (member <= high[1:] if high[0] == "[" else member < high[1:])
+        return above and below
+
+    def zrangebylex(self, key, low, high, start=None, num=None):
+        members = sorted(m for m in self.zsets.get(key, ()) if self._in_range(m, low, high))
+        return members[start:start + num] if num is not None else members
+
+    def zlexcount(self, key, low, high):
+        return len(self.zrangebylex(key, low, high))
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            for store in (self.zsets, self.hashes, self.strings):
+                store.pop(key, None)
+
+    def rename(self, src, dst):
+        for store in (self.zsets, self.hashes):
+            if src in store:
+                store[dst] = store.pop(src)
+
+
+class FakePipeline:
+    """Queues commands; in a transaction, reads run at once until ``multi``."""
+
+    def __init__(self, client, immediate=False):
+        self.client, self.calls, self.immediate = client, [], immediate
+
+    def multi(self):
+        self.immediate = False
+
+    def __getattr__(self, name):
+        if self.immediate:
+            return getattr(self.client, name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self.calls:
+            getattr(self.client, name)(*args, **kwargs)
+        self.calls = []
+
+
+def _at(day):
+    return datetime(2024, 9, day, tzinfo=timezone.utc)
+
+
+def _user(user_id, score, username=None, chops=0, at=None):
+    return {"id": user_id, "username": username or user_id, "highScore": score,
+            "highScoreAt": at, "totalChops": chops}
+
+
+def _add_ties(db_session, forest_king=2500):
+    """Scores 5000, 2500 x2 (reached on different days), 2200 x3, 50."""
+    reached = {"4": _at(1), "1": _at(9), "2": _at(1), "24": _at(1)}
+    for user_id, at in reached.items():
+        user = db_session.get(db_models.User, legacy_id(user_id))
+        user.high_score_at = at
+    db_session.get(db_models.User, legacy_id("1")).high_score = forest_king
+    db_session.get(db_models.User, legacy_id("24")).high_score = 50
+    for user_id, score, day in [("5", 2500, 3), ("3", 2200, 2), ("30", 2200, 2)]:
+        if db_session.get(db_models.User, legacy_id(user_id)) is None:
+            db_session.add(db_models.User(
+                id=legacy_id(user_id), username=f"Tied{user_id}", email=f"tied{user_id}@example.com",
+                password="x", high_score=score, high_score_at=_at(day), total_chops=0, games_played=1,
+            ))
+    db_session.commit()
+
+
+def _check_store(store, db_session):
+    assert store.rebuild(db_session) == 4
+    assert [e["username"] for e in store.get_leaderboard(db_session, 2)] == ["PaulBunyan", "ForestKing"]
+    assert store.get_user_rank(db_session, legacy_id("24")) == 4
+
+    # Scores only go up; display fields always follow the latest write
+    store.submit_score(_user(legacy_id("24"), 10, "Rookie", chops=99))
+    assert store.get_user_rank(db_session, legacy_id("24")) == 4
+    store.submit_score(_user(legacy_id("24"), 6000, "Rookie", chops=99, at=_at(1)))
+    top = store.get_leaderboard(db_session, 1)[0]
+    assert top == {"id": legacy_id("24"), "username": "Rookie", "highScore": 6000,
+                   "highScoreAt": _at(1), "totalChops": 99, "rank": 1}
+    assert store.get_user_rank(db_session, "missing") == 0
+
+
+def _check_ties(store, db_session):
+    """Ties rank the same in every store as they do in SQL."""
+    _add_ties(db_session)
+    store.rebuild(db_session)
+    # A score change on the mirrored side moves a player out of a tie
+    store.submit_score(_user(legacy_id("1"), 2600, "ForestKing", at=_at(9)))
+    _add_ties(db_session, forest_king=2600)
+    sql = SqlLeaderboardStore()
+    for mode in RANK_MODES:
+        expected = sql.get_leaderboard(db_session, 10, mode)
+        assert [(e["id"], e["rank"]) for e in store.get_leaderboard(db_session, 10, mode)] == [
+            (e["id"], e["rank"]) for e in expected
+        ]
+        for entry in expected:
+            assert store.get_user_rank(db_session, entry["id"], mode) == entry["rank"]
+
+
+def test_in_memory_store(db_session):
+    _check_store(InMemoryLeaderboardStore(), db_session)
+
+
+def test_redis_store(db_session):
+    client = FakeSortedSetRedis()
+    _check_store(RedisLeaderboardStore(client), db_session)
+    assert json.loads(client.hashes["leaderboard:users"][legacy_id("24")])["username"] == "Rookie"
+
+
+def test_redis_rebuild_keeps_scores_raised_during_it(db_session):
+    client = FakeSortedSetRedis()
+    store = RedisLeaderboardStore(client)
+    rename = client.rename
+
+    def swap_after_a_concurrent_score(src, dst):
+        if dst == store.scores_key:
+            # Another worker commits a new high score and mirrors it to the
+            # live keys after the snapshot was read, just before the swap
+            user = db_session.get(db_models.User, legacy_id("24"))
+            user.high_score, user.high_score_at = 9000, datetime.now(timezone.utc)
+            db_session.commit()
+            store.submit_score(user.to_dict())
+        rename(src, dst)
+
+    client.rename = swap_after_a_concurrent_score
+    assert store.rebuild(db_session) == 4
+    assert store.get_leaderboard(db_session, 1)[0]["highScore"] == 9000
+    # Temporary keys were this run's own, and the lock is released
+    assert not [key for key in client.zsets if ":rebuild:" in key]
+    assert store.lock_key not in client.strings
+
+
+def test_redis_rebuild_skipped_while_another_runs(db_session):
+    client = FakeSortedSetRedis()
+    store = RedisLeaderboardStore(client)
+    client.set(store.lock_key, "other-host")
+    assert store.rebuild(db_session) == 0
+    assert client.zsets == {} and client.get(store.lock_key) == "other-host"
+
+
+def test_in_memory_store_tie_modes(db_session):
+    _check_ties(InMemoryLeaderboardStore(), db_session)
+
+
+def test_redis_store_tie_modes(db_session):
+    _check_ties(RedisLeaderboardStore(FakeSortedSetRedis()), db_session)
+
+
+def test_sql_store_reads_users_table(db_session):
+    store = SqlLeaderboardStore()
+    assert store.get_leaderboard(db_session, 1)[0]["username"] == "PaulBunyan"
+    assert store.get_user_rank(db_session, legacy_id("1")) == 2
+
+
+def test_sql_tie_modes(db_session):
+    _add_ties(db_session)
+    store = SqlLeaderboardStore()
+    expected = {
+        "rank": [1, 2, 2, 4, 4, 4, 7],
+        "dense": [1, 2, 2, 3, 3, 3, 4],
+        "row": [1, 2, 3, 4, 5, 6, 7],
+    }
+    for mode, ranks in expected.items():
+        entries = store.get_leaderboard(db_session, 10, mode)
+        assert [entry["rank"] for entry in entries] == ranks
+        # A one-user lookup agrees with the ranked page, whatever the page size
+        assert [store.get_user_rank(db_session, entry["id"], mode) for entry in entries] == ranks
+    # ForestKing reached 2500 after LumberJill; AxeMaster reached 2200 first
+    names = [entry["username"] for entry in store.get_leaderboard(db_session, 10, "row")]
+    assert names[1:4] == ["Tied5", "ForestKing", "AxeMaster"]
+    assert store.get_leaderboard(db_session, 3, "rank")[2]["rank"] == 2
+    assert store.get_user_rank(db_session, ids.new_id()) == 0
+
+
+def test_leaderboard_endpoint_tie_modes(client, db_session):
+    _add_ties(db_session)
+    for mode, ranks in [("rank", [1, 2, 2, 4]), ("dense", [1, 2, 2, 3]), ("row", [1, 2, 3, 4])]:
+        entries = client.get("/api/leaderboard", params={"limit": 4, "ranking": mode}).json()["entries"]
+        assert [entry["rank"] for entry in entries] == ranks
+    assert entries[0]["timestamp"].startswith("2024-09-01")
+    assert client.get("/api/leaderboard", params={"ranking": "olympic"}).status_code == 422
+
+
+def test_rank_lookup_uses_leaderboard_index(db_session):
+    if db_session.get_bind().dialect.name != "sqlite":
+        pytest.skip("plan text checked for SQLite only")
+    for mode in RANK_MODES:
+        query = USER_RANK[mode].params(user_id=legacy_id("1")).compile(
+            dialect=db_session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        assert "ix_users_leaderboard" in detail and "SCAN users" not in detail.replace("SCAN users USING COVERING INDEX", "")
+
+
+def test_migrate_high_score_at_backfills_legacy_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(engine)
+    played, idle = legacy_id("m1"), legacy_id("m2")
+    with Session(bind=engine) as db:
+        db.add_all([
+            db_models.User(id=played, username="Played", email="played@example.com", password="x",
+                           high_score=300, created_at=datetime(2024, 1, 1)),
+            db_models.User(id=idle, username="Idle", email="idle@example.com", password="x",
+                           high_score=0, created_at=datetime(2024, 2, 1)),
+        ])
+        for score, day in [(300, 5), (300, 3), (100, 2)]:
+            db.add(db_models.GameSession(id=ids.new_id(), user_id=played, score=score,
+                                         ended_at=datetime(2024, 3, day)))
+        db.commit()
+    with engine.begin() as conn:
+        # Shape of a database created before high_score_at existed
+        conn.exec_driver_sql("DROP INDEX ix_users_leaderboard")
+        conn.exec_driver_sql("ALTER TABLE users DROP COLUMN high_score_at")
+        conn.exec_driver_sql("CREATE INDEX ix_users_high_score ON users (high_score)")
+
+    assert migrate_high_score_at(engine) == 2
+    assert migrate_high_score_at(engine) == 0
+    with Session(bind=engine) as db:
+        assert db.get(db_models.User, played).high_score_at == datetime(2024, 3, 3)
+        assert db.get(db_models.User, idle).high_score_at == datetime(2024, 2, 1)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("users")}
+    assert "ix_users_leaderboard" in indexes and "ix_users_high_score" not in indexes
+    engine.dispose()
+
+
+def test_incomplete_store_fails_when_created():
+    class ReadOnlyStore(LeaderboardStore):
+        def get_leaderboard(self, db, limit=10, mode="rank"):
+            return []
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient # type: ignore
+from sqlalchemy import create_engine # type: ignore
+from app import database, main
+from app.auth_utils import password_executor
+from app.bloom import taken_names
+from app.cache_bus import LocalBus
+from app.ids import legacy_id
+from app.leaderboard_store import InMemoryLeaderboardStore
+
+
+def test_lifespan_warms_up_and_disposes(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'lifespan.db'}")
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(main, "invalidation_bus", LocalBus())
+    calls = []
+    monkeypatch.setattr(main.database, "get_leaderboard", lambda db, limit, mode: calls.append(limit) or [])
+
+    try:
+        with TestClient(main.app) as client:
+            assert database.engine is not None
+            assert database.engine.pool.checkedin() >= 1
+            assert password_executor._executor is not None
+            assert calls == [main.LEADERBOARD_MAX_LIMIT]
+            assert client.get("/api/leaderboard?limit=5").json()["entries"] == []
+            assert calls == [main.LEADERBOARD_MAX_LIMIT]
+        assert database.engine is None
+        assert password_executor._executor is None
+    finally:
+        taken_names.reset()
+        database.dispose_engine()
+
+
+def test_supervised_workers_leave_schema_and_shared_rebuild_to_supervisor(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'supervised.db'}"
+    supervisor_engine = create_engine(url)
+    database.Base.metadata.create_all(supervisor_engine)
+    supervisor_engine.dispose()
+    monkeypatch.setattr(database, "DATABASE_URL", url)
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(main, "invalidation_bus", LocalBus())
+    monkeypatch.setattr(main, "SUPERVISED", True)
+
+    def supervisor_only(*args):
+        raise AssertionError("runs in the supervisor, not in workers")
+
+    monkeypatch.setattr(main, "init_db", supervisor_only)
+    monkeypatch.setattr(main, "reconcile", supervisor_only)
+    # As for Redis: one copy that every worker reads
+    monkeypatch.setattr(main.database.leaderboard_store, "shared", True, raising=False)
+    try:
+        with TestClient(main.app) as client:
+            assert client.get("/api/leaderboard").json()["entries"] == []
+    finally:
+        taken_names.reset()
+        database.dispose_engine()
+
+
+def test_supervised_workers_fill_their_own_memory_store(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'memory.db'}"
+    supervisor_engine = create_engine(url)
+    database.Base.metadata.create_all(supervisor_engine)
+    with supervisor_engine.begin() as conn:
+        conn.execute(database.Base.metadata.tables["users"].insert().values(
+            id=legacy_id("1"), username="ForestKing", email="king@forest.com", password="x",
+            created_at=datetime(2024, 1, 15), high_score=2500, high_score_at=datetime(2024, 1, 15),
+            total_chops=15000, games_played=120,
+        ))
+    supervisor_engine.dispose()
+    monkeypatch.setattr(database, "DATABASE_URL", url)
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(main, "invalidation_bus", LocalBus())
+    monkeypatch.setattr(main, "SUPERVISED", True)
+    monkeypatch.setattr(main, "init_db", lambda: None)
+    store = InMemoryLeaderboardStore()
+    monkeypatch.setattr(main.database, "leaderboard_store", store)
+    try:
+        with TestClient(main.app):
+            assert [entry["username"] for entry in store.get_leaderboard(None)] == ["ForestKing"]
+    finally:
+        taken_names.reset()
+        database.dispose_engine()
@@ -0,0 +1,84 @@
+import threading
+import pytest # type: ignore
+from app import auth_utils
+from app.auth_utils import PasswordExecutor, PasswordExecutorOverloaded
+from app.rate_limit import BucketStore, InMemoryBucketStore, RateLimiter
+from app import main
+
+
+def test_token_bucket_refills():
+    now = [0.0]
+    limiter = RateLimiter(capacity=2, refill_per_second=1, store=InMemoryBucketStore(clock=lambda: now[0]))
+    assert limiter.hit("ip:a") == 0
+    assert limiter.hit("ip:a") == 0
+    assert limiter.hit("ip:a") == pytest.approx(1.0)
+    assert limiter.hit("ip:b") == 0
+    now[0] = 1.0
+    assert limiter.hit("ip:a") == 0
+
+
+def test_login_rate_limited_per_email(client, monkeypatch):
+    monkeypatch.setattr(main.auth_rate_limiter.per_email, "capacity", 2)
+    for _ in range(2):
+        response = client.post("/api/auth/login", json={"email": "king@forest.com", "password": "wrong"})
+        assert response.status_code == 200
+    response = client.post("/api/auth/login", json={"email": "KING@forest.com", "password": "wrong"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_password_executor_sheds_when_queue_full():
+    executor = PasswordExecutor(max_workers=1, queue_limit=1)
+    release = threading.Event()
+    worker = threading.Thread(target=executor.run, args=(release.wait,))
+    worker.start()
+    while executor.pending == 0:
+        pass
+    with pytest.raises(PasswordExecutorOverloaded):
+        executor.run(lambda: None)
+    release.set()
+    worker.join()
+    assert executor.run(lambda: 42) == 42
+    executor.shutdown()
+
+
+def test_login_returns_503_when_executor_saturated(client, monkeypatch):
+    monkeypatch.setattr(main.password_executor, "queue_limit", 0)
+    response = client.post("/api/auth/login", json={"email": "king@forest.com", "password": "password"})
+    assert response.status_code == 503
+
+
+def test_bucket_store_evicts_least_recently_used():
+    store = InMemoryBucketStore(max_keys=2, clock=lambda: 0.0)
+    limiter = RateLimiter(capacity=1, refill_per_second=0.001, store=store)
+    assert limiter.hit("ip:a") == 0
+    assert limiter.hit("ip:b") == 0
+    assert limiter.hit("ip:a") > 0
+    limiter.hit("ip:c")
+    # b was used least recently; a keeps its empty bucket
+    assert list(store._buckets) == ["ip:a", "ip:c"]
+    assert limiter.hit("ip:a") > 0
+
+
+def test_password_executor_sized_per_worker_process(monkeypatch):
+    monkeypatch.setattr(auth_utils, "available_cpus", lambda: 8)
+    monkeypatch.delenv("PASSWORD_HASH_WORKERS", raising=False)
+    monkeypatch.delenv("PASSWORD_QUEUE_LIMIT", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    executor = auth_utils.create_password_executor(threadpool_size=15)
+    assert executor.max_workers == 2
+    # Request threads must be left over once the queue is full
+    assert executor.queue_limit == 14
+    monkeypatch.setenv("PASSWORD_QUEUE_LIMIT", "100")
+    assert auth_utils.create_password_executor(threadpool_size=15).queue_limit == 14
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert auth_utils.create_password_executor(threadpool_size=15).max_workers == 8
+
+
+def test_incomplete_bucket_store_fails_when_created():
+    class TakeOnlyStore(BucketStore):
+        def take(self, key, capacity, refill_per_second):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        TakeOnlyStore()
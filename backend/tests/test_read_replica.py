@@ -0,0 +1,47 @@
+import pytest # type: ignore
+from sqlalchemy import create_engine # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import database, db_models
+from app.database import Base
+from app.main import READ_YOUR_WRITES_COOKIE
+from app.ids import legacy_id
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """A second SQLite file standing in for a lagging read replica."""
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        db.add(db_models.User(id=legacy_id("r1"), username="ReplicaOnly", email="replica@only.com",
+                              password="x", high_score=123456))
+        db.commit()
+    engine.dispose()
+
+    monkeypatch.setattr(database, "DATABASE_READ_URL", url)
+    monkeypatch.setattr(database, "read_engine", None)
+    yield
+    if database.read_engine is not None:
+        database.read_engine.dispose()
+
+
+def _leaders(client):
+    return [entry["username"] for entry in client.get("/api/leaderboard").json()["entries"]]
+
+
+def test_reads_go_to_replica_until_client_writes(replica, client, auth_token):
+    assert _leaders(client) == ["ReplicaOnly"]
+
+    started = client.post("/api/game/session", headers={"Authorization": f"Bearer {auth_token}"})
+    assert READ_YOUR_WRITES_COOKIE in started.cookies
+    assert "ReplicaOnly" not in _leaders(client)
+    assert "ForestKing" in _leaders(client)
+
+    client.cookies.clear()
+    assert _leaders(client) == ["ReplicaOnly"]
+
+
+def test_no_stickiness_without_replica(client, auth_token):
+    started = client.post("/api/game/session", headers={"Authorization": f"Bearer {auth_token}"})
+    assert READ_YOUR_WRITES_COOKIE not in started.cookies
@@ -0,0 +1,58 @@
+import random
+from app.score_histogram import ScoreHistogram, score_histogram
+
+
+def _filled(scores):
+    histogram = ScoreHistogram()
+    histogram._loaded = True
+    for score in scores:
+        histogram.add(score)
+    return histogram
+
+
+def test_buckets_cover_every_score_once():
+    histogram = ScoreHistogram(sub_buckets=16)
+    previous_high = -1
+    for index in range(200):
+        low, high = histogram.bucket_bounds(index)
+        assert low == previous_high + 1
+        assert histogram.bucket_index(low) == index == histogram.bucket_index(high)
+        previous_high = high
+
+
+def test_percentile_and_rank_are_close_to_exact():
+    rng = random.Random(7)
+    scores = [int(rng.lognormvariate(7, 1)) for _ in range(5000)]
+    histogram = _filled(scores)
+    ranked = sorted(scores, reverse=True)
+    for score in (50, 800, 1500, 5000, 20000):
+        exact = 100 * sum(1 for s in scores if s < score) / len(scores)
+        assert abs(histogram.percentile(score) - exact) < 1.0
+        exact_rank = sum(1 for s in ranked if s > score) + 1
+        assert abs(histogram.rank_estimate(score) - exact_rank) <= max(3, exact_rank * 0.03)
+
+
+def test_distribution_counts_are_exact():
+    histogram = _filled([0, 5, 99, 1000, 1000, 70000])
+    buckets = histogram.distribution(bins=8)
+    assert len(buckets) <= 8
+    assert sum(bucket["count"] for bucket in buckets) == 6
+    assert buckets[0]["min"] == 0 and buckets[-1]["max"] >= 70000
+
+
+def test_distribution_endpoint_tracks_new_high_scores(client, auth_token):
+    data = client.get("/api/leaderboard/distribution", params={"score": 3000}).json()
+    # Seeded high scores: 50, 2200, 2500, 5000
+    assert data["totalPlayers"] == 4
+    assert data["percentile"] == 75.0
+    assert data["rankEstimate"] == 2
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    session_id = client.post("/api/game/session", headers=headers).json()["session"]["id"]
+    client.post(f"/api/game/session/{session_id}/end", headers=headers,
+                json={"score": 9000, "chops": 10, "duration": 60})
+
+    assert score_histogram.rank_estimate(3000) == 3
+    data = client.get("/api/leaderboard/distribution", params={"score": 3000}).json()
+    assert data["percentile"] == 50.0
+    assert sum(bucket["count"] for bucket in data["buckets"]) == 4
@@ -0,0 +1,39 @@
+import os
+from app import server
+
+
+def _cgroup(tmp_path, files):
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return str(tmp_path)
+
+
+def test_cgroup_v2_quota(tmp_path):
+    assert server.cgroup_cpu_limit(_cgroup(tmp_path, {"cpu.max": "250000 100000\n"})) == 2.5
+    assert server.cgroup_cpu_limit(_cgroup(tmp_path, {"cpu.max": "max 100000\n"})) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    root = _cgroup(tmp_path, {"cpu/cpu.cfs_quota_us": "100000", "cpu/cpu.cfs_period_us": "50000"})
+    assert server.cgroup_cpu_limit(root) == 2.0
+    root = _cgroup(tmp_path, {"cpu/cpu.cfs_quota_us": "-1", "cpu/cpu.cfs_period_us": "100000"})
+    assert server.cgroup_cpu_limit(root) is None
+
+
+def test_worker_count_follows_quota_and_override(tmp_path, monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    root = _cgroup(tmp_path, {"cpu.max": "350000 100000"})
+    assert server.worker_count(root) == 3
+    assert server.worker_count(_cgroup(tmp_path / "small", {"cpu.max": "50000 100000"})) == 1
+    assert server.worker_count(str(tmp_path / "none")) == 16
+    monkeypatch.setenv("WEB_CONCURRENCY", "6")
+    assert server.worker_count(root) == 6
+
+
+def test_sqlite_runs_a_single_worker():
+    assert server.cap_workers(4, "sqlite") == 1
+    assert server.cap_workers(4, "postgresql") == 4
+    assert server.cap_workers(1, "sqlite") == 1
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest # type: ignore
+from app import db_models
+from app.db import database
+from app.ids import legacy_id
+
+
+@pytest.fixture
+def history(db_session):
+    """Seven ended games for ForestKing (user 1), two sharing a start time."""
+    base = datetime(2024, 9, 1, 12, 0)
+    starts = [base + timedelta(days=day) for day in range(6)] + [base + timedelta(days=5)]
+    for n, started_at in enumerate(starts):
+        db_session.add(db_models.GameSession(
+            id=legacy_id(f"history-{n}"), user_id=legacy_id("1"), score=100 * n, chops=n, duration=30.0,
+            started_at=started_at, ended_at=started_at + timedelta(seconds=30),
+        ))
+    db_session.add(db_models.GameSession(id=legacy_id("history-open"), user_id=legacy_id("1"), started_at=base + timedelta(days=9)))
+    db_session.commit()
+    expected = sorted(
+        [(started_at, legacy_id(f"history-{n}")) for n, started_at in enumerate(starts)]
+        + [(datetime(2024, 8, 2, 14, 0), legacy_id("session-2"))],
+        reverse=True,
+    )
+    return [session_id for _, session_id in expected]
+
+
+def test_keyset_pages_cover_history_once(client, auth_token, history):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/game/sessions", headers=headers, params=params).json()
+        seen += [session["id"] for session in data["sessions"]]
+        cursor = data["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == history
+
+
+def test_tied_start_times_across_a_page_boundary(db_session, history):
+    # history-5 and history-6 start together; one page ends between them
+    first = database.get_user_sessions(db_session, legacy_id("1"), 1)
+    after = (first[0]["startedAt"], first[0]["id"])
+    second = database.get_user_sessions(db_session, legacy_id("1"), 1, after=after)
+    assert [first[0]["id"], second[0]["id"]] == history[:2]
+
+
+def test_date_filters_and_bad_cursor(client, auth_token, history):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    data = client.get("/api/game/sessions", headers=headers,
+                      params={"from": "2024-09-02T00:00:00", "to": "2024-09-04T00:00:00"}).json()
+    assert [session["id"] for session in data["sessions"]] == [legacy_id("history-2"), legacy_id("history-1")]
+    assert client.get("/api/game/sessions", headers=headers, params={"cursor": "nope"}).status_code == 400
+
+
+def test_exports_stream_every_row(client, auth_token, history):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ndjson = client.get("/api/game/sessions/export", headers=headers)
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in ndjson.text.splitlines()] == history
+
+    exported = client.get("/api/game/sessions/export", headers=headers, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [row["id"] for row in rows] == history
+    assert rows[0]["score"] == "600"
+
+
+def test_history_query_uses_covering_index(db_session):
+    if db_session.get_bind().dialect.name != "sqlite":
+        pytest.skip("plan text checked for SQLite only")
+    query = database._history_query(db_session, legacy_id("1")).statement.compile(
+        dialect=db_session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    detail = " ".join(row[-1] for row in plan)
+    assert "ix_game_sessions_user_history" in detail
+    assert "TEMP B-TREE" not in detail
@@ -0,0 +1,84 @@
+import pytest # type: ignore
+from app import db_models, ids, main
+from app.bloom import BloomFilter, taken_names
+from app.db import database, DuplicateUserError, USER_BY_EMAIL
+
+
+@pytest.fixture
+def loaded_filter(db_session):
+    taken_names.load(db_session)
+    yield taken_names
+    taken_names.reset()
+    taken_names.exclusive = True
+
+
+def _new_user(username, email):
+    return {"username": username, "email": email, "password": "hashed"}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"user{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other{i}" in bloom for i in range(1000))
+    assert false_positives < 50
+
+
+def test_create_user_maps_conflicts_to_field(db_session):
+    with pytest.raises(DuplicateUserError) as exc:
+        database.create_user(db_session, _new_user("Someone", "KING@forest.com"))
+    assert exc.value.field == "email"
+    with pytest.raises(DuplicateUserError) as exc:
+        database.create_user(db_session, _new_user("ForestKing", "new@forest.com"))
+    assert exc.value.field == "username"
+    assert database.create_user(db_session, _new_user("Someone", "new@forest.com"))["username"] == "Someone"
+
+
+def test_availability_endpoint(client, loaded_filter):
+    data = client.get("/api/auth/available", params={"username": "ForestKing", "email": "free@forest.com"}).json()
+    assert data == {"success": True, "usernameAvailable": False, "emailAvailable": True}
+
+    client.post("/api/auth/signup", json={"username": "Fresh", "email": "free@forest.com", "password": "password123"})
+    assert loaded_filter.email_maybe_taken("FREE@forest.com")
+    data = client.get("/api/auth/available", params={"email": "free@forest.com"}).json()
+    assert data["emailAvailable"] is False
+    assert data["usernameAvailable"] is None
+
+
+def test_availability_confirmed_when_other_workers_sign_up(client, db_session, loaded_filter, monkeypatch):
+    # Another worker's signup never reaches this worker's filter
+    db_session.add(db_models.User(id=ids.new_id(), username="Elsewhere", email="elsewhere@forest.com", password="x"))
+    db_session.commit()
+    assert not loaded_filter.username_maybe_taken("Elsewhere")
+
+    loaded_filter.exclusive = False
+    data = client.get("/api/auth/available", params={"username": "Elsewhere", "email": "elsewhere@forest.com"}).json()
+    assert data == {"success": True, "usernameAvailable": False, "emailAvailable": False}
+
+    monkeypatch.setattr(main, "SessionLocal", lambda: db_session)
+    main.run_maintenance()
+    assert loaded_filter.username_maybe_taken("Elsewhere")
+
+
+def test_profile_email_change_is_unique_ignoring_case(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    data = client.patch("/api/auth/profile", headers=headers, json={"email": "AXE@Master.com"}).json()
+    assert data == {"success": False, "user": None, "token": None, "error": "Email already registered"}
+
+    data = client.patch("/api/auth/profile", headers=headers, json={"email": "New.King@Forest.com"}).json()
+    assert data["user"]["email"] == "New.King@forest.com"
+    login = client.post("/api/auth/login", json={"email": "new.king@FOREST.com", "password": "password"})
+    assert login.json()["success"] is True
+
+
+def test_email_lookup_uses_lower_index(db_session):
+    if db_session.get_bind().dialect.name != "sqlite":
+        pytest.skip("plan text checked for SQLite only")
+    query = USER_BY_EMAIL.params(email="King@Forest.com").compile(
+        dialect=db_session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    detail = " ".join(row[-1] for row in plan)
+    assert "USING INDEX ix_users_email_lower" in detail
@@ -0,0 +1,257 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import pytest # type: ignore
+from sqlalchemy.exc import OperationalError # type: ignore
+from app import db as db_module, deadline
+from app.cache_bus import invalidation_bus
+from app.db import database
+from app.ids import legacy_id
+from app.metrics import registry
+from app.singleflight import CALLS, COALESCED, SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    registry.reset()
+
+
+class GatedComputation:
+    """Blocks every call until released, counting how many calls ran."""
+
+    def __init__(self, result="page"):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def _run_threads(flights, key, compute, count):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flights.do(key, compute))
+        except Exception as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert compute.started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(count - 1)]
+    for thread in followers:
+        thread.start()
+    # Followers are parked on the flight once they can't start their own
+    time.sleep(0.05)
+    compute.release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    return results, errors
+
+
+def test_threads_share_one_computation():
+    flights, compute = SingleFlight("test"), GatedComputation()
+    results, errors = _run_threads(flights, "top", compute, 20)
+    assert results == ["page"] * 20 and errors == []
+    assert compute.calls == 1
+    assert CALLS.value(flight="test") == 1 and COALESCED.value(flight="test") == 19
+    assert flights.in_flight() == 0
+    # Nothing is kept once the computation lands
+    assert flights.do("top", lambda: "next") == "next"
+
+
+def test_leader_error_reaches_every_waiter():
+    flights, compute = SingleFlight("test"), GatedComputation(RuntimeError("database down"))
+    results, errors = _run_threads(flights, "top", compute, 5)
+    assert results == [] and [str(exc) for exc in errors] == ["database down"] * 5
+    assert compute.calls == 1 and flights.in_flight() == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flights = SingleFlight("test")
+    first = GatedComputation("first")
+    thread = threading.Thread(target=flights.do, args=(("top", 1), first))
+    thread.start()
+    assert first.started.wait(5)
+    assert flights.do(("top", 2), lambda: "second") == "second"
+    first.release.set()
+    thread.join(5)
+    assert COALESCED.value(flight="test") == 0
+
+
+def test_async_callers_share_one_computation():
+    flights = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "page"
+
+    async def main():
+        return await asyncio.gather(*(flights.do_async("top", compute) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["page"] * 10
+    assert calls == 1 and COALESCED.value(flight="test") == 9
+
+
+def test_async_caller_joins_thread_computation():
+    flights, compute = SingleFlight("test"), GatedComputation()
+    leader = threading.Thread(target=flights.do, args=("top", compute))
+    leader.start()
+    assert compute.started.wait(5)
+
+    async def follow():
+        async def own():
+            raise AssertionError("should have joined the running computation")
+        waiter = asyncio.ensure_future(flights.do_async("top", own))
+        await asyncio.sleep(0.02)
+        compute.release.set()
+        return await waiter
+
+    assert asyncio.run(follow()) == "page"
+    leader.join(5)
+    assert compute.calls == 1 and COALESCED.value(flight="test") == 1
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    flights = SingleFlight("test")
+
+    async def main():
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def quick():
+            return "page"
+
+        leader = asyncio.ensure_future(flights.do_async("top", hang))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do_async("top", quick))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "page"
+    assert CALLS.value(flight="test") == 2 and COALESCED.value(flight="test") == 0
+
+
+class CountingStore:
+    """Leaderboard store whose reads block until released."""
+
+    def __init__(self):
+        self.page = GatedComputation([{"id": legacy_id("4"), "rank": 1}])
+        self.rank_calls = 0
+
+    def get_leaderboard(self, db, limit, mode):
+        return self.page()
+
+    def get_user_rank(self, db, user_id, mode):
+        self.rank_calls += 1
+        return 2
+
+
+def test_database_coalesces_leaderboard_reads(db_session, monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(database, "leaderboard_store", store)
+    flights = db_module.leaderboard_flights
+    results = []
+
+    def read():
+        results.append(database.get_leaderboard(db_session, 100, "rank"))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    threads[0].start()
+    assert store.page.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    store.page.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 8 and store.page.calls == 1
+    assert COALESCED.value(flight=flights.name) == 7
+
+    assert asyncio.run(database.get_user_rank_async(db_session, legacy_id("1"))) == 2
+    assert database.get_user_rank(db_session, "not-an-id") == 0
+    assert store.rank_calls == 1
+
+
+def test_flight_key_follows_version_and_own_writes(db_session):
+    before = database._flight_key(db_session, "top", 10, "rank")
+    invalidation_bus.bump("leaderboard")
+    after = database._flight_key(db_session, "top", 10, "rank")
+    assert before != after
+    assert database._flight_key(db_session, "top", 10, "dense") != after
+
+    invalidation_bus.publish(db_session, "leaderboard")
+    assert database._flight_key(db_session, "top", 10, "rank") is None
+    db_session.rollback()
+    db_session.info["read_your_writes"] = True
+    assert database._flight_key(db_session, "top", 10, "rank") is None
+
+
+def test_metrics_endpoint(client):
+    invalidation_bus.bump("leaderboard")
+    client.get("/api/leaderboard")
+    body = client.get("/api/metrics").text
+    assert "# TYPE singleflight_calls_total counter" in body
+    assert 'singleflight_calls_total{flight="leaderboard"}' in body
+
+
+class LateLeaderStore:
+    """The first read runs past its request's deadline; later reads succeed."""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get_leaderboard(self, db, limit, mode):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            assert self.release.wait(5)
+            raise OperationalError("SELECT ...", {}, sqlite3.OperationalError("interrupted"))
+        return [{"id": legacy_id("4"), "rank": 1}]
+
+
+def test_followers_rerun_a_read_stopped_by_the_leaders_deadline(db_session, monkeypatch):
+    store = LateLeaderStore()
+    monkeypatch.setattr(database, "leaderboard_store", store)
+    outcomes = []
+
+    def leader():
+        token = deadline.start(0.01)
+        try:
+            database.get_leaderboard(db_session, 100, "rank")
+        except OperationalError:
+            outcomes.append("leader failed")
+        finally:
+            deadline.reset(token)
+
+    def follower():
+        outcomes.append(database.get_leaderboard(db_session, 100, "rank"))
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    assert store.started.wait(5)
+    threads += [threading.Thread(target=follower) for _ in range(4)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    store.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert outcomes.count("leader failed") == 1
+    assert outcomes.count([{"id": legacy_id("4"), "rank": 1}]) == 4
+    assert COALESCED.value(flight=db_module.leaderboard_flights.name) >= 4
@@ -0,0 +1,115 @@
+import time
+from types import SimpleNamespace
+import pytest # type: ignore
+from fastapi.security import HTTPAuthorizationCredentials # type: ignore
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from app import database, db_models, deadline, main
+from app.database import Base
+from app.ids import legacy_id
+from app.models import LoginRequest, SignupRequest
+
+
+@pytest.fixture
+def sqlite_file(tmp_path, monkeypatch):
+    """A SQLite file as DATABASE_URL, with the production profile."""
+    url = f"sqlite:///{tmp_path / 'lumberjack.db'}"
+    monkeypatch.setattr(database, "SQLITE_PROFILE", "production")
+    monkeypatch.setattr(database, "DATABASE_URL", url)
+    monkeypatch.setattr(database, "DATABASE_READ_URL", None)
+    monkeypatch.setattr(database, "read_engine", None)
+    writer = database._create_engine(url)
+    Base.metadata.create_all(bind=writer)
+    yield url, writer
+    writer.dispose()
+    if database.read_engine is not None:
+        database.read_engine.dispose()
+
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_writer_gets_wal_and_a_single_connection(sqlite_file):
+    url, writer = sqlite_file
+    assert _pragma(writer, "journal_mode") == "wal"
+    assert _pragma(writer, "synchronous") == 1  # NORMAL
+    assert _pragma(writer, "busy_timeout") == database.SQLITE_BUSY_TIMEOUT_MS
+    assert _pragma(writer, "temp_store") == 2  # MEMORY
+    assert _pragma(writer, "cache_size") == database.SQLITE_CACHE_SIZE
+    assert writer.pool.size() == 1 and writer.pool._max_overflow == 0
+
+    reader = database.init_read_engine()
+    assert reader is not writer and reader.pool.size() == database.DB_POOL_SIZE
+    assert _pragma(reader, "query_only") == 1
+    with pytest.raises(OperationalError):
+        with reader.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM users")
+
+
+def test_reads_use_the_reader_pool(sqlite_file, client):
+    url, writer = sqlite_file
+    with Session(bind=writer) as db:
+        db.add(db_models.User(id=legacy_id("w1"), username="OnDisk", email="disk@example.com",
+                              password="x", high_score=4242))
+        db.commit()
+    assert database.read_pool_configured()
+    entries = client.get("/api/leaderboard").json()["entries"]
+    assert [entry["username"] for entry in entries] == ["OnDisk"]
+
+
+def test_profile_only_applies_to_sqlite_files(monkeypatch):
+    monkeypatch.setattr(database, "SQLITE_PROFILE", "production")
+    assert not database.sqlite_profile("sqlite://")
+    assert not database.sqlite_profile("postgresql://u@h/db")
+    monkeypatch.setattr(database, "SQLITE_PROFILE", "off")
+    assert not database.sqlite_profile("sqlite:///./lumberjack.db")
+
+
+def test_user_lookup_releases_the_single_writer(sqlite_file):
+    url, writer = sqlite_file
+    with Session(bind=writer) as db:
+        db.add(db_models.User(id=legacy_id("w2"), username="Streamer", email="stream@example.com", password="x"))
+        db.commit()
+        token = main.create_access_token({"sub": legacy_id("w2")})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        assert main.get_current_user(credentials, db)["username"] == "Streamer"
+        # The request's session stays usable, but holds no connection meanwhile
+        assert writer.pool.checkedout() == 0
+
+
+def test_login_and_signup_release_the_writer_before_bcrypt(sqlite_file, monkeypatch):
+    url, writer = sqlite_file
+    held_during_bcrypt = []
+
+    def password_task(fn, *args):
+        held_during_bcrypt.append(writer.pool.checkedout())
+        return fn(*args)
+
+    monkeypatch.setattr(main, "run_password_task", password_task)
+    # Make signup look the names up instead of trusting the Bloom filter
+    monkeypatch.setattr(main.taken_names, "email_maybe_taken", lambda email: True)
+    monkeypatch.setattr(main.taken_names, "username_maybe_taken", lambda username: True)
+    http_request = SimpleNamespace(client=None)
+    with Session(bind=writer) as db:
+        signup = SignupRequest(username="Sawyer", email="sawyer@example.com", password="password")
+        assert main.signup(signup, http_request, db).success
+        login = LoginRequest(email="sawyer@example.com", password="password")
+        assert main.login(login, http_request, db).success
+    assert held_during_bcrypt == [0, 0]
+
+
+def test_writer_checkout_wait_ends_at_the_deadline(sqlite_file):
+    url, writer = sqlite_file
+    held = writer.connect()
+    token = deadline.start(0.2)
+    try:
+        began = time.monotonic()
+        with pytest.raises(PoolTimeoutError):
+            writer.connect()
+        assert time.monotonic() - began < 1
+    finally:
+        deadline.reset(token)
+        held.close()
+    assert writer.pool.timeout() == 30
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta, timezone
+from app import db_models, stats
+from app.db import database
+from app.generate import stats_rows
+from app.ids import legacy_id
+
+
+def _at(day):
+    return datetime(2024, 8, day, 12, tzinfo=timezone.utc)
+
+
+def test_streaks_count_consecutive_days():
+    user_stats = db_models.UserStats(user_id="u", **stats.EMPTY_STATS)
+    for day in (1, 2, 2, 3, 5, 6):
+        stats.add_game(user_stats, 100, 5, 10.0, _at(day))
+    assert user_stats.games == 6
+    assert (user_stats.current_streak, user_stats.best_streak) == (2, 3)
+    assert user_stats.last_played_on == date(2024, 8, 6)
+
+
+def test_stats_api_reports_session_aggregates(db_session):
+    for score, chops in [(300, 30), (100, 10)]:
+        session = database.create_session(db_session, legacy_id("24"))
+        database.end_session(db_session, session["id"], score, chops, 20.0)
+
+    user = db_session.get(db_models.User, legacy_id("24")).to_dict()
+    today = datetime.now(timezone.utc).date()
+    result = stats.get_user_stats(db_session, user, today=today)
+    assert result["avgScore"] == 200
+    assert result["avgDuration"] == 20.0
+    assert result["chopsPerSecond"] == 1.0
+    # Both games were played today
+    assert (result["currentStreak"], result["bestStreak"]) == (1, 1)
+    # The 300 lifted RedwoodRookie off the bottom of the four seeded high scores
+    assert result["percentile"] > 0.0
+    assert stats.get_user_stats(db_session, user, today=today + timedelta(days=7))["currentStreak"] == 0
+
+
+def test_rebuild_matches_incremental_and_generated(db_session):
+    stats.rebuild_user_stats(db_session)
+    rebuilt = {row.user_id: (row.games, row.score_sum, row.best_score)
+               for row in db_session.query(db_models.UserStats)}
+    assert rebuilt == {legacy_id("4"): (1, 5000, 5000), legacy_id("1"): (1, 2500, 2500)}
+
+    sessions = [
+        {"user_id": legacy_id("4"), "score": 5000, "chops": 250, "duration": 180.5, "ended_at": _at(1)},
+        {"user_id": legacy_id("1"), "score": 2500, "chops": 150, "duration": 120.0, "ended_at": _at(2)},
+    ]
+    generated = {row["user_id"]: (row["games"], row["score_sum"], row["best_score"])
+                 for row in stats_rows(sessions)}
+    assert generated == rebuilt
@@ -1,59 +1,23 @@
-"""Configuration for integration tests using SQLite database."""
+"""Configuration for integration tests.
+
+Database setup and per-test transaction rollback live in the root conftest.py.
+"""
 import pytest # type: ignore
 from fastapi.testclient import TestClient # type: ignore
-from sqlalchemy import create_engine # type: ignore
-from sqlalchemy.orm import sessionmaker # type: ignore
-from sqlalchemy.pool import StaticPool # type: ignore
 from app.main import app
-from app.database import Base, get_db
 from app import db_models
-from app.auth_utils import hash_password
+from app.ids import legacy_id
 from datetime import datetime, timezone
 
 
-# Create test database engine (file-based SQLite for integration tests)
-TEST_DATABASE_URL = "sqlite:///./test_integration.db"
-engine = create_engine(
-    TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    """Override database dependency for testing"""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-# Override the dependency globally for all tests
-app.dependency_overrides[get_db] = override_get_db
+# Precomputed bcrypt hash (cost 4) of "testpassword"
+TEST_USER_PASSWORD_HASH = "$2b$04$PQuDrmfsCWZTepcEbDzeuOUkngi3hOY4FEqnYb/jiY.15ML3k27Ma"
 
 
-@pytest.fixture(scope="session", autouse=True)
-def setup_test_database():
-    """Create tables once for the entire test session"""
-    Base.metadata.create_all(bind=engine)
-    yield
-    # Cleanup after all tests
-    Base.metadata.drop_all(bind=engine)
-
-
-@pytest.fixture(scope="function", autouse=True)
-def reset_db():
-    """Reset database before each test"""
-    db = TestingSessionLocal()
-    try:
-        # Clear all data
-        db.query(db_models.GameSession).delete()
-        db.query(db_models.User).delete()
-        db.commit()
-    finally:
-        db.close()
+@pytest.fixture(scope="session")
+def default_database_url():
+    """File-based SQLite unless TEST_DATABASE_URL points elsewhere"""
+    return "sqlite:///./test_integration.db"
 
 
 @pytest.fixture
@@ -62,24 +26,14 @@ def client():
     return TestClient(app)
 
 
-@pytest.fixture
-def db_session():
-    """Provide a database session for direct database manipulation"""
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @pytest.fixture
 def test_user(db_session):
     """Create a test user in the database"""
     user = db_models.User(
-        id="test-user-123",
+        id=legacy_id("test-user-123"),
         username="testuser",
         email="test@example.com",
-        password=hash_password("testpassword"),
+        password=TEST_USER_PASSWORD_HASH,
         created_at=datetime.now(timezone.utc),
         high_score=100,
         total_chops=500,
@@ -92,14 +46,14 @@ def test_user(db_session):
 
 
 @pytest.fixture
-def multiple_users(db_session):
+def multiple_users(db_session, hashed_password):
     """Create multiple users for leaderboard testing"""
     users = [
         db_models.User(
-            id=f"user-{i}",
+            id=legacy_id(f"user-{i}"),
             username=f"player{i}",
             email=f"player{i}@example.com",
-            password=hash_password("password"),
+            password=hashed_password,
             created_at=datetime.now(timezone.utc),
             high_score=1000 * (10 - i),  # Descending scores
             total_chops=5000 * (10 - i),
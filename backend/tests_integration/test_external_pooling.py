@@ -0,0 +1,116 @@
+"""DB_POOL_MODE=external, checked against a stand-in for PgBouncer in transaction mode."""
+import re
+import pytest # type: ignore
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import sessionmaker # type: ignore
+from sqlalchemy.pool import NullPool # type: ignore
+from app import cache_bus, database as database_module
+from app.database import Base, get_db
+from app.main import app
+
+# Statements whose effect outlives the transaction on the server connection
+SESSION_STATE = re.compile(
+    r"^\s*(SET\s+(?!LOCAL\b)|RESET\b|LISTEN\b|PREPARE\b|DEALLOCATE\b|CREATE\s+TEMP|DECLARE\b.*\bWITH\s+HOLD\b)"
+    r"|\bpg_advisory_lock\(",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class TransactionPoolerStandIn:
+    """Watches an engine the way PgBouncer's transaction pooling would see it.
+
+    The pooler gives each transaction whichever server connection is free, so
+    a statement leaving session state behind, or a client connection kept
+    open across transactions, would leak into some other worker's request.
+    """
+
+    def __init__(self, engine):
+        self.violations = []
+        self.connects = 0
+        self.checkouts = 0
+        self.closes = 0
+        event.listen(engine, "connect", self._connect)
+        event.listen(engine, "close", self._close)
+        event.listen(engine, "checkout", self._checkout)
+        event.listen(engine, "before_cursor_execute", self._execute)
+
+    def check(self, statement: str) -> None:
+        if SESSION_STATE.search(statement):
+            self.violations.append(statement)
+
+    def _connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _close(self, dbapi_connection, connection_record):
+        self.closes += 1
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def _execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.check(statement)
+
+
+@pytest.fixture
+def external_engine(monkeypatch, tmp_path):
+    monkeypatch.setattr(database_module, "DB_POOL_MODE", "external")
+    engine = database_module._create_engine(f"sqlite:///{tmp_path / 'pooled.db'}")
+    Base.metadata.create_all(engine)
+    pooler = TransactionPoolerStandIn(engine)
+    ExternalSession = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    def override_get_db():
+        db = ExternalSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield engine, pooler
+    engine.dispose()
+
+
+def test_stand_in_flags_session_state():
+    pooler = TransactionPoolerStandIn.__new__(TransactionPoolerStandIn)
+    pooler.violations = []
+    for statement in ("SET statement_timeout = 100", "LISTEN lumberjack_invalidate",
+                      "SELECT pg_advisory_lock(1)", "SET LOCAL lock_timeout = 50", "SELECT 1"):
+        pooler.check(statement)
+    assert pooler.violations == [
+        "SET statement_timeout = 100", "LISTEN lumberjack_invalidate", "SELECT pg_advisory_lock(1)",
+    ]
+
+
+def test_game_flow_leaves_no_state_on_server_connections(client, external_engine):
+    engine, pooler = external_engine
+    assert isinstance(engine.pool, NullPool)
+    assert database_module.warm_pool(engine, 5) == 0
+
+    signup = client.post("/api/auth/signup", json={
+        "username": "pooled", "email": "pooled@example.com", "password": "password123",
+    }).json()
+    client.headers = {"Authorization": f"Bearer {signup['token']}"}
+    session_id = client.post("/api/game/session").json()["session"]["id"]
+    ended = client.post(f"/api/game/session/{session_id}/end",
+                        json={"score": 900, "chops": 45, "duration": 60.0}).json()
+    assert ended["success"] is True
+    assert client.get("/api/leaderboard").json()["entries"][0]["username"] == "pooled"
+    assert client.patch("/api/auth/profile", json={"username": "pooled2"}).json()["success"] is True
+
+    assert pooler.violations == []
+    # Every checkout was a fresh connection, closed again on release
+    assert pooler.checkouts == pooler.connects == pooler.closes > 0
+
+
+def test_external_mode_disables_prepared_statements_and_pooled_listen(monkeypatch):
+    monkeypatch.setattr(database_module, "DB_POOL_MODE", "external")
+    monkeypatch.setattr(database_module, "DB_PREPARE_THRESHOLD", "1")
+    assert database_module._connect_args("postgresql+psycopg://u@pgbouncer/db") == {"prepare_threshold": None}
+
+    monkeypatch.setattr(database_module, "DATABASE_BACKEND", "postgresql")
+    monkeypatch.setattr(database_module, "DATABASE_DIRECT_URL", None)
+    assert type(cache_bus.create_bus()) is cache_bus.LocalBus
+    assert database_module.init_direct_engine() is None
+    monkeypatch.setattr(database_module, "DATABASE_DIRECT_URL", "postgresql://u@postgres/db")
+    assert type(cache_bus.create_bus()) is cache_bus.PostgresBus
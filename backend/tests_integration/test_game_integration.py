@@ -2,6 +2,7 @@
 import pytest # type: ignore
 from datetime import datetime, timezone
 from app import db_models
+from app.ids import legacy_id
 
 
 class TestGameSession:
@@ -172,14 +173,14 @@ class TestEndSession:
         """Test ending session fails without authentication."""
         # Create a session directly in database
         session = db_models.GameSession(
-            id="test-session",
+            id=legacy_id("test-session"),
             user_id=test_user["id"],
             started_at=datetime.now(timezone.utc)
         )
         db_session.add(session)
         db_session.commit()
         
-        response = client.post("/api/game/session/test-session/end", json={
+        response = client.post(f"/api/game/session/{session.id}/end", json={
             "score": 100,
             "chops": 10,
             "duration": 60.0
@@ -239,21 +240,25 @@ class TestGameStats:
         if 2000 > initial_stats["topScore"]:
             assert updated_stats["topScore"] == 2000
 
-    def test_stats_avg_score_calculation(self, authenticated_client, db_session):
-        """Test that average score is calculated correctly."""
+    def test_stats_avg_score_calculation(self, authenticated_client):
+        """Test that average score is the mean of ended session scores."""
         client, token, test_user = authenticated_client
-        
-        # Get user's total chops and games played
-        user = db_session.query(db_models.User).filter(
-            db_models.User.id == test_user["id"]
-        ).first()
-        
-        expected_avg = round(user.total_chops / user.games_played) if user.games_played > 0 else 0
-        
+
+        for score, duration in ((1000, 100.0), (2000, 150.0)):
+            session_id = client.post("/api/game/session").json()["session"]["id"]
+            client.post(f"/api/game/session/{session_id}/end", json={
+                "score": score,
+                "chops": 50,
+                "duration": duration
+            })
+
         response = client.get("/api/game/stats")
         stats = response.json()["stats"]
-        
-        assert stats["avgScore"] == expected_avg
+
+        assert stats["avgScore"] == 1500
+        assert stats["avgDuration"] == 125.0
+        assert stats["chopsPerSecond"] == 0.4
+        assert stats["currentStreak"] == 1
 
 
 class TestGameSessionLifecycle:
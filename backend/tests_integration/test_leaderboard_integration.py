@@ -1,6 +1,7 @@
 """Integration tests for leaderboard endpoints."""
 import pytest # type: ignore
 from app import db_models
+from app.ids import legacy_id
 
 
 class TestLeaderboardRetrieval:
@@ -237,7 +238,7 @@ class TestLeaderboardRankings:
         
         for username, email, score in users_data:
             user = db_models.User(
-                id=f"id-{username}",
+                id=legacy_id(f"id-{username}"),
                 username=username,
                 email=email,
                 password=hash_password("password"),